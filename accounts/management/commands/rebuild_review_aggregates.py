@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from accounts.models import ServiceReview
+from service.models import Service
+
+
+class Command(BaseCommand):
+    help = "Recompute Service.review_count and Service.rating_sum from ServiceReview in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        reviews = ServiceReview.objects.filter(service=OuterRef('pk')).order_by().values('service')
+        review_count = Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), Value(0))
+        rating_sum = Coalesce(Subquery(reviews.annotate(total=Sum('rating')).values('total')), Value(0))
+
+        started = time.perf_counter()
+        uids = Service.objects.order_by('pk').values_list('pk', flat=True)
+        updated = 0
+        batch = []
+        for uid in uids.iterator(chunk_size=batch_size):
+            batch.append(uid)
+            if len(batch) == batch_size:
+                updated += self.rebuild(batch, review_count, rating_sum)
+                batch = []
+        if batch:
+            updated += self.rebuild(batch, review_count, rating_sum)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt review aggregates for {updated} services in {elapsed:.1f} s"))
+
+    def rebuild(self, uids, review_count, rating_sum):
+        with transaction.atomic():
+            return Service.objects.filter(pk__in=uids).update(review_count=review_count, rating_sum=rating_sum)
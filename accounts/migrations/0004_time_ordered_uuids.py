@@ -0,0 +1,39 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:17
+
+import base.uuids
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='address',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='id',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='servicereview',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
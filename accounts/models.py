@@ -3,10 +3,14 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.db import models
 from django.utils import timezone
 from base.models import BaseModel
+from base.renditions import track
+from base.uuids import CompactUUIDField, uuid7
 from service.models import Service
-import uuid
+from service.geo import GeoQuerySet
+from service.signals import refresh_rows
 from django.utils.timezone import now
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 from django.core.validators import MaxValueValidator, MinValueValidator
 
@@ -30,7 +34,7 @@ class CustomUserManager(BaseUserManager):
         return self.create_user(email, phone_number, password, **extra_fields)
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
-    id = models.UUIDField(primary_key=True,editable=False,default=uuid.uuid4)
+    id = CompactUUIDField(primary_key=True,editable=False,default=uuid7)
     email = models.EmailField(unique=True, null=True, blank=True)
     phone_number = models.CharField(max_length=15, unique=True, null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -60,6 +64,7 @@ class Profile(BaseModel):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(max_length=500, blank=True, null=True, help_text="A short bio about the user.")
     profile_picture = models.ImageField(upload_to='profile_pictures/', blank=True, null=True)
+    profile_picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     date_of_birth = models.DateField(blank=True, null=True)
     gender_choices = [
         ('M', 'Male'),
@@ -84,6 +89,9 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         instance.profile.save()      
 
 
+track(Profile, 'profile_picture')
+
+
 class Address(BaseModel):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     title = models.CharField(max_length=100, blank=True, null=True)
@@ -95,6 +103,13 @@ class Address(BaseModel):
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
 
+    objects = GeoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='address_lat_lon_idx'),
+        ]
+
     def __str__(self):
         return self.title or "Address"
 
@@ -105,4 +120,41 @@ class ServiceReview(BaseModel):
     service = models.ForeignKey(Service, on_delete=models.SET_NULL,null=True,blank=True,related_name="product_reviews")
     rating = models.SmallIntegerField( default=0,validators=[MaxValueValidator(5),MinValueValidator(1)])
     comment = models.CharField(max_length=200)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+def adjust_review_aggregates(service_id, count, rating):
+    if service_id is not None and (count or rating):
+        Service.objects.filter(pk=service_id).update(
+            review_count=F('review_count') + count,
+            rating_sum=F('rating_sum') + rating,
+        )
+        # The update() above sends no signals; re-read the row into this worker's indexes and the others'
+        refresh_rows(Service, 'service', [service_id])
+
+
+@receiver(pre_save, sender=ServiceReview)
+def remember_previous_review(sender, instance, **kwargs):
+    instance._previous_review = None
+    if not instance._state.adding:
+        instance._previous_review = (
+            ServiceReview.objects.filter(pk=instance.pk).values_list('service_id', 'rating').first()
+        )
+
+
+@receiver(post_save, sender=ServiceReview)
+def update_review_aggregates(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_review', None)
+    if previous is not None:
+        previous_service_id, previous_rating = previous
+        if previous_service_id == instance.service_id:
+            adjust_review_aggregates(instance.service_id, 0, instance.rating - previous_rating)
+            return
+        # Moved to another service or detached with service=None
+        adjust_review_aggregates(previous_service_id, -1, -previous_rating)
+    adjust_review_aggregates(instance.service_id, 1, instance.rating)
+
+
+@receiver(post_delete, sender=ServiceReview)
+def remove_review_from_aggregates(sender, instance, **kwargs):
+    adjust_review_aggregates(instance.service_id, -1, -instance.rating)
@@ -2,6 +2,7 @@
 from rest_framework import serializers
 from .models import CustomUser,Profile,Address
 from django.core.validators import RegexValidator
+from base.renditions import RenditionsField
 
 class CustomRegisterSerializer(serializers.ModelSerializer):
     phone_number = serializers.CharField(
@@ -93,10 +94,12 @@ class UpdateEmailSerializer(serializers.ModelSerializer):
 
 
 class ProfileSerializer(serializers.ModelSerializer):
+    profile_picture_renditions = RenditionsField()
+
     class Meta:
         model = Profile
         fields = [
-            'user', 'bio', 'profile_picture', 'date_of_birth',
+            'user', 'bio', 'profile_picture', 'profile_picture_renditions', 'date_of_birth',
             'gender', 'phone_number','is_verified',
         ]
         read_only_fields = ['user']
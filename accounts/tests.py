@@ -1,7 +1,12 @@
 from django.test import TestCase
 from django.utils.timezone import now
 from uuid import uuid4
-from .models import CustomUser, OTP, Profile, Address
+from django.core.management import call_command
+from io import StringIO
+from service.autocomplete import autocomplete_index
+from service.facets import facet_index
+from service.models import Shop, Service
+from .models import CustomUser, OTP, Profile, Address, ServiceReview
 
 
 class CustomUserModelTestCase(TestCase):
@@ -107,3 +112,110 @@ class AddressModelTestCase(TestCase):
 
     def test_address_string_representation(self):
         self.assertEqual(str(self.address), "Home")
+
+
+class ServiceReviewAggregateTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="testuser@example.com",
+            phone_number="1234567890",
+            password="password123"
+        )
+        shop = Shop.objects.create(name="Test Salon", owner="Owner", address="Street")
+        self.service = Service.objects.create(shop=shop, service_name="Haircut", product_description="Cut")
+        self.other = Service.objects.create(shop=shop, service_name="Shave", product_description="Shave")
+
+    def review(self, rating, service=None):
+        return ServiceReview.objects.create(
+            user=self.user, service=service or self.service, rating=rating, comment="Nice"
+        )
+
+    def assertAggregates(self, service, count, total):
+        service.refresh_from_db()
+        self.assertEqual((service.review_count, service.rating_sum), (count, total))
+
+    def test_create_updates_aggregates(self):
+        self.review(4)
+        self.review(5)
+        self.assertAggregates(self.service, 2, 9)
+        self.assertEqual(self.service.total_reviews(), 2)
+        self.assertEqual(self.service.average_rating, 4.5)
+
+    def test_rating_change(self):
+        review = self.review(2)
+        review.rating = 5
+        review.save()
+        self.assertAggregates(self.service, 1, 5)
+
+    def test_move_and_detach(self):
+        review = self.review(3)
+        review.service = self.other
+        review.save()
+        self.assertAggregates(self.service, 0, 0)
+        self.assertAggregates(self.other, 1, 3)
+        review.service = None
+        review.save()
+        self.assertAggregates(self.other, 0, 0)
+        review.service = self.service
+        review.save()
+        self.assertAggregates(self.service, 1, 3)
+
+    def test_delete(self):
+        review = self.review(3)
+        self.review(4)
+        review.delete()
+        self.assertAggregates(self.service, 1, 4)
+        self.user.delete()
+        self.assertAggregates(self.service, 0, 0)
+
+    def test_deleted_service_detaches_reviews(self):
+        review = self.review(4)
+        self.service.delete()
+        review.refresh_from_db()
+        self.assertIsNone(review.service)
+        review.rating = 5
+        review.save()
+        self.assertAggregates(self.other, 0, 0)
+
+    def test_saving_a_stale_service_keeps_the_aggregates(self):
+        stale = Service.objects.get(pk=self.service.pk)
+        self.review(4)
+        stale.service_name = "Haircut & wash"
+        stale.save()
+        self.assertAggregates(self.service, 1, 4)
+        self.assertEqual(self.service.service_name, "Haircut & wash")
+
+    def test_review_counts_reach_this_workers_autocomplete(self):
+        self.service.is_publish = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.save()
+        autocomplete_index.invalidate()
+        self.assertEqual(autocomplete_index.complete("hair", ['service'])[0]['popularity'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(4)
+        self.assertEqual(autocomplete_index.complete("hair", ['service'])[0]['popularity'], 1)
+
+    def test_saving_a_stale_service_keeps_the_indexed_aggregates(self):
+        self.service.is_publish = True
+        self.service.dis_price = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.save()
+        facet_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.review(5)
+        self.assertEqual(facet_index.search({'rating': {5}})[0], 1)
+        self.service.dis_price = 120
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.save()
+        self.assertEqual(facet_index.search({'rating': {5}})[0], 1)
+
+    def test_no_reviews_average(self):
+        self.assertEqual(self.service.average_rating, 0)
+
+    def test_rebuild_command(self):
+        self.review(4)
+        self.review(2, service=self.other)
+        Service.objects.update(review_count=7, rating_sum=30)
+        call_command('rebuild_review_aggregates', batch_size=1, stdout=StringIO())
+        self.assertAggregates(self.service, 1, 4)
+        self.assertAggregates(self.other, 1, 2)
@@ -0,0 +1,210 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+
+
+class TwoTierCache:
+    """
+    A bounded in-process LRU tier in front of a shared Django cache.
+
+    Values are stored in both tiers as `(value, delta, expiry)`, where `delta` is
+    how long the value took to compute. `get_or_compute` recomputes one key at a
+    time: a thread in this process and a lease in the shared tier make one
+    caller do the work while the others wait for it, or keep the value they
+    already have. Values are recomputed a little before they expire, with a
+    probability that grows as expiry nears and with the cost of computing them
+    (probabilistic early expiration, "XFetch"), so hot keys rarely go cold.
+
+    Local entries live at most `local_timeout` seconds, so anything cached under
+    a key that can change is at most that old in other processes. Entries whose
+    key changes with their contents never go stale.
+    """
+
+    def __init__(self, alias='default', max_entries=1000, local_timeout=30, beta=1.0,
+                 lock_timeout=10, wait_interval=0.05):
+        self.alias = alias
+        self.max_entries = max_entries
+        self.local_timeout = local_timeout
+        self.beta = beta
+        self.lock_timeout = lock_timeout
+        self.wait_interval = wait_interval
+        self._local = OrderedDict()
+        self._flights = {}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def get(self, key, default=None):
+        item = self._lookup(key)
+        return default if item is None else item[0]
+
+    def set(self, key, value, timeout=None):
+        self._store(key, value, timeout, 0.0)
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        self.shared.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+            self._counts.clear()
+        self.shared.clear()
+
+    def get_or_compute(self, key, compute, timeout=None):
+        """
+        Return the cached value of `key`, calling `compute()` to fill it when missing or about to expire.
+
+        Args:
+            key (str): Cache key.
+            compute (callable): Builds the value; exceptions propagate and nothing is stored.
+            timeout (int): Lifetime in seconds; the shared cache's default when None.
+
+        Returns:
+            The cached or freshly computed value.
+        """
+        item = self._lookup(key)
+        if item is not None and not self._expires_early(item):
+            return item[0]
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = threading.Event()
+
+        if not leader:
+            # Another thread is computing this key
+            if item is not None:
+                self._count('stale_served')
+                return item[0]
+            flight.wait(self.lock_timeout)
+            item = self._lookup(key)
+            if item is not None:
+                self._count('coalesced')
+                return item[0]
+            return compute()
+
+        try:
+            return self._compute_leased(key, compute, timeout, item)
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.set()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+            local_entries = len(self._local)
+        lookups = counts.get('local_hits', 0) + counts.get('shared_hits', 0) + counts.get('misses', 0)
+        hits = lookups - counts.get('misses', 0)
+        return {
+            'local_hits': counts.get('local_hits', 0),
+            'shared_hits': counts.get('shared_hits', 0),
+            'misses': counts.get('misses', 0),
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'recomputes': counts.get('recomputes', 0),
+            'early_recomputes': counts.get('early_recomputes', 0),
+            'coalesced': counts.get('coalesced', 0),
+            'stale_served': counts.get('stale_served', 0),
+            'evictions': counts.get('evictions', 0),
+            'local_entries': local_entries,
+        }
+
+    def _compute_leased(self, key, compute, timeout, stale):
+        lease_key = f'{key}:lease'
+        leased = self.shared.add(lease_key, 1, self.lock_timeout)
+        if not leased:
+            # Another process holds the lease: keep what we have, or wait for its result
+            if stale is not None:
+                self._count('stale_served')
+                return stale[0]
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                item = self._get_shared(key)
+                if item is not None:
+                    self._set_local(key, item)
+                    self._count('coalesced')
+                    return item[0]
+        try:
+            started = time.perf_counter()
+            value = compute()
+            self._store(key, value, timeout, time.perf_counter() - started)
+            self._count('recomputes')
+            if stale is not None:
+                self._count('early_recomputes')
+            return value
+        finally:
+            if leased:
+                self.shared.delete(lease_key)
+
+    def _expires_early(self, item):
+        _, delta, expiry = item
+        if expiry is None or not delta:
+            return False
+        # 1 - random() lies in (0, 1], so the log is finite and <= 0
+        return time.time() - delta * self.beta * math.log(1.0 - random.random()) >= expiry
+
+    def _lookup(self, key):
+        item = self._get_local(key)
+        if item is not None:
+            self._count('local_hits')
+            return item
+        item = self._get_shared(key)
+        if item is not None:
+            self._set_local(key, item)
+            self._count('shared_hits')
+            return item
+        self._count('misses')
+        return None
+
+    def _get_shared(self, key):
+        item = self.shared.get(key)
+        if item is None or (item[2] is not None and item[2] <= time.time()):
+            return None
+        return item
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            local_expiry, item = entry
+            if local_expiry <= time.time():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return item
+
+    def _set_local(self, key, item):
+        local_expiry = time.time() + self.local_timeout
+        if item[2] is not None:
+            local_expiry = min(local_expiry, item[2])
+        with self._lock:
+            self._local[key] = (local_expiry, item)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._counts['evictions'] += 1
+
+    def _store(self, key, value, timeout, delta):
+        shared = self.shared
+        if timeout is None:
+            timeout = shared.default_timeout
+        expiry = None if timeout is None else time.time() + timeout
+        item = (value, delta, expiry)
+        shared.set(key, item, timeout)
+        self._set_local(key, item)
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
@@ -0,0 +1,47 @@
+import io
+
+from PIL import Image, ImageOps
+
+# format -> (Pillow format, file extension)
+FORMATS = {'webp': ('WEBP', 'webp'), 'jpeg': ('JPEG', 'jpg')}
+
+
+def render(data, specs, quality=80):
+    """
+    Resize and recompress an image.
+
+    Args:
+        data (bytes): The encoded source image.
+        specs (list): (format, width) pairs to produce. Images are never
+            upscaled, so widths past the source's keep its width.
+        quality (int): Encoder quality, 1 to 100.
+
+    Returns:
+        list: (format, width, bytes) for each of `specs`.
+
+    Runs in worker processes, so it imports nothing from Django.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        # Lets JPEGs decode at a fraction of their size; square so a rotation from EXIF can't undershoot
+        widest = max(width for _, width in specs)
+        source.draft('RGB', (widest, widest))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+        outputs = []
+        for format, width in specs:
+            pillow_format, _ = FORMATS[format]
+            if width < image.width:
+                resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            else:
+                resized = image
+            if pillow_format == 'JPEG' and resized.mode == 'RGBA':
+                # JPEG has no alpha; flatten onto white
+                background = Image.new('RGB', resized.size, (255, 255, 255))
+                background.paste(resized, mask=resized.getchannel('A'))
+                resized = background
+            buffer = io.BytesIO()
+            resized.save(buffer, pillow_format, quality=quality, optimize=pillow_format == 'JPEG', progressive=True)
+            outputs.append((format, width, buffer.getvalue()))
+        return outputs
@@ -1,8 +1,9 @@
 from django.db import models
-import uuid
+
+from .uuids import CompactUUIDField, uuid7
 
 class BaseModel(models.Model):
-    uid = models.UUIDField(primary_key=True,editable=False,default=uuid.uuid4)
+    uid = CompactUUIDField(primary_key=True,editable=False,default=uuid7)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
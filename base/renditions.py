@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
+from rest_framework import serializers
+
+from .images import FORMATS, render
+
+logger = logging.getLogger(__name__)
+
+
+def renditions_field(field):
+    # The JSONField next to an image field that records its renditions
+    return f'{field}_renditions'
+
+
+def rendition_name(digest, format, width, quality):
+    """
+    Storage name of one rendition of the image whose contents hash to `digest`.
+
+    The name changes with the contents and the encoding, so rendition files
+    never change and can be cached forever.
+    """
+    return f"renditions/{digest[:2]}/{digest[:32]}-{width}w-q{quality}.{FORMATS[format][1]}"
+
+
+class RenditionPipeline:
+    """
+    Makes resized, recompressed copies of uploaded images off the request path.
+
+    `schedule` queues a row's image once the transaction commits. A small
+    thread pool reads the source, skips renditions already in storage, has
+    a process pool resize and encode the rest with Pillow, saves them and
+    records their names on the row, provided the image hasn't changed
+    meanwhile. Running a job twice renders nothing the second time. With
+    `workers` 0 jobs run inline, in the caller.
+    """
+
+    def __init__(self):
+        # (model, field, on_done) of every tracked image field
+        self.tracked = []
+        self._threads = None
+        self._processes = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def workers(self):
+        return settings.IMAGE_RENDITION_WORKERS
+
+    def schedule(self, model, pk, field, on_done=None):
+        """
+        Generate the renditions of `field` of the `model` row `pk` after the current transaction commits.
+        """
+        transaction.on_commit(lambda: self.submit(model, pk, field, on_done))
+
+    def submit(self, model, pk, field, on_done=None, force=False):
+        """
+        Run a job now, in the thread pool; returns its future, or its result when jobs run inline.
+        """
+        if not self.workers:
+            return self.run(model, pk, field, on_done, force)
+        return self._pools()[0].submit(self.run, model, pk, field, on_done, force)
+
+    def run(self, model, pk, field, on_done=None, force=False):
+        """
+        `generate`, returning None rather than raising when it fails.
+        """
+        try:
+            changed = self.generate(model, pk, field, force)
+        except Exception:
+            logger.exception("Renditions of %s %s.%s failed", model.__name__, pk, field)
+            return None
+        finally:
+            if self.workers:
+                close_old_connections()
+        if changed and on_done:
+            on_done()
+        return changed
+
+    def generate(self, model, pk, field, force=False):
+        """
+        Bring the recorded renditions of one row's image up to date; returns whether they changed.
+
+        Rows already recorded for their current image are skipped unless
+        `force`, e.g. after the widths or formats were changed.
+        """
+        target = renditions_field(field)
+        row = model._default_manager.filter(pk=pk).values(field, target).first()
+        if row is None:
+            return False
+        name, recorded = row[field], row[target] or {}
+        if not name:
+            renditions = {}
+        elif recorded.get('source') == name and not force:
+            return False
+        else:
+            renditions = self.render(name)
+        if renditions == recorded:
+            return False
+        current = Q(**{field: name}) if name else Q(**{field: ''}) | Q(**{f'{field}__isnull': True})
+        # An image uploaded meanwhile has its own job
+        return bool(model._default_manager.filter(current, pk=pk).update(**{target: renditions}))
+
+    def render(self, name):
+        try:
+            with default_storage.open(name, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Recorded with no files so it isn't retried; a new upload gets a new job
+            logger.warning("Image %s is missing from storage", name)
+            return {'source': name, 'digest': None, 'files': {}}
+        digest = hashlib.sha256(data).hexdigest()
+        quality = settings.IMAGE_RENDITION_QUALITY
+        names = {
+            (format, width): rendition_name(digest, format, width, quality)
+            for format in settings.IMAGE_RENDITION_FORMATS for width in settings.IMAGE_RENDITION_WIDTHS
+        }
+        missing = [spec for spec, rendition in names.items() if not default_storage.exists(rendition)]
+        if missing:
+            if self.workers:
+                outputs = self._pools()[1].submit(render, data, missing, quality).result()
+            else:
+                outputs = render(data, missing, quality)
+            for format, width, content in outputs:
+                names[format, width] = default_storage.save(names[format, width], ContentFile(content))
+
+        files = {}
+        for (format, width), rendition in names.items():
+            files.setdefault(format, {})[str(width)] = rendition
+        return {'source': name, 'digest': digest, 'files': files}
+
+    def _pools(self):
+        with self._lock:
+            # Pools don't survive a fork, e.g. into a preforked server worker
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._threads = ThreadPoolExecutor(self.workers, thread_name_prefix='renditions')
+                self._processes = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._threads, self._processes
+
+
+renditions = RenditionPipeline()
+
+
+def track(model, field, on_done=None):
+    """
+    Keep renditions of the image `field` of `model` up to date as rows are saved.
+
+    Renditions are generated when a new image is uploaded and dropped when
+    it is cleared. Images set by name rather than uploaded, such as field
+    defaults, are left to the generate_renditions command. `on_done()` is called after a
+    row's renditions change, e.g. to drop cached responses that include them.
+    """
+    flag = f'_renditions_pending_{field}'
+    uid = f'renditions-{model._meta.label}-{field}'
+
+    def image_saving(sender, instance, **kwargs):
+        file = getattr(instance, field)
+        recorded = getattr(instance, renditions_field(field)) or {}
+        # An upload is committed to storage by the field's pre_save, after this runs
+        if (file and not file._committed) or (not file and recorded):
+            setattr(instance, flag, True)
+
+    def image_saved(sender, instance, **kwargs):
+        if instance.__dict__.pop(flag, False):
+            renditions.schedule(sender, instance.pk, field, on_done)
+
+    renditions.tracked.append((model, field, on_done))
+    pre_save.connect(image_saving, sender=model, weak=False, dispatch_uid=uid)
+    post_save.connect(image_saved, sender=model, weak=False, dispatch_uid=uid)
+
+
+class RenditionsField(serializers.Field):
+    """
+    URLs of an image's renditions by format and width, e.g. {"webp": {"320": "https://..."}}.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for format, files in (value or {}).get('files', {}).items():
+            urls[format] = {}
+            for width, name in files.items():
+                url = default_storage.url(name)
+                urls[format][width] = request.build_absolute_uri(url) if request else url
+        return urls
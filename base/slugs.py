@@ -0,0 +1,104 @@
+from django.db.models import Q
+from django.utils.text import slugify
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs for a model, many at a time.
+
+    The slugs already taken under a base are read with one query per batch of
+    new bases; after that the allocator remembers the highest suffix of each
+    base, so "glow-studio" is followed by "glow-studio-2", "glow-studio-3" and
+    so on without another lookup. Only that suffix is kept per base, so
+    memory grows with the number of distinct bases rather than with the
+    slugs handed out. Rows written by someone else after a base was read can
+    still collide; callers writing in a transaction can `forget` the values of
+    a failed batch and allocate again.
+    """
+
+    lookup_size = 200
+
+    def __init__(self, model, field='slug', fallback=None):
+        self.model = model
+        self.field = field
+        self.max_length = model._meta.get_field(field).max_length
+        self.fallback = fallback or model._meta.model_name
+        self.suffixes = {}
+        self.taken = set()
+
+    def base(self, value):
+        # Leave room for a "-123456" suffix
+        return (slugify(value or '')[:self.max_length - 7].strip('-') or self.fallback)
+
+    def allocate(self, values):
+        """
+        A unique slug for each of `values`, in order.
+        """
+        bases = [self.base(value) for value in values]
+        self.load({base for base in bases if base not in self.suffixes})
+        slugs = []
+        for base in bases:
+            suffix = self.suffixes[base]
+            slug = None
+            while slug is None or self.claimed(slug, base):
+                suffix += 1
+                slug = base if suffix == 1 else f"{base}-{suffix}"
+            self.suffixes[base] = suffix
+            slugs.append(slug)
+        return slugs
+
+    def claimed(self, slug, base):
+        # "glow-2" may already be the first slug of a name that slugifies to "glow-2", or the reverse
+        if slug in self.taken:
+            return True
+        if slug != base and self.suffixes.get(slug, 0) >= 1:
+            return True
+        head, _, suffix = slug.rpartition('-')
+        return head != base and suffix.isdigit() and self.suffixes.get(head, 0) >= int(suffix)
+
+    def reserve(self, slugs):
+        """
+        Mark the slugs given explicitly in the next chunk as taken so allocated ones don't reuse them.
+
+        Replaces the slugs of the previous chunk: once written they are read
+        like any other row, and the suffixes of bases already read are raised
+        past them here.
+        """
+        self.taken = set(slugs)
+        for slug in self.taken:
+            if slug in self.suffixes:
+                self.suffixes[slug] = max(self.suffixes[slug], 1)
+            head, _, suffix = slug.rpartition('-')
+            if head in self.suffixes and suffix.isdigit():
+                self.suffixes[head] = max(self.suffixes[head], int(suffix))
+
+    def forget(self, values):
+        for value in values:
+            self.suffixes.pop(self.base(value), None)
+
+    def load(self, bases):
+        if not bases:
+            return
+        bases = list(bases)
+        for base in bases:
+            self.suffixes[base] = 0
+        # A few hundred index range scans per query keeps the statement a sane size
+        for i in range(0, len(bases), self.lookup_size):
+            batch = set(bases[i:i + self.lookup_size])
+            lookup = Q()
+            for base in batch:
+                lookup |= Q(**{self.field: base}) | Q(**{f'{self.field}__startswith': f'{base}-'})
+            for slug in self.model._default_manager.filter(lookup).values_list(self.field, flat=True):
+                if slug in batch:
+                    self.suffixes[slug] = max(self.suffixes[slug], 1)
+                    continue
+                base, _, suffix = slug.rpartition('-')
+                if base in batch and suffix.isdigit():
+                    self.suffixes[base] = max(self.suffixes[base], int(suffix))
+
+
+def unique_slug(instance, value, field='slug'):
+    """
+    A slug for `instance` built from `value` that no other row of its model uses.
+    """
+    return SlugAllocator(type(instance), field).allocate([value])[0]
@@ -0,0 +1,152 @@
+import io
+import random
+import threading
+import time
+import uuid
+from unittest import mock
+
+from PIL import Image
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from .cache import TwoTierCache
+from .images import render
+from .uuids import CompactUUIDField, uuid7
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TwoTierCacheTest(SimpleTestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.cache = TwoTierCache(max_entries=2, local_timeout=30)
+
+    def test_local_tier_serves_repeat_reads(self):
+        compute = mock.Mock(return_value='value')
+        self.assertEqual(self.cache.get_or_compute('key', compute, 60), 'value')
+        self.assertEqual(self.cache.get_or_compute('key', compute, 60), 'value')
+        compute.assert_called_once()
+        stats = self.cache.stats()
+        self.assertEqual((stats['misses'], stats['local_hits'], stats['recomputes']), (1, 1, 1))
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_shared_tier_is_seen_by_other_processes(self):
+        self.cache.set('key', 'value', 60)
+        other = TwoTierCache()
+        self.assertEqual(other.get_or_compute('key', mock.Mock(), 60), 'value')
+        self.assertEqual(other.stats()['shared_hits'], 1)
+
+    def test_local_tier_is_bounded(self):
+        for key in ('a', 'b', 'c'):
+            self.cache.set(key, key, 60)
+        self.cache.get('b')
+        self.cache.set('d', 'd', 60)
+        stats = self.cache.stats()
+        self.assertEqual((stats['local_entries'], stats['evictions']), (2, 2))
+        self.assertEqual(list(self.cache._local), ['b', 'd'])
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.cache.get_or_compute('key', compute, 60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(self.cache.stats()['coalesced'], 7)
+
+    def test_waits_for_lease_held_by_another_process(self):
+        other = TwoTierCache()
+        caches['default'].add('key:lease', 1, 10)
+        timer = threading.Timer(0.1, other.set, args=('key', 'theirs', 60))
+        timer.start()
+        compute = mock.Mock(return_value='ours')
+        self.assertEqual(self.cache.get_or_compute('key', compute, 60), 'theirs')
+        timer.join()
+        compute.assert_not_called()
+
+    def test_recomputes_early_when_expiry_is_near(self):
+        self.cache._store('key', 'old', 1, 100.0)
+        with mock.patch('base.cache.random.random', return_value=0.5):
+            self.assertEqual(self.cache.get_or_compute('key', lambda: 'new', 60), 'new')
+        self.assertEqual(self.cache.stats()['early_recomputes'], 1)
+
+        # Far from expiry, cheap values are kept
+        self.cache._store('cheap', 'old', 3600, 0.001)
+        self.assertEqual(self.cache.get_or_compute('cheap', lambda: 'new', 60), 'old')
+
+    def test_failed_compute_stores_nothing_and_releases_lease(self):
+        with self.assertRaises(RuntimeError):
+            self.cache.get_or_compute('key', mock.Mock(side_effect=RuntimeError), 60)
+        self.assertIsNone(caches['default'].get('key:lease'))
+        self.assertEqual(self.cache.get_or_compute('key', lambda: 'value', 60), 'value')
+
+
+class ImageRenderTest(SimpleTestCase):
+    def encode(self, mode, size, format):
+        buffer = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, format)
+        return buffer.getvalue()
+
+    def test_resizes_to_each_width_and_format(self):
+        outputs = render(self.encode('RGB', (1600, 1200), 'JPEG'), [('webp', 320), ('jpeg', 640)])
+        self.assertEqual([(format, width) for format, width, _ in outputs], [('webp', 320), ('jpeg', 640)])
+        sizes = [(Image.open(io.BytesIO(data)).format, Image.open(io.BytesIO(data)).size) for _, _, data in outputs]
+        self.assertEqual(sizes, [('WEBP', (320, 240)), ('JPEG', (640, 480))])
+
+    def test_never_upscales_and_flattens_alpha_for_jpeg(self):
+        (_, _, webp), (_, _, jpeg) = render(self.encode('RGBA', (200, 100), 'PNG'), [('webp', 640), ('jpeg', 640)])
+        self.assertEqual(Image.open(io.BytesIO(webp)).size, (200, 100))
+        self.assertEqual(Image.open(io.BytesIO(webp)).mode, 'RGBA')
+        flattened = Image.open(io.BytesIO(jpeg))
+        self.assertEqual((flattened.size, flattened.mode), ((200, 100), 'RGB'))
+
+
+class UUID7Test(SimpleTestCase):
+    def test_values_are_version_7_and_increase(self):
+        values = [uuid7() for _ in range(10000)]
+        self.assertEqual({(value.version, value.variant) for value in values}, {(7, uuid.RFC_4122)})
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    @mock.patch('base.uuids._last', [0, 0])
+    def test_timestamp_leads_and_clock_going_back_keeps_order(self):
+        with mock.patch('base.uuids.time.time_ns', return_value=2_000_000_000_000 * 10 ** 6):
+            first = uuid7()
+        self.assertEqual(first.int >> 80, 2_000_000_000_000)
+        with mock.patch('base.uuids.time.time_ns', return_value=1_600_000_000_000 * 10 ** 6):
+            self.assertGreater(uuid7(), first)
+
+    def test_given_clock_and_rng_are_reproducible(self):
+        first = uuid7(1_700_000_000_000, random.Random(5))
+        self.assertEqual(first, uuid7(1_700_000_000_000, random.Random(5)))
+        self.assertEqual((first.version, first.int >> 80), (7, 1_700_000_000_000))
+        self.assertNotEqual(first, uuid7(1_700_000_000_000, random.Random(6)))
+
+
+@override_settings(UUID_STORAGE='binary')
+class CompactUUIDFieldTest(SimpleTestCase):
+    def test_binary_on_mysql_only(self):
+        field = CompactUUIDField()
+        value = uuid7()
+        mysql = mock.Mock(vendor='mysql', data_types={'UUIDField': 'char(32)'})
+        sqlite = mock.Mock(vendor='sqlite', data_types={'UUIDField': 'char(32)'},
+                           features=mock.Mock(has_native_uuid_field=False))
+        self.assertEqual((field.db_type(mysql), field.db_type(sqlite)), ('binary(16)', 'char(32)'))
+        self.assertEqual(field.get_db_prep_value(str(value), mysql), value.bytes)
+        self.assertEqual(field.get_db_prep_value(value, sqlite), value.hex)
+        self.assertEqual(field.from_db_value(value.bytes, None, mysql), value)
+        self.assertEqual(field.from_db_value(value.hex, None, sqlite), value)
+        with override_settings(UUID_STORAGE='char'):
+            self.assertEqual(field.db_type(mysql), 'char(32)')
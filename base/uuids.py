@@ -0,0 +1,98 @@
+import os
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+_lock = threading.Lock()
+# (milliseconds, counter) of the last value handed out
+_last = [0, 0]
+
+
+def uuid7(milliseconds=None, rng=None):
+    """
+    A time-ordered UUID, version 7 as in RFC 9562.
+
+    The first 48 bits are the Unix time in milliseconds, so rows created
+    later get larger keys and are appended to the end of a primary key
+    index instead of being scattered over it. A 12 bit counter, started at
+    a random value every millisecond, keeps the values of one process
+    increasing within a millisecond; the last 62 bits are random.
+
+    Args:
+        milliseconds (int): Time to use instead of the clock, e.g. for
+            reproducible data. The value then depends on it and `rng` only,
+            and the caller keeps successive values apart.
+        rng (random.Random): Source of the counter and random bits instead of
+            the random module and os.urandom.
+
+    Returns:
+        uuid.UUID: The new UUID.
+    """
+    if milliseconds is None:
+        with _lock:
+            milliseconds = time.time_ns() // 1_000_000
+            last, counter = _last
+            if milliseconds > last:
+                # Leaves at least 2048 increments before the counter runs out
+                counter = (rng or random).getrandbits(11)
+            else:
+                # Same millisecond, or the clock went back: keep counting from the last value
+                milliseconds, counter = last, counter + 1
+                if counter > 0xFFF:
+                    milliseconds, counter = last + 1, 0
+            _last[:] = milliseconds, counter
+    else:
+        counter = (rng or random).getrandbits(11)
+    bits = rng.getrandbits(62) if rng else int.from_bytes(os.urandom(8), 'big') >> 2
+    return uuid.UUID(int=(milliseconds & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | bits)
+
+
+class CompactUUIDField(models.UUIDField):
+    """
+    A UUIDField stored as BINARY(16) on MySQL when settings.UUID_STORAGE is 'binary'.
+
+    MySQL has no UUID type, so UUIDField stores 32 hex characters; 16 bytes
+    halve the primary key and every foreign key and secondary index that
+    repeats it. Foreign keys to the field follow its column type. Other
+    databases store it like UUIDField. Existing MySQL columns are converted
+    with the convert_uuid_storage command before the setting is switched.
+    """
+
+    def binary(self, connection):
+        return connection.vendor == 'mysql' and settings.UUID_STORAGE == 'binary'
+
+    def get_internal_type(self):
+        # Not "UUIDField", whose database converters expect hex strings
+        return 'CompactUUIDField'
+
+    def db_type(self, connection):
+        if self.binary(connection):
+            return 'binary(16)'
+        return connection.data_types['UUIDField']
+
+    def rel_db_type(self, connection):
+        return self.db_type(connection)
+
+    def cast_db_type(self, connection):
+        return self.db_type(connection)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if value is not None and self.binary(connection):
+            return self.to_python(value).bytes
+        return super().get_db_prep_value(value, connection, prepared)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, bytearray, memoryview)) and len(value) == 16:
+            return uuid.UUID(bytes=bytes(value))
+        return super().to_python(value)
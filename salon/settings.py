@@ -10,7 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os 
-from decouple import config
+from decouple import Csv, config
 from datetime import timedelta
 from pathlib import Path
 
@@ -58,6 +58,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'service.middleware.InvalidationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -193,6 +194,56 @@ FACEBOOK_OAUTH_CLIENT_SECRET = config('FACEBOOK_OAUTH_CLIENT_SECRET')
 
 GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY')
 
+# Distance Matrix client: destinations per request, parallel requests and timeouts in seconds
+DISTANCE_MATRIX_URL = config('DISTANCE_MATRIX_URL', default='https://maps.googleapis.com/maps/api/distancematrix/json')
+DISTANCE_MATRIX_BATCH_SIZE = config('DISTANCE_MATRIX_BATCH_SIZE', default=25, cast=int)
+DISTANCE_MATRIX_MAX_WORKERS = config('DISTANCE_MATRIX_MAX_WORKERS', default=4, cast=int)
+DISTANCE_MATRIX_CONNECT_TIMEOUT = config('DISTANCE_MATRIX_CONNECT_TIMEOUT', default=2.0, cast=float)
+DISTANCE_MATRIX_READ_TIMEOUT = config('DISTANCE_MATRIX_READ_TIMEOUT', default=5.0, cast=float)
+
+# Distance Matrix cache: origins are snapped to cells of this many degrees
+DISTANCE_CACHE_CELL_DEG = config('DISTANCE_CACHE_CELL_DEG', default=0.01, cast=float)
+DISTANCE_CACHE_TTL = config('DISTANCE_CACHE_TTL', default=3600, cast=int)
+DISTANCE_CACHE_MAX_ENTRIES = config('DISTANCE_CACHE_MAX_ENTRIES', default=100000, cast=int)
+
+# Shared by every gunicorn worker on the host; base.cache.TwoTierCache adds a per-process LRU in front
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default='/var/tmp/salon_cache'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int),
+        },
+    }
+}
+LOCAL_CACHE_MAX_ENTRIES = config('LOCAL_CACHE_MAX_ENTRIES', default=1000, cast=int)
+LOCAL_CACHE_TIMEOUT = config('LOCAL_CACHE_TIMEOUT', default=30, cast=int)
+
+# Cross-worker invalidation: seconds between polls, event retention and how long skipped ids are re-read
+INVALIDATION_POLL_INTERVAL = config('INVALIDATION_POLL_INTERVAL', default=1.0, cast=float)
+INVALIDATION_RETENTION = config('INVALIDATION_RETENTION', default=3600, cast=int)
+INVALIDATION_GAP_TIMEOUT = config('INVALIDATION_GAP_TIMEOUT', default=10.0, cast=float)
+
+# Rendered responses of read-mostly catalog views, keyed on per-model versions
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Service search: 'mysql' (FULLTEXT), 'python' (in-process index) or 'auto' to pick by database
+SEARCH_BACKEND = config('SEARCH_BACKEND', default='auto')
+
+# Most items accepted by one request to the batch write endpoints
+BATCH_WRITE_LIMIT = config('BATCH_WRITE_LIMIT', default=1000, cast=int)
+
+# Resized copies of uploaded images, made by this many processes per server process (0 renders inline)
+IMAGE_RENDITION_WIDTHS = config('IMAGE_RENDITION_WIDTHS', default='320,640,1280', cast=Csv(int))
+IMAGE_RENDITION_FORMATS = config('IMAGE_RENDITION_FORMATS', default='webp,jpeg', cast=Csv())
+IMAGE_RENDITION_QUALITY = config('IMAGE_RENDITION_QUALITY', default=80, cast=int)
+IMAGE_RENDITION_WORKERS = config('IMAGE_RENDITION_WORKERS', default=2, cast=int)
+
+# 'binary' stores UUID keys in 16 bytes rather than 32 hex characters on MySQL; run convert_uuid_storage first
+UUID_STORAGE = config('UUID_STORAGE', default='char')
+
 SOCIALACCOUNT_PROVIDERS = {
     "google": {
         "APPS": [
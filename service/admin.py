@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import Category, Shop, Service, TimeSlot, ServiceAddress, Coupon
+from .models import (
+    Category, Shop, Service, TimeSlot, ServiceAddress, Coupon, ScheduleRule, ScheduleException,
+    SlotInventory, Reservation,
+)
+from .search import search_services
 
 # Register the models with default admin configurations
 @admin.register(Category)
@@ -23,6 +27,14 @@ class ServiceAdmin(admin.ModelAdmin):
     list_filter = ('is_publish',)
     raw_id_fields = ('shop',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Served by the search index instead of icontains scans joined to the shop
+        if not search_term.strip():
+            return queryset, False
+        _, found = search_services(search_term, is_publish=None)
+        uids = [uid for uid, _ in found]
+        return queryset.filter(uid__in=uids), False
+
 
 @admin.register(TimeSlot)
 class TimeSlotAdmin(admin.ModelAdmin):
@@ -31,6 +43,37 @@ class TimeSlotAdmin(admin.ModelAdmin):
     raw_id_fields = ('service',)
 
 
+@admin.register(ScheduleRule)
+class ScheduleRuleAdmin(admin.ModelAdmin):
+    list_display = ('service', 'weekday', 'start_time', 'end_time', 'slot_minutes', 'valid_from', 'valid_until')
+    search_fields = ('service__service_name',)
+    list_filter = ('weekday',)
+    raw_id_fields = ('service',)
+
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('service', 'date', 'start_time', 'end_time', 'is_closed')
+    search_fields = ('service__service_name',)
+    list_filter = ('is_closed', 'date')
+    raw_id_fields = ('service',)
+
+
+@admin.register(SlotInventory)
+class SlotInventoryAdmin(admin.ModelAdmin):
+    list_display = ('time_slot', 'service', 'start_time', 'date', 'remaining')
+    list_filter = ('date',)
+    raw_id_fields = ('time_slot', 'service')
+
+
+@admin.register(Reservation)
+class ReservationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'time_slot', 'service', 'start_time', 'date', 'status', 'created_at')
+    search_fields = ('user__email', 'time_slot__service__service_name', 'service__service_name')
+    list_filter = ('status', 'date')
+    raw_id_fields = ('user', 'time_slot', 'service')
+
+
 @admin.register(ServiceAddress)
 class ServiceAddressAdmin(admin.ModelAdmin):
     list_display = ('city_name',)
@@ -0,0 +1,332 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.db.models import Count
+
+from .indexing import LazyIndex
+from .search import TOKEN_RE
+
+KINDS = ('service', 'shop', 'category', 'city')
+
+# Prefixes up to this many characters have their top results stored; longer ones cover few names
+PRECOMPUTED_LENGTH = 3
+TOP_N = 10
+
+# Names are also found by their later words, up to this many
+MAX_WORDS = 4
+
+
+def name_keys(name):
+    """
+    Lowercased keys a name is found under: the name itself, then from each later word on.
+    """
+    words = TOKEN_RE.findall((name or '').lower())
+    return {' '.join(words[i:]) for i in range(min(len(words), MAX_WORDS))}
+
+
+def short_prefixes(name):
+    """
+    The prefixes of up to PRECOMPUTED_LENGTH characters of every key of `name`.
+    """
+    return {key[:length] for key in name_keys(name) for length in range(1, min(len(key), PRECOMPUTED_LENGTH) + 1)}
+
+
+def normalize(prefix):
+    words = TOKEN_RE.findall(prefix.lower())
+    key = ' '.join(words)
+    # Keep the trailing space of "hair " so it doesn't match "haircut"
+    if key and not prefix[-1].isalnum():
+        key += ' '
+    return key
+
+
+class PrefixIndex:
+    """
+    Names of one kind as a sorted array of keys searched by bisection.
+
+    `top` holds the TOP_N most popular names of every prefix of up to
+    PRECOMPUTED_LENGTH characters, the ones that match most of the array;
+    longer prefixes cover a short run of keys that is ranked when asked for.
+    """
+
+    __slots__ = ('keys', 'ids', 'names', 'popularity', 'top')
+
+    def __init__(self):
+        self.keys, self.ids = [], []
+        self.names, self.popularity, self.top = {}, {}, {}
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Index from (id, name, popularity) rows in any order.
+        """
+        index = cls()
+        pairs = []
+        for uid, name, popularity in rows:
+            index.names[uid] = name
+            index.popularity[uid] = popularity
+            pairs.extend((key, uid) for key in name_keys(name))
+        pairs.sort(key=lambda pair: pair[0])
+        index.keys = [key for key, _ in pairs]
+        index.ids = [uid for _, uid in pairs]
+
+        for length in range(1, PRECOMPUTED_LENGTH + 1):
+            start = 0
+            while start < len(index.keys):
+                prefix = index.keys[start][:length]
+                stop = bisect_left(index.keys, prefix + '\uffff', start)
+                index.top[prefix] = index._rank(start, stop, TOP_N)
+                start = stop
+        return index
+
+    def add(self, uid, name, popularity):
+        old_name = self.names.get(uid)
+        if old_name is not None:
+            old_rank = self._key(uid)
+            self._unlink(uid, old_name)
+        self.names[uid] = name
+        self.popularity[uid] = popularity
+        for key in name_keys(name):
+            i = bisect_left(self.keys, key)
+            self.keys.insert(i, key)
+            self.ids.insert(i, uid)
+        kept = set()
+        if old_name is not None:
+            kept = short_prefixes(old_name) & short_prefixes(name)
+            for prefix in short_prefixes(old_name) - kept:
+                self._drop(prefix, uid)
+        for prefix in short_prefixes(name):
+            self._place(prefix, uid, demoted=prefix in kept and self._key(uid) > old_rank)
+
+    def remove(self, uid):
+        name = self.names.get(uid)
+        if name is None:
+            return
+        self._unlink(uid, name)
+        del self.names[uid], self.popularity[uid]
+        for prefix in short_prefixes(name):
+            self._drop(prefix, uid)
+
+    def reweigh(self, uid, popularity):
+        if uid in self.names and self.popularity[uid] != popularity:
+            demoted = popularity < self.popularity[uid]
+            self.popularity[uid] = popularity
+            for prefix in short_prefixes(self.names[uid]):
+                self._place(prefix, uid, demoted)
+
+    def complete(self, prefix, limit=TOP_N):
+        """
+        (popularity, id, name) of the most popular names starting with `prefix`.
+        """
+        if len(prefix) <= PRECOMPUTED_LENGTH and limit <= TOP_N:
+            ranked = self.top.get(prefix, [])[:limit]
+        else:
+            start = bisect_left(self.keys, prefix)
+            ranked = self._rank(start, bisect_left(self.keys, prefix + '\uffff', start), limit)
+        return [(self.popularity[uid], uid, self.names[uid]) for uid in ranked]
+
+    def _key(self, uid):
+        return -self.popularity[uid], self.names[uid], uid
+
+    def _rank(self, start, stop, limit):
+        candidates = set(self.ids[start:stop])
+        return heapq.nsmallest(limit, candidates, key=self._key)
+
+    def _rerank(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        ranked = self._rank(start, bisect_left(self.keys, prefix + '\uffff', start), TOP_N)
+        if ranked:
+            self.top[prefix] = ranked
+        else:
+            self.top.pop(prefix, None)
+
+    def _unlink(self, uid, name):
+        for key in name_keys(name):
+            i = bisect_left(self.keys, key)
+            while i < len(self.keys) and self.ids[i] != uid:
+                i += 1
+            if i < len(self.keys):
+                del self.keys[i], self.ids[i]
+
+    def _place(self, prefix, uid, demoted=False):
+        # Only a name that drops to the end of a full list can be overtaken by one outside it
+        top = self.top.setdefault(prefix, [])
+        listed = uid in top
+        full = len(top) >= TOP_N
+        if listed:
+            top.remove(uid)
+        elif full and self._key(uid) > self._key(top[-1]):
+            return
+        insort(top, uid, key=self._key)
+        del top[TOP_N:]
+        if listed and full and demoted and top[-1] == uid:
+            self._rerank(prefix)
+
+    def _drop(self, prefix, uid):
+        # A full list refills from the whole prefix; a shorter one already held every name under it
+        top = self.top.get(prefix)
+        if not top or uid not in top:
+            return
+        if len(top) >= TOP_N:
+            self._rerank(prefix)
+            return
+        top.remove(uid)
+        if not top:
+            del self.top[prefix]
+
+
+class AutocompleteIndex(LazyIndex):
+    """
+    Process-local type-ahead over service, shop, category and city names.
+
+    Services rank by review count, shops and categories by their number of
+    published services, and cities by their number of categories. Loaded
+    lazily from the database on first use, then kept current by the signal
+    handlers one row at a time; `invalidate()` drops it so the next query
+    reloads everything, e.g. after bulk writes. Review counts are updated
+    with F() expressions rather than saves, so the review handlers publish
+    the service on the invalidation bus, which refreshes its row here and
+    in every other worker.
+    """
+
+    def _load(self):
+        from .models import Category, Service, ServiceAddress, Shop
+
+        return AutocompleteState.build(
+            Service.objects.values_list(
+                'uid', 'service_name', 'shop_id', 'category_id', 'is_publish', 'review_count',
+            ).iterator(chunk_size=10000),
+            Shop.objects.values_list('uid', 'name', 'is_active').iterator(chunk_size=10000),
+            Category.objects.values_list('uid', 'category_name', 'is_publish').iterator(chunk_size=10000),
+            ServiceAddress.objects.annotate(
+                categories=Count('category'),
+            ).values_list('uid', 'city_name', 'categories').iterator(chunk_size=10000),
+        )
+
+    def update_service(self, uid, name, shop_id, category_id, is_publish, review_count):
+        self._apply('set_service', uid, name, shop_id, category_id, is_publish, review_count)
+
+    def remove_service(self, uid):
+        self._apply('remove_service', uid)
+
+    def update_shop(self, uid, name, is_active):
+        self._apply('set_shop', uid, name, is_active)
+
+    def remove_shop(self, uid):
+        self._apply('remove', 'shop', uid)
+
+    def update_category(self, uid, name, is_publish):
+        self._apply('set_category', uid, name, is_publish)
+
+    def remove_category(self, uid):
+        self._apply('remove', 'category', uid)
+
+    def update_city(self, uid, name, categories):
+        self._apply('set_city', uid, name, categories)
+
+    def remove_city(self, uid):
+        self._apply('remove', 'city', uid)
+
+    def complete(self, prefix, kinds=KINDS, limit=TOP_N):
+        """
+        The most popular names of the given kinds starting with `prefix`.
+
+        Returns:
+            list: {'kind', 'uid', 'name', 'popularity'} dicts, most popular first.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        state = self.state()
+        with self._lock:
+            found = []
+            for kind in kinds:
+                found.extend((popularity, kind, uid, name)
+                             for popularity, uid, name in state.indexes[kind].complete(prefix, limit))
+        found = heapq.nsmallest(limit, found, key=lambda row: (-row[0], row[3], row[1]))
+        return [{'kind': kind, 'uid': uid, 'name': name, 'popularity': popularity}
+                for popularity, kind, uid, name in found]
+
+
+class AutocompleteState:
+    """
+    One PrefixIndex per kind and the published service counts behind shop and
+    category popularity; guarded by AutocompleteIndex's lock.
+    """
+
+    def __init__(self):
+        self.indexes = {kind: PrefixIndex() for kind in KINDS}
+        self.services = {}
+        self.counts = Counter()
+
+    @classmethod
+    def build(cls, services, shops, categories, cities):
+        """
+        State from (uid, name, shop_id, category_id, is_publish, review_count) service rows,
+        (uid, name, is_active) shop rows, (uid, name, is_publish) category rows and
+        (uid, name, categories) city rows.
+        """
+        state = cls()
+        service_rows = []
+        for uid, name, shop_id, category_id, is_publish, review_count in services:
+            if is_publish:
+                state.link(uid, shop_id, category_id)
+                service_rows.append((uid, name, review_count))
+        state.indexes['service'] = PrefixIndex.build(service_rows)
+        for kind, rows in (('shop', shops), ('category', categories)):
+            state.indexes[kind] = PrefixIndex.build(
+                (uid, name, state.counts[kind, uid]) for uid, name, shown in rows if shown
+            )
+        state.indexes['city'] = PrefixIndex.build(cities)
+        return state
+
+    def link(self, uid, shop_id, category_id):
+        self.services[uid] = (shop_id, category_id)
+        self.counts['shop', shop_id] += 1
+        self.counts['category', category_id] += 1
+
+    def set_service(self, uid, name, shop_id, category_id, is_publish, review_count):
+        self.remove_service(uid)
+        if not is_publish:
+            return
+        self.link(uid, shop_id, category_id)
+        self.indexes['service'].add(uid, name, review_count)
+        self._reweigh(shop_id, category_id)
+
+    def remove_service(self, uid):
+        self.indexes['service'].remove(uid)
+        links = self.services.pop(uid, None)
+        if links is not None:
+            shop_id, category_id = links
+            self.counts['shop', shop_id] -= 1
+            self.counts['category', category_id] -= 1
+            self._reweigh(shop_id, category_id)
+
+    def _reweigh(self, shop_id, category_id):
+        self.indexes['shop'].reweigh(shop_id, self.counts['shop', shop_id])
+        self.indexes['category'].reweigh(category_id, self.counts['category', category_id])
+
+    def set_shop(self, uid, name, is_active):
+        self._set('shop', uid, name, is_active)
+
+    def set_category(self, uid, name, is_publish):
+        self._set('category', uid, name, is_publish)
+
+    def _set(self, kind, uid, name, shown):
+        if shown:
+            self.indexes[kind].add(uid, name, self.counts[kind, uid])
+        else:
+            self.indexes[kind].remove(uid)
+
+    def set_city(self, uid, name, categories):
+        self.indexes['city'].add(uid, name, categories)
+
+    def remove(self, kind, uid):
+        self.indexes[kind].remove(uid)
+
+
+autocomplete_index = AutocompleteIndex()
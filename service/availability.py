@@ -0,0 +1,251 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from django.utils.dateparse import parse_time
+
+from .indexing import LazyIndex
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    # Instances created with string times keep them until reloaded
+    if isinstance(value, str):
+        value = parse_time(value)
+    return value.hour * 60 + value.minute
+
+
+def slot_minutes(start_time, end_time):
+    """
+    Slot as (start, end) minutes after midnight; a slot ending past midnight ends after 1440.
+    """
+    start, end = to_minutes(start_time), to_minutes(end_time)
+    if end <= start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+class ServiceSlots:
+    """
+    The time slots of one service as an interval index.
+
+    Slots are kept sorted by start next to `min_end`, where `min_end[i]` is the
+    earliest end among slots `i..`. A slot that fits in [lo, hi] ends by `hi`
+    and so starts before it, which makes "is anything free in [lo, hi]" one
+    bisect and one lookup.
+    """
+
+    __slots__ = ('starts', 'ends', 'keys', 'min_end')
+
+    def __init__(self):
+        self.starts, self.ends, self.keys, self.min_end = [], [], [], []
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, rows):
+        """
+        Index from (key, start, end) rows in any order.
+        """
+        slots = cls()
+        rows = sorted(rows, key=lambda row: row[1])
+        slots.keys = [row[0] for row in rows]
+        slots.starts = [row[1] for row in rows]
+        slots.ends = [row[2] for row in rows]
+        slots._rebuild_min_end()
+        return slots
+
+    def add(self, key, start, end):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.keys.insert(i, key)
+        self._rebuild_min_end()
+
+    def remove(self, key, start):
+        i = bisect_left(self.starts, start)
+        while i < len(self.keys) and self.keys[i] != key:
+            i += 1
+        if i == len(self.keys):
+            return
+        del self.starts[i], self.ends[i], self.keys[i]
+        self._rebuild_min_end()
+
+    def has_free(self, lo, hi):
+        i = bisect_left(self.starts, lo)
+        return i < len(self.min_end) and self.min_end[i] <= hi
+
+    def free(self, lo, hi, limit=None, exclude=()):
+        """
+        (key, start, end) of the slots inside [lo, hi] whose key is not in `exclude`, earliest first.
+        """
+        found = []
+        i = bisect_left(self.starts, lo)
+        if i == len(self.min_end) or self.min_end[i] > hi:
+            return found
+        stop = bisect_right(self.starts, hi)
+        for j in range(i, stop):
+            if self.ends[j] <= hi and self.keys[j] not in exclude:
+                found.append((self.keys[j], self.starts[j], self.ends[j]))
+                if limit and len(found) == limit:
+                    break
+        return found
+
+    def _rebuild_min_end(self):
+        running = float('inf')
+        min_end = [0] * len(self.ends)
+        for j in range(len(self.ends) - 1, -1, -1):
+            running = min(running, self.ends[j])
+            min_end[j] = running
+        self.min_end = min_end
+
+
+class AvailabilityIndex(LazyIndex):
+    """
+    Process-local index of free time slots by service, shop and category.
+
+    Loaded lazily from the database on first use, then kept current by the
+    TimeSlot and Service signal handlers one row at a time; `invalidate()`
+    drops it so the next query reloads everything, e.g. after bulk writes.
+    """
+
+    def _load(self):
+        from .models import Service, TimeSlot
+
+        services = Service.objects.values_list('uid', 'shop_id', 'category_id', 'is_publish')
+        slots = TimeSlot.objects.values_list('uid', 'service_id', 'start_time', 'end_time')
+        return AvailabilityState.build(
+            services.iterator(chunk_size=10000),
+            (
+                (uid, service_id, *slot_minutes(start_time, end_time))
+                for uid, service_id, start_time, end_time in slots.iterator(chunk_size=10000)
+            ),
+        )
+
+    def update_slot(self, uid, service_id, start_time, end_time):
+        self._apply('set_slot', uid, service_id, *slot_minutes(start_time, end_time))
+
+    def remove_slot(self, uid):
+        self._apply('remove_slot', uid)
+
+    def update_service(self, uid, shop_id, category_id, is_publish):
+        self._apply('set_service', uid, shop_id, category_id, is_publish)
+
+    def remove_service(self, uid):
+        self._apply('remove_service', uid)
+
+    def candidates(self, services=None, category=None, shops=None):
+        """
+        Uids of the published services matching the filters, with or without slots.
+        """
+        state = self.state()
+        with self._lock:
+            return set(state.candidates(services, category, shops))
+
+    def search(self, lo, hi, services=None, category=None, shops=None, slots_per_service=3, exclude=()):
+        """
+        Published services with a slot inside [lo, hi] minutes after midnight.
+
+        Args:
+            services (iterable): Only consider these service uids.
+            category: Only services in this category.
+            shops (iterable): Only services of these shops.
+            exclude (set): Slot uids to skip, e.g. ones sold out on the day asked for.
+
+        Returns:
+            dict: service uid -> list of (slot uid, start, end), earliest first;
+            services whose slots are all excluded are left out.
+        """
+        state = self.state()
+        with self._lock:
+            candidates = state.candidates(services, category, shops)
+            found = {}
+            for uid in candidates:
+                slots = state.slots.get(uid)
+                if slots is not None and slots.has_free(lo, hi):
+                    free = slots.free(lo, hi, slots_per_service, exclude)
+                    if free:
+                        found[uid] = free
+            return found
+
+
+class AvailabilityState:
+    """
+    Services by shop and category, and their slots; guarded by AvailabilityIndex's lock.
+    """
+
+    def __init__(self):
+        self.services = {}
+        self.slots = {}
+        self.slot_of = {}
+        self.by_shop = defaultdict(set)
+        self.by_category = defaultdict(set)
+        self.published = set()
+
+    @classmethod
+    def build(cls, services, slots):
+        """
+        State from (uid, shop_id, category_id, is_publish) and (uid, service_id, start, end) rows.
+        """
+        state = cls()
+        for service in services:
+            state.set_service(*service)
+        rows = defaultdict(list)
+        for uid, service_id, start, end in slots:
+            rows[service_id].append((uid, start, end))
+            state.slot_of[uid] = (service_id, start)
+        state.slots = {service_id: ServiceSlots.build(service_slots) for service_id, service_slots in rows.items()}
+        return state
+
+    def set_service(self, uid, shop_id, category_id, is_publish):
+        self.remove_service(uid, keep_slots=True)
+        self.services[uid] = (shop_id, category_id)
+        self.by_shop[shop_id].add(uid)
+        self.by_category[category_id].add(uid)
+        if is_publish:
+            self.published.add(uid)
+
+    def remove_service(self, uid, keep_slots=False):
+        previous = self.services.pop(uid, None)
+        if previous is not None:
+            shop_id, category_id = previous
+            self.by_shop[shop_id].discard(uid)
+            self.by_category[category_id].discard(uid)
+        self.published.discard(uid)
+        if not keep_slots:
+            slots = self.slots.pop(uid, None)
+            for key in slots.keys if slots is not None else ():
+                self.slot_of.pop(key, None)
+
+    def set_slot(self, uid, service_id, start, end):
+        self.remove_slot(uid)
+        slots = self.slots.get(service_id)
+        if slots is None:
+            slots = self.slots[service_id] = ServiceSlots()
+        slots.add(uid, start, end)
+        self.slot_of[uid] = (service_id, start)
+
+    def remove_slot(self, uid):
+        previous = self.slot_of.pop(uid, None)
+        if previous is None:
+            return
+        service_id, start = previous
+        slots = self.slots.get(service_id)
+        if slots is not None:
+            slots.remove(uid, start)
+            if not slots:
+                del self.slots[service_id]
+
+    def candidates(self, services, category, shops):
+        candidates = self.published
+        if category is not None:
+            candidates = candidates & self.by_category.get(category, set())
+        if shops is not None:
+            candidates = candidates & set().union(*(self.by_shop.get(shop, ()) for shop in shops))
+        if services is not None:
+            candidates = candidates & set(services)
+        return candidates
+
+
+availability_index = AvailabilityIndex()
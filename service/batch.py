@@ -0,0 +1,61 @@
+import uuid
+
+from django.db import transaction
+
+from .catalog import IMPORTERS
+from .signals import refresh_rows
+
+# Catalog kinds with batch endpoints; each is also the invalidation topic of its model
+KINDS = ('service', 'time_slot')
+
+
+def write_batch(kind, items, mode):
+    """
+    Create (mode 'create') or update (mode 'update') a list of `kind` items.
+
+    Items are dicts of the columns the catalog importer takes. All of them
+    are converted and checked first, with references and uids looked up in
+    a few queries; the valid ones are then written with bulk_create and
+    bulk_update in one transaction. Returns one result per item, in order.
+    """
+    importer = IMPORTERS[kind](chunk_size=max(len(items), 1), max_errors=None, mode=mode)
+    chunk = [(index, item if isinstance(item, dict) else None) for index, item in enumerate(items)]
+    with transaction.atomic():
+        written = importer.write(chunk)
+        refresh_rows(importer.model, kind, [uid for _, _, uid in written])
+    results = [None] * len(items)
+    for index, outcome, uid in written:
+        results[index] = {'index': index, 'status': outcome, 'uid': uid}
+    for error in importer.report['errors']:
+        results[error['line']] = {'index': error['line'], 'status': 'failed', 'error': error['error']}
+    return results
+
+
+def delete_batch(kind, items):
+    """
+    Delete the `kind` rows whose uids are listed in `items`, given as strings or as {"uid": ...}.
+
+    The rows are deleted with one queryset delete, in one transaction.
+    Returns one result per item, in order.
+    """
+    model = IMPORTERS[kind].model
+    results, wanted = [], {}
+    for index, item in enumerate(items):
+        value = item.get('uid') if isinstance(item, dict) else item
+        try:
+            wanted[index] = uuid.UUID(str(value))
+        except ValueError:
+            results.append({'index': index, 'status': 'failed', 'error': "uid: must be a UUID"})
+            continue
+        results.append(None)
+
+    with transaction.atomic():
+        found = set(model.objects.filter(uid__in=set(wanted.values())).values_list('uid', flat=True))
+        # Per-row post_delete signals keep the indexes in step
+        model.objects.filter(uid__in=found).delete()
+    for index, uid in wanted.items():
+        if uid in found:
+            results[index] = {'index': index, 'status': 'deleted', 'uid': uid}
+        else:
+            results[index] = {'index': index, 'status': 'failed', 'error': "uid: not found"}
+    return results
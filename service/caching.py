@@ -0,0 +1,116 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from base.cache import TwoTierCache
+
+VERSION_KEY = 'model-version:{}'
+
+# Entry keys embed the model versions, so the local tier can never serve a stale entry
+response_cache = TwoTierCache(
+    alias=settings.RESPONSE_CACHE_ALIAS,
+    max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+    local_timeout=settings.LOCAL_CACHE_TIMEOUT,
+)
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def model_versions(models):
+    """
+    Current version token of each model, read from the shared cache.
+
+    Versions are random tokens rather than counters: shared backends do not
+    increment atomically, and a token that was evicted is replaced by one no
+    earlier entry used, so a stale entry can never become current again.
+    """
+    cache = get_cache()
+    keys = [VERSION_KEY.format(model._meta.label_lower) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_model_version(model):
+    """
+    Invalidate every cached response built from `model` once the current transaction commits.
+
+    Bumping before the commit would let a concurrent request cache pre-commit
+    rows under the new version.
+    """
+    key = VERSION_KEY.format(model._meta.label_lower)
+
+    transaction.on_commit(lambda: get_cache().set(key, uuid.uuid4().hex, None))
+
+
+class CachedResponse(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class VersionedCacheMixin:
+    """
+    Opt-in cache of rendered GET responses for DRF views.
+
+    Entries are keyed on the host, full path, accepted media type and the
+    versions of `cache_models`; a write to any of those models bumps its
+    version, so a stale entry is never looked up again. Entries live in
+    `response_cache`, which lets one request per key render a missing entry
+    while concurrent ones wait for it. `cache_actions` limits caching to some
+    viewset actions; empty caches every GET.
+    """
+    cache_models = ()
+    cache_actions = ()
+    cache_timeout = None
+
+    def should_cache(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        return not self.cache_actions or getattr(self, 'action', None) in self.cache_actions
+
+    def get_response_cache_key(self, request):
+        versions = model_versions(self.cache_models)
+        raw = '|'.join([
+            request.get_host(), request.get_full_path(), request.accepted_media_type,
+            *(str(version) for version in versions),
+        ])
+        return 'response:' + hashlib.sha256(raw.encode()).hexdigest()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if not self.should_cache(request):
+            return
+        state = {'hit': True}
+
+        def render():
+            state['hit'] = False
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = self.finalize_response(request, handler(request, *args, **kwargs), *args, **kwargs)
+            if response.status_code != 200:
+                # Not cacheable; hand it straight back to the client
+                raise CachedResponse(response)
+            response.render()
+            return response.content, response['Content-Type']
+
+        timeout = self.cache_timeout if self.cache_timeout is not None else settings.RESPONSE_CACHE_TIMEOUT
+        content, content_type = response_cache.get_or_compute(
+            self.get_response_cache_key(request), render, timeout
+        )
+        response = HttpResponse(content, content_type=content_type)
+        response['X-Response-Cache'] = 'HIT' if state['hit'] else 'MISS'
+        # Skips the handler; handle_exception hands the response back
+        raise CachedResponse(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, CachedResponse):
+            return exc.response
+        return super().handle_exception(exc)
@@ -0,0 +1,340 @@
+import csv
+import json
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+from base.slugs import SlugAllocator
+from .models import Category, Service, Shop, TimeSlot
+from .signals import refresh_after_bulk_write
+
+FORMATS = ('csv', 'ndjson')
+
+TRUE = {'1', 'true', 'yes', 'y', 't'}
+FALSE = {'0', 'false', 'no', 'n', 'f'}
+
+
+class RowError(Exception):
+    pass
+
+
+def read_rows(lines, format):
+    """
+    Yield (line number, row) from text lines of CSV with a header or of one JSON object per line.
+
+    Rows that aren't JSON objects are yielded as None.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def format_for(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'ndjson'
+
+
+def blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def text(value):
+    return str(value).strip()
+
+
+def boolean(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE:
+        return True
+    if value in FALSE:
+        return False
+    raise ValueError("must be true or false")
+
+
+def decimal(value):
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError("must be a number")
+
+
+def integer(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ValueError("must be a whole number")
+
+
+def clock(value):
+    parsed = parse_time(str(value).strip())
+    if parsed is None:
+        raise ValueError("must be a time as HH:MM")
+    return parsed
+
+
+class CatalogImporter:
+    """
+    Streams rows of one model into the database in chunks.
+
+    Rows are converted without touching the database, then each chunk
+    resolves its references and existing uids in a few queries and is
+    written with bulk_create/bulk_update in its own transaction. Rows whose
+    `uid` exists are updated with the columns they carry; the others are
+    created, with model defaults for what they leave out. Bad rows are
+    reported by line and skipped, so one typo doesn't sink an import.
+
+    `mode` 'create' or 'update' rejects rows whose uid does or doesn't
+    exist instead of upserting them; `max_errors` None keeps every error.
+    """
+
+    model = None
+    # column -> converter; references are given by uid or slug
+    fields = {}
+    references = {}
+    required = ()
+    slug_source = None
+
+    def __init__(self, chunk_size=1000, max_errors=100, progress=None, mode='upsert'):
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+        self.mode = mode
+        self.progress = progress
+        self.slugs = SlugAllocator(self.model) if self.slug_source else None
+        self.report = {'created': 0, 'updated': 0, 'failed': 0, 'errors': [], 'elapsed': 0.0, 'rows_per_second': 0}
+
+    def run(self, rows):
+        """
+        Import (line number, row) pairs; returns the report.
+        """
+        started = time.perf_counter()
+        rows = iter(rows)
+        try:
+            while chunk := list(islice(rows, self.chunk_size)):
+                self.write(chunk)
+                elapsed = time.perf_counter() - started
+                processed = self.report['created'] + self.report['updated'] + self.report['failed']
+                self.report['elapsed'] = round(elapsed, 3)
+                self.report['rows_per_second'] = round(processed / elapsed) if elapsed else 0
+                if self.progress:
+                    self.progress(self.report)
+        finally:
+            # bulk_create and bulk_update send no signals
+            if self.report['created'] or self.report['updated']:
+                refresh_after_bulk_write()
+        return self.report
+
+    def fail(self, number, message):
+        self.report['failed'] += 1
+        if self.max_errors is None or len(self.report['errors']) < self.max_errors:
+            self.report['errors'].append({'line': number, 'error': message})
+
+    def convert(self, row):
+        """
+        (uid or None, {field: value}) of the non-blank columns of a row.
+        """
+        uid = None
+        if not blank(row.get('uid')):
+            try:
+                uid = uuid.UUID(text(row['uid']))
+            except ValueError:
+                raise RowError("uid: must be a UUID")
+        values = {}
+        for field, converter in self.fields.items():
+            if field in row and not blank(row[field]):
+                try:
+                    values[field] = converter(row[field])
+                except ValueError as e:
+                    raise RowError(f"{field}: {e}")
+            elif field in row and uid is not None:
+                # A blank column clears the field of an existing row
+                values[field] = None
+        for field in self.references:
+            if not blank(row.get(field)):
+                values[field] = text(row[field]).lower()
+        return uid, values
+
+    def resolve(self, parsed):
+        """
+        Replace references by uid or slug with the uids they point at, dropping rows whose target is missing.
+        """
+        for field, model in self.references.items():
+            wanted = {values[field] for _, _, values in parsed if field in values}
+            if not wanted:
+                continue
+            uids = set()
+            for value in wanted:
+                try:
+                    uids.add(uuid.UUID(value))
+                except ValueError:
+                    pass
+            found = {}
+            for uid, slug in model.objects.filter(Q(uid__in=uids) | Q(slug__in=wanted)).values_list('uid', 'slug'):
+                found[str(uid)] = uid
+                if slug:
+                    found[slug] = uid
+            kept = []
+            for number, uid, values in parsed:
+                if field in values:
+                    value = values.pop(field)
+                    if value not in found:
+                        self.fail(number, f"{field}: no {model._meta.verbose_name} with uid or slug {value!r}")
+                        continue
+                    values[f'{field}_id'] = found[value]
+                kept.append((number, uid, values))
+            parsed = kept
+        return parsed
+
+    def write(self, chunk):
+        """
+        Write a chunk of (line number, row) pairs.
+
+        Returns (line number, 'created' or 'updated', uid) for each row written.
+        """
+        parsed, uids = [], set()
+        for number, row in chunk:
+            if row is None:
+                self.fail(number, "not a JSON object")
+                continue
+            try:
+                uid, values = self.convert(row)
+            except RowError as e:
+                self.fail(number, str(e))
+                continue
+            if uid is not None and uid in uids:
+                self.fail(number, "uid: appears more than once")
+                continue
+            uids.add(uid)
+            parsed.append((number, uid, values))
+        parsed = self.resolve(parsed)
+        existing = set(self.model.objects.filter(
+            uid__in=[uid for _, uid, _ in parsed if uid is not None]
+        ).values_list('uid', flat=True))
+        if self.slugs:
+            parsed = self.check_slugs(parsed)
+
+        creates, updates = [], []
+        for number, uid, values in parsed:
+            if self.mode == 'create' and uid in existing:
+                self.fail(number, "uid: already exists")
+                continue
+            if self.mode == 'update' and uid not in existing:
+                self.fail(number, "uid: is required" if uid is None else "uid: not found")
+                continue
+            if uid not in existing:
+                missing = [field for field in self.required
+                           if values.get(field if field in self.fields else f'{field}_id') is None]
+                if missing:
+                    self.fail(number, "; ".join(f"{field}: is required" for field in missing))
+                    continue
+            instance = self.model(**values) if uid is None else self.model(uid=uid, **values)
+            try:
+                instance.clean_fields(exclude=self.unchecked(values))
+            except ValidationError as e:
+                self.fail(number, "; ".join(
+                    f"{field}: {' '.join(messages)}" for field, messages in e.message_dict.items()
+                ))
+                continue
+            if uid in existing:
+                updates.append((number, instance, tuple(sorted(values))))
+            else:
+                creates.append((number, instance))
+
+        unnamed = [instance for _, instance in creates if self.slugs and not instance.slug]
+        for attempt in (1, 2):
+            if unnamed:
+                sources = [getattr(instance, self.slug_source) for instance in unnamed]
+                for instance, slug in zip(unnamed, self.slugs.allocate(sources)):
+                    instance.slug = slug
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create([instance for _, instance in creates], batch_size=self.chunk_size)
+                    now = timezone.now()
+                    for fields in {fields for _, _, fields in updates}:
+                        batch = [instance for _, instance, row_fields in updates if row_fields == fields]
+                        for instance in batch:
+                            instance.updated_at = now
+                        self.model.objects.bulk_update(batch, [*fields, 'updated_at'], batch_size=self.chunk_size)
+                break
+            except IntegrityError as e:
+                if attempt == 1 and unnamed:
+                    # Someone else may have taken a slug since it was read; read them again
+                    self.slugs.forget(sources)
+                    continue
+                for number, *_ in creates + updates:
+                    self.fail(number, f"not written: {e}")
+                return []
+        self.report['created'] += len(creates)
+        self.report['updated'] += len(updates)
+        return sorted(
+            [(number, 'created', instance.uid) for number, instance in creates]
+            + [(number, 'updated', instance.uid) for number, instance, _ in updates]
+        )
+
+    def check_slugs(self, parsed):
+        given = {values['slug'] for _, _, values in parsed if values.get('slug')}
+        owners = dict(self.model.objects.filter(slug__in=given).values_list('slug', 'uid'))
+        kept, seen = [], set()
+        for number, uid, values in parsed:
+            slug = values.get('slug')
+            if slug:
+                if slug in seen or (slug in owners and owners[slug] != uid):
+                    self.fail(number, f"slug: {slug!r} is already used")
+                    continue
+                seen.add(slug)
+            kept.append((number, uid, values))
+        self.slugs.reserve(seen)
+        return kept
+
+    def unchecked(self, values):
+        # Foreign keys would be checked one query per row; they were resolved in bulk instead
+        return [field.name for field in self.model._meta.fields
+                if field.attname not in values or field.is_relation or field.primary_key]
+
+
+class ShopImporter(CatalogImporter):
+    model = Shop
+    fields = {
+        'name': text, 'owner': text, 'address': text, 'contact_number': text, 'email': text,
+        'is_active': boolean, 'latitude': decimal, 'longitude': decimal, 'slug': text,
+    }
+    required = ('name', 'owner', 'address')
+    slug_source = 'name'
+
+
+class ServiceImporter(CatalogImporter):
+    model = Service
+    fields = {
+        'service_name': text, 'product_description': text, 'mrp_price': decimal, 'dis_price': decimal,
+        'is_publish': boolean, 'fake_review': integer, 'fake_rating': decimal, 'slug': text,
+    }
+    references = {'shop': Shop, 'category': Category}
+    required = ('shop', 'service_name', 'product_description')
+    slug_source = 'service_name'
+
+
+class TimeSlotImporter(CatalogImporter):
+    model = TimeSlot
+    fields = {'start_time': clock, 'end_time': clock, 'capacity': integer}
+    references = {'service': Service}
+    required = ('service', 'start_time', 'end_time')
+
+
+IMPORTERS = {'shop': ShopImporter, 'service': ServiceImporter, 'time_slot': TimeSlotImporter}
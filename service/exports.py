@@ -0,0 +1,102 @@
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ('ndjson', 'csv')
+
+CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def shop_rows():
+    from .models import Shop
+
+    return Shop.objects.all(), (
+        'uid', 'name', 'slug', 'owner', 'address', 'contact_number', 'email', 'is_active',
+        'latitude', 'longitude', 'created_at', 'updated_at',
+    )
+
+
+def service_rows():
+    from .models import Service
+
+    return Service.objects.all(), (
+        'uid', 'shop_id', 'category_id', 'service_name', 'slug', 'product_description', 'mrp_price',
+        'dis_price', 'is_publish', 'review_count', 'rating_sum', 'created_at', 'updated_at',
+    )
+
+
+def review_rows():
+    from accounts.models import ServiceReview
+
+    return ServiceReview.objects.all(), ('uid', 'service_id', 'user_id', 'rating', 'comment', 'created_at')
+
+
+EXPORTS = {'shops': shop_rows, 'services': service_rows, 'reviews': review_rows}
+
+
+def batches(queryset, fields, chunk_size=2000):
+    """
+    Yield lists of up to `chunk_size` value tuples of `fields`, in primary key order.
+
+    Each batch is its own `WHERE pk > last ORDER BY pk LIMIT n` query, a range
+    scan of the primary key. Unlike one long `iterator()`, this never holds
+    more than a batch in memory, including on MySQL, whose driver buffers
+    the whole result set of a query client-side.
+    """
+    pk = queryset.model._meta.pk.attname
+    position = fields.index(pk)
+    last = None
+    while True:
+        page = queryset.order_by(pk)
+        if last is not None:
+            page = page.filter(**{f'{pk}__gt': last})
+        rows = list(page.values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][position]
+
+
+class Echo:
+    """
+    File-like object whose write() returns what it was given, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode(kind, format='ndjson', chunk_size=2000, compress=False):
+    """
+    Yield the bytes of an export of `kind`, one batch of rows at a time.
+
+    With `compress` the output is gzip, compressed as it is produced.
+    """
+    queryset, fields = EXPORTS[kind]()
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    writer = csv.writer(Echo())
+
+    def chunks():
+        if format == 'csv':
+            yield writer.writerow(fields)
+        for rows in batches(queryset, fields, chunk_size):
+            if format == 'csv':
+                yield ''.join(writer.writerow(['' if value is None else value for value in row]) for row in rows)
+            else:
+                yield ''.join(
+                    json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                    for row in rows
+                )
+
+    for chunk in chunks():
+        data = chunk.encode()
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,295 @@
+from collections import defaultdict
+
+from .indexing import LazyIndex
+
+FACETS = ('city', 'category', 'price', 'rating')
+
+# Lower bounds of the dis_price bands; the last band is open-ended
+PRICE_BANDS = (0, 250, 500, 1000, 2000)
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def price_band(price):
+    if price is None:
+        return None
+    band = None
+    for lower in PRICE_BANDS:
+        if price >= lower:
+            band = lower
+    return band
+
+
+def price_label(lower):
+    i = PRICE_BANDS.index(lower)
+    return f"{lower}-{PRICE_BANDS[i + 1]}" if i + 1 < len(PRICE_BANDS) else f"{lower}+"
+
+
+def bitmap_of(positions):
+    """
+    Int with the given bits set, built in one pass rather than one OR per bit.
+    """
+    if not positions:
+        return 0
+    bits = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def positions(bitmap, offset=0, limit=None):
+    """
+    Set bit positions of `bitmap`, lowest first, skipping `offset` of them.
+    """
+    found = []
+    while bitmap and (limit is None or len(found) < offset + limit):
+        lowest = bitmap & -bitmap
+        found.append(lowest.bit_length() - 1)
+        bitmap ^= lowest
+    return found[offset:]
+
+
+class FacetIndex(LazyIndex):
+    """
+    Process-local bitmaps of published services per facet value.
+
+    Every listed service (published, of an active shop) owns one bit
+    position, and each category, price band and minimum rating has an int
+    whose set bits are its services; a city is the union of its categories.
+    Filtering is AND/OR over those ints and a count is one `bit_count()`.
+
+    Loaded lazily from the database on first use, then kept current by the
+    signal handlers one row at a time; `invalidate()` drops it so the next
+    query reloads everything, e.g. after bulk writes.
+    """
+
+    def _load(self):
+        from .models import Category, Service, ServiceAddress, Shop
+
+        memberships = defaultdict(set)
+        for city_id, category_id in ServiceAddress.category.through.objects.values_list(
+            'serviceaddress_id', 'category_id'
+        ).iterator(chunk_size=10000):
+            memberships[city_id].add(category_id)
+        return FacetState.build(
+            Service.objects.values_list(
+                'uid', 'shop_id', 'category_id', 'is_publish', 'dis_price', 'review_count', 'rating_sum',
+            ).iterator(chunk_size=10000),
+            Shop.objects.filter(is_active=False).values_list('uid', flat=True),
+            Category.objects.values_list('uid', 'category_name', 'is_publish'),
+            ((uid, name, memberships[uid]) for uid, name in ServiceAddress.objects.values_list('uid', 'city_name')),
+        )
+
+    def update_service(self, uid, shop_id, category_id, is_publish, price, review_count, rating_sum):
+        self._apply('set_service', uid, shop_id, category_id, is_publish, price, review_count, rating_sum)
+
+    def remove_service(self, uid):
+        self._apply('remove_service', uid)
+
+    def update_shop(self, uid, is_active):
+        self._apply('set_shop', uid, is_active)
+
+    def update_category(self, uid, name, is_publish):
+        self._apply('set_category', uid, name, is_publish)
+
+    def remove_category(self, uid):
+        self._apply('remove_category', uid)
+
+    def update_city(self, uid, name, categories):
+        self._apply('set_city', uid, name, categories)
+
+    def remove_city(self, uid):
+        self._apply('remove_city', uid)
+
+    def search(self, selected, offset=0, limit=20):
+        """
+        Services matching every facet in `selected` and the counts of each facet value.
+
+        Values of one facet are ORed together and facets are ANDed. The counts
+        of a facet apply the other facets' selections but not its own, so they
+        say how many services picking that value as well would show.
+
+        Args:
+            selected (dict): facet -> set of values; a city or category uid,
+                a price band's lower bound, or the minimum rating.
+
+        Returns:
+            tuple: (total, service uids from `offset` on, {facet: [(value, label, count)]}).
+        """
+        state = self.state()
+        with self._lock:
+            return state.search(selected, offset, limit)
+
+
+class FacetState:
+    """
+    Bit positions and facet bitmaps; guarded by FacetIndex's lock.
+    """
+
+    def __init__(self):
+        self.uids = []
+        self.positions = {}
+        self.free = []
+        self.services = {}
+        self.by_shop = defaultdict(set)
+        self.inactive_shops = set()
+        self.listed = 0
+        self.bitmaps = {'category': defaultdict(int), 'price': defaultdict(int), 'rating': defaultdict(int)}
+        self.categories = {}
+        self.cities = {}
+
+    @classmethod
+    def build(cls, services, inactive_shops, categories, cities):
+        """
+        State from (uid, shop_id, category_id, is_publish, price, review_count, rating_sum)
+        service rows, inactive shop uids, (uid, name, is_publish) category rows and
+        (uid, name, category uids) city rows.
+        """
+        state = cls()
+        state.inactive_shops = set(inactive_shops)
+        members = defaultdict(list)
+        for uid, shop_id, category_id, is_publish, price, review_count, rating_sum in services:
+            row = state.services[uid] = state._row(shop_id, category_id, is_publish, price, review_count, rating_sum)
+            state.by_shop[shop_id].add(uid)
+            if state._listable(row):
+                position = state.positions[uid] = len(state.uids)
+                state.uids.append(uid)
+                for value in state._values(row):
+                    members[value].append(position)
+        state.listed = (1 << len(state.uids)) - 1
+        for (facet, value), listed in members.items():
+            state.bitmaps[facet][value] = bitmap_of(listed)
+        for category in categories:
+            state.set_category(*category)
+        for city in cities:
+            state.set_city(*city)
+        return state
+
+    def set_service(self, uid, shop_id, category_id, is_publish, price, review_count, rating_sum):
+        self.remove_service(uid)
+        self.services[uid] = self._row(shop_id, category_id, is_publish, price, review_count, rating_sum)
+        self.by_shop[shop_id].add(uid)
+        self._list(uid)
+
+    def remove_service(self, uid):
+        row = self.services.pop(uid, None)
+        if row is not None:
+            self._unlist(uid, row)
+            self.by_shop[row[0]].discard(uid)
+
+    def set_shop(self, uid, is_active):
+        services = self.by_shop.get(uid, ())
+        for service in services:
+            self._unlist(service, self.services[service])
+        if is_active:
+            self.inactive_shops.discard(uid)
+        else:
+            self.inactive_shops.add(uid)
+        for service in services:
+            self._list(service)
+
+    def set_category(self, uid, name, is_publish):
+        if is_publish:
+            self.categories[uid] = name
+        else:
+            self.categories.pop(uid, None)
+
+    def remove_category(self, uid):
+        self.categories.pop(uid, None)
+
+    def set_city(self, uid, name, categories):
+        self.cities[uid] = (name, frozenset(categories))
+
+    def remove_city(self, uid):
+        self.cities.pop(uid, None)
+
+    def _row(self, shop_id, category_id, is_publish, price, review_count, rating_sum):
+        rating = int(rating_sum / review_count) if review_count else 0
+        return shop_id, category_id, is_publish, price_band(price), rating
+
+    def _listable(self, row):
+        return row[2] and row[0] not in self.inactive_shops
+
+    def _values(self, row):
+        _, category_id, _, band, rating = row
+        yield 'category', category_id
+        if band is not None:
+            yield 'price', band
+        for minimum in RATINGS:
+            if rating >= minimum:
+                yield 'rating', minimum
+
+    def _list(self, uid):
+        row = self.services[uid]
+        if not self._listable(row):
+            return
+        position = self.free.pop() if self.free else len(self.uids)
+        if position == len(self.uids):
+            self.uids.append(uid)
+        else:
+            self.uids[position] = uid
+        self.positions[uid] = position
+        bit = 1 << position
+        self.listed |= bit
+        for facet, value in self._values(row):
+            self.bitmaps[facet][value] |= bit
+
+    def _unlist(self, uid, row):
+        position = self.positions.pop(uid, None)
+        if position is None:
+            return
+        bit = 1 << position
+        self.listed &= ~bit
+        for facet, value in self._values(row):
+            bitmap = self.bitmaps[facet][value] & ~bit
+            if bitmap:
+                self.bitmaps[facet][value] = bitmap
+            else:
+                del self.bitmaps[facet][value]
+        self.uids[position] = None
+        self.free.append(position)
+
+    def value_bitmap(self, facet, value):
+        if facet == 'city':
+            bitmap = 0
+            for category_id in self.cities[value][1] if value in self.cities else ():
+                bitmap |= self.bitmaps['category'].get(category_id, 0)
+            return bitmap
+        return self.bitmaps[facet].get(value, 0)
+
+    def facet_values(self, facet):
+        if facet == 'city':
+            return [(uid, name) for uid, (name, _) in sorted(self.cities.items(), key=lambda item: item[1][0])]
+        if facet == 'category':
+            return sorted(self.categories.items(), key=lambda item: item[1])
+        if facet == 'price':
+            return [(lower, price_label(lower)) for lower in PRICE_BANDS]
+        return [(minimum, f"{minimum}+") for minimum in RATINGS]
+
+    def search(self, selected, offset, limit):
+        selections = {}
+        for facet, values in selected.items():
+            if values:
+                bitmap = 0
+                for value in values:
+                    bitmap |= self.value_bitmap(facet, value)
+                selections[facet] = bitmap
+
+        counts = {}
+        for facet in FACETS:
+            others = self.listed
+            for other, bitmap in selections.items():
+                if other != facet:
+                    others &= bitmap
+            counts[facet] = [
+                (value, label, (self.value_bitmap(facet, value) & others).bit_count())
+                for value, label in self.facet_values(facet)
+            ]
+
+        matched = self.listed
+        for bitmap in selections.values():
+            matched &= bitmap
+        page = [self.uids[position] for position in positions(matched, offset, limit)]
+        return matched.bit_count(), page, counts
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,265 @@
+import math
+import threading
+
+import numpy as np
+from django.db import models
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def valid_point(lat, lon):
+    """
+    Whether (lat, lon) lies within [-90, 90] x [-180, 180].
+
+    Also false for the nan and inf that float() accepts, as they compare false.
+    """
+    return -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points in kilometres.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Latitude/longitude box that contains every point within `radius_km` of (lat, lon).
+
+    Returns:
+        tuple: (min_lat, max_lat, min_lon, max_lon). When the box crosses the
+        antimeridian `min_lon` is greater than `max_lon`; when it reaches a pole
+        the longitude range is the full (-180, 180).
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    dlon = math.degrees(math.asin(min(1.0, math.sin(math.radians(dlat)) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - dlon, lon + dlon
+    if max_lon - min_lon >= 360:
+        return min_lat, max_lat, -180.0, 180.0
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, max_lat, min_lon, max_lon
+
+
+def haversine_expression(lat, lon, lat_field='latitude', lon_field='longitude'):
+    """
+    ORM expression for the great-circle distance in kilometres from (lat, lon)
+    to the coordinates stored in `lat_field`/`lon_field`.
+    """
+    row_lat = Radians(Cast(F(lat_field), FloatField()))
+    row_lon = Radians(Cast(F(lon_field), FloatField()))
+    a = (
+        Power(Sin((row_lat - Value(math.radians(lat))) / 2), 2)
+        + Value(math.cos(math.radians(lat))) * Cos(row_lat)
+        * Power(Sin((row_lon - Value(math.radians(lon))) / 2), 2)
+    )
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(Least(a, Value(1.0))))
+
+
+class GeoQuerySet(models.QuerySet):
+    """
+    QuerySet for models with indexed `latitude`/`longitude` columns.
+    """
+
+    def within_radius(self, lat, lon, radius_km, lat_field='latitude', lon_field='longitude'):
+        """
+        Rows within `radius_km` of (lat, lon), nearest first, annotated with `distance_km`.
+
+        A bounding box on the coordinate columns narrows the rows to an index
+        range scan before the exact haversine distance is computed for them.
+        """
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        # Round outwards to the column precision so rows on the edge are kept
+        queryset = self.filter(**{
+            f'{lat_field}__gte': math.floor(min_lat * 1e6) / 1e6,
+            f'{lat_field}__lte': math.ceil(max_lat * 1e6) / 1e6,
+        })
+        min_lon, max_lon = math.floor(min_lon * 1e6) / 1e6, math.ceil(max_lon * 1e6) / 1e6
+        if min_lon <= max_lon:
+            if (min_lon, max_lon) != (-180.0, 180.0):
+                queryset = queryset.filter(**{f'{lon_field}__gte': min_lon, f'{lon_field}__lte': max_lon})
+            else:
+                queryset = queryset.filter(**{f'{lon_field}__isnull': False})
+        else:
+            # The box crosses the antimeridian
+            queryset = queryset.filter(Q(**{f'{lon_field}__gte': min_lon}) | Q(**{f'{lon_field}__lte': max_lon}))
+
+        return queryset.annotate(
+            distance_km=haversine_expression(lat, lon, lat_field, lon_field)
+        ).filter(distance_km__lte=radius_km).order_by('distance_km')
+
+
+def _object_array(items):
+    array = np.empty(len(items), dtype=object)
+    array[:] = items
+    return array
+
+
+class CoordinateSnapshot:
+    """
+    Read-only, array-backed set of points.
+
+    Coordinates are held as float64 radians in NumPy arrays so a query ranks
+    every point with one vectorized haversine pass. Snapshots never change once
+    built; `upsert` and `remove` return a new snapshot, so readers can keep
+    using the one they hold while a writer publishes the next.
+    """
+
+    def __init__(self, keys=(), lats=(), lons=()):
+        self.keys = _object_array(list(keys))
+        self.lat = np.radians(np.asarray(lats, dtype=np.float64))
+        self.lon = np.radians(np.asarray(lons, dtype=np.float64))
+        self.cos_lat = np.cos(self.lat)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        for array in (self.keys, self.lat, self.lon, self.cos_lat):
+            array.setflags(write=False)
+
+    @classmethod
+    def _from_arrays(cls, keys, lat, lon, cos_lat):
+        snapshot = cls.__new__(cls)
+        snapshot.keys, snapshot.lat, snapshot.lon, snapshot.cos_lat = keys, lat, lon, cos_lat
+        snapshot.positions = {key: i for i, key in enumerate(keys)}
+        for array in (keys, lat, lon, cos_lat):
+            array.setflags(write=False)
+        return snapshot
+
+    def __len__(self):
+        return len(self.keys)
+
+    def upsert(self, key, lat, lon):
+        lat, lon = math.radians(float(lat)), math.radians(float(lon))
+        i = self.positions.get(key)
+        if i is None:
+            return self._from_arrays(
+                np.append(self.keys, _object_array([key])),
+                np.append(self.lat, lat), np.append(self.lon, lon), np.append(self.cos_lat, math.cos(lat)),
+            )
+        keys, lats, lons, cos_lat = self.keys.copy(), self.lat.copy(), self.lon.copy(), self.cos_lat.copy()
+        lats[i], lons[i], cos_lat[i] = lat, lon, math.cos(lat)
+        return self._from_arrays(keys, lats, lons, cos_lat)
+
+    def remove(self, key):
+        i = self.positions.get(key)
+        if i is None:
+            return self
+        return self._from_arrays(
+            np.delete(self.keys, i), np.delete(self.lat, i), np.delete(self.lon, i), np.delete(self.cos_lat, i),
+        )
+
+    def distances_km(self, lat, lon):
+        lat, lon = math.radians(lat), math.radians(lon)
+        a = (
+            np.sin((self.lat - lat) / 2) ** 2
+            + math.cos(lat) * self.cos_lat * np.sin((self.lon - lon) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def nearest(self, lat, lon, k, radius_km=None, after=None):
+        """
+        Find the `k` closest points to (lat, lon), optionally within `radius_km`.
+
+        Args:
+            after (tuple): Optional (distance_km, key) of the last point of the
+                previous page; only points ordered after it are returned.
+
+        Returns:
+            list: (distance_km, key) tuples ordered by distance.
+        """
+        if not len(self) or k <= 0:
+            return []
+
+        distances = self.distances_km(lat, lon)
+        mask = None
+        if radius_km is not None:
+            mask = distances <= radius_km
+        if after is not None:
+            after_distance, after_key = after
+            beyond = distances > after_distance
+            ties = np.flatnonzero(distances == after_distance)
+            beyond[ties] = [key > after_key for key in self.keys[ties]]
+            mask = beyond if mask is None else mask & beyond
+
+        candidates = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if len(candidates) > k:
+            # Keep everything tied with the k-th distance so ordering by key stays stable
+            kth = np.partition(distances[candidates], k - 1)[k - 1]
+            candidates = candidates[distances[candidates] <= kth]
+
+        return sorted((float(distances[i]), self.keys[i]) for i in candidates)[:k]
+
+
+class ShopIndex:
+    """
+    Process-local spatial index over the coordinates of active shops.
+
+    The snapshot is loaded lazily on first use and then kept current by the
+    Shop signal handlers, which upsert or remove single shops. `invalidate()`
+    drops it so the next query reloads everything, e.g. after bulk writes.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def update(self, key, lat, lon, is_active=True):
+        """
+        Apply a single shop write to the published snapshot.
+        """
+        with self._lock:
+            self._generation += 1
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            if is_active and lat is not None and lon is not None:
+                self._snapshot = snapshot.upsert(key, lat, lon)
+            else:
+                self._snapshot = snapshot.remove(key)
+
+    def remove(self, key):
+        self.update(key, None, None, is_active=False)
+
+    def _load(self):
+        from .models import Shop
+
+        points = Shop.objects.filter(
+            is_active=True, latitude__isnull=False, longitude__isnull=False
+        ).values_list('uid', 'latitude', 'longitude')
+        keys, lats, lons = zip(*points) if points else ((), (), ())
+        return CoordinateSnapshot(keys, lats, lons)
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            generation = self._generation
+            snapshot = self._load()
+            with self._lock:
+                # Don't publish a snapshot that a concurrent write already made stale.
+                if generation == self._generation and self._snapshot is None:
+                    self._snapshot = snapshot
+        return snapshot
+
+    def nearest(self, lat, lon, k, radius_km=None, after=None):
+        return self.snapshot().nearest(lat, lon, k, radius_km, after)
+
+
+shop_index = ShopIndex()
@@ -0,0 +1,72 @@
+import threading
+
+
+class LazyIndex:
+    """
+    Base of the process-local indexes: a state loaded from the database on first use.
+
+    Writes go through `_apply`, which changes a loaded state in place;
+    `invalidate()` drops the state so the next query reloads everything,
+    e.g. after bulk writes. Subclasses implement `_load` and read the state
+    under `_lock`.
+
+    A load reads the tables while writes keep arriving, so the writes
+    applied meanwhile are queued and replayed onto the loaded state before
+    it is published. The state methods are upserts and removals, so
+    replaying a write the load already saw is harmless. Only an
+    `invalidate()` during the load throws it away.
+    """
+
+    def __init__(self):
+        self._state = None
+        self._epoch = 0
+        self._loading = 0
+        self._pending = []
+        self._lock = threading.RLock()
+
+    def invalidate(self):
+        with self._lock:
+            self._epoch += 1
+            self._state = None
+
+    def _load(self):
+        raise NotImplementedError
+
+    def state(self):
+        state = self._state
+        if state is not None:
+            return state
+        with self._lock:
+            epoch = self._epoch
+            self._loading += 1
+            start = len(self._pending)
+        try:
+            state = self._load()
+        except BaseException:
+            with self._lock:
+                self._done_loading(start)
+            raise
+        with self._lock:
+            writes = self._done_loading(start)
+            if self._state is not None:
+                # Another load finished first
+                return self._state
+            for method, args in writes:
+                getattr(state, method)(*args)
+            if epoch == self._epoch:
+                self._state = state
+        return state
+
+    def _done_loading(self, start):
+        self._loading -= 1
+        writes = self._pending[start:]
+        if not self._loading:
+            self._pending = []
+        return writes
+
+    def _apply(self, method, *args):
+        with self._lock:
+            if self._state is not None:
+                getattr(self._state, method)(*args)
+            elif self._loading:
+                self._pending.append((method, args))
@@ -0,0 +1,152 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Key published when every entry of a topic must be dropped, e.g. after bulk writes
+ALL = ''
+
+
+class InvalidationBus:
+    """
+    Cross-worker invalidation over the ChangeEvent table.
+
+    `publish` appends `(topic, key)` once the current transaction commits, and
+    `poll`, called by InvalidationMiddleware at most every `poll_interval`
+    seconds, hands events written by other processes to the handlers
+    subscribed to their topic. A write is therefore applied by every worker
+    before the first request it serves `poll_interval` seconds later.
+
+    Sequence numbers can commit out of order, so ids skipped over are re-read
+    for `gap_timeout` seconds before they are given up as rolled back.
+    """
+
+    def __init__(self, poll_interval=1.0, retention=3600, gap_timeout=10.0, batch_size=1000):
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.gap_timeout = gap_timeout
+        self.batch_size = batch_size
+        self.handlers = defaultdict(list)
+        self.last_id = None
+        self._gaps = {}
+        self._last_poll = float('-inf')
+        self._last_prune = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def origin(self):
+        # Recomputed on every call so forked workers get their own
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def subscribe(self, topic, handler):
+        """
+        Call `handler(keys)` with the set of keys published to `topic` by other processes.
+        """
+        self.handlers[topic].append(handler)
+
+    def publish(self, topic, key=ALL):
+        # Nothing in any worker listens to this topic
+        if topic not in self.handlers:
+            return
+        from .models import ChangeEvent
+
+        event = ChangeEvent(topic=topic, key=str(key), origin=self.origin)
+        transaction.on_commit(event.save)
+
+    def publish_many(self, topic, keys):
+        """
+        `publish` each of `keys`, with a single INSERT.
+        """
+        if topic not in self.handlers:
+            return
+        from .models import ChangeEvent
+
+        events = [ChangeEvent(topic=topic, key=str(key), origin=self.origin) for key in keys]
+        transaction.on_commit(lambda: ChangeEvent.objects.bulk_create(events))
+
+    def poll(self, force=False):
+        """
+        Apply events published since the last poll; returns how many were applied.
+
+        Skipped inside a transaction, whose snapshot may hide committed events.
+        """
+        if connection.in_atomic_block:
+            return 0
+        if not force and time.monotonic() - self._last_poll < self.poll_interval:
+            return 0
+        if not self._lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_poll = time.monotonic()
+            applied = self._poll()
+            if time.monotonic() - self._last_prune >= self.retention:
+                self.prune()
+            return applied
+        finally:
+            self._lock.release()
+
+    def prune(self):
+        from .models import ChangeEvent
+
+        self._last_prune = time.monotonic()
+        cutoff = timezone.now() - timedelta(seconds=self.retention)
+        return ChangeEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+    def _poll(self):
+        from .models import ChangeEvent
+
+        if self.last_id is None:
+            # This process loads its state after this point, so older events don't concern it
+            self.last_id = ChangeEvent.objects.aggregate(last=Max('id'))['last'] or 0
+            return 0
+
+        now = time.monotonic()
+        self._gaps = {event_id: deadline for event_id, deadline in self._gaps.items() if deadline > now}
+        origin = self.origin
+        applied = 0
+        while True:
+            query = Q(id__gt=self.last_id)
+            if self._gaps:
+                query |= Q(id__in=list(self._gaps))
+            events = list(
+                ChangeEvent.objects.filter(query).order_by('id')
+                .values_list('id', 'topic', 'key', 'origin')[:self.batch_size]
+            )
+            keys = defaultdict(set)
+            for event_id, topic, key, event_origin in events:
+                self._gaps.pop(event_id, None)
+                if event_id > self.last_id:
+                    for missing in range(self.last_id + 1, min(event_id, self.last_id + self.batch_size + 1)):
+                        self._gaps[missing] = now + self.gap_timeout
+                    self.last_id = event_id
+                if event_origin != origin:
+                    keys[topic].add(key)
+            for topic, topic_keys in keys.items():
+                self._dispatch(topic, topic_keys)
+                applied += len(topic_keys)
+            if len(events) < self.batch_size:
+                return applied
+
+    def _dispatch(self, topic, keys):
+        for handler in self.handlers.get(topic, ()):
+            try:
+                handler(keys)
+            except Exception:
+                logger.exception("Invalidation handler for %r failed", topic)
+
+
+bus = InvalidationBus(
+    poll_interval=settings.INVALIDATION_POLL_INTERVAL,
+    retention=settings.INVALIDATION_RETENTION,
+    gap_timeout=settings.INVALIDATION_GAP_TIMEOUT,
+)
@@ -0,0 +1,256 @@
+import contextlib
+import io
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import Address, CustomUser, ServiceReview
+from service.models import Category, Coupon, Reservation, Service, ServiceAddress, Shop, TimeSlot
+
+BENCH_PASSWORD = 'bench-password-123'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the routes of service/urls.py and accounts/urls.py, all but the social logins and "
+        "password reset links, through the test client and report p50/p95/p99 latency, queries per request and peak memory. Use --seed to load a "
+        "synthetic dataset first, --output to save a JSON baseline and --baseline to compare with one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', action='store_true', help="Seed synthetic data before benchmarking.")
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiplier for the seeded volumes (1.0 = 10k shops, 200k services, "
+                                 "2M reviews, 1M time slots).")
+        parser.add_argument('--requests', type=int, default=50, help="Timed requests per route.")
+        parser.add_argument('--output', help="Write the results as a JSON baseline to this path.")
+        parser.add_argument('--baseline', help="Compare with a JSON baseline and fail on regressions.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed relative p95 slowdown against the baseline.")
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help="Ignore p95 slowdowns smaller than this many milliseconds.")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['scale'])
+        if not Shop.objects.exists() or not Service.objects.exists():
+            raise CommandError("No catalog data to benchmark; run with --seed.")
+
+        results = {}
+        for name, method, path, data, token in self.routes():
+            results[name] = self.measure(method, path, data, token, options['requests'])
+            row = results[name]
+            self.stdout.write(
+                f"{name:<28} {row['status']:>4}  p50 {row['p50_ms']:8.2f} ms  p95 {row['p95_ms']:8.2f} ms  "
+                f"p99 {row['p99_ms']:8.2f} ms  {row['queries']:>4} queries  {row['peak_kib']:9.1f} KiB"
+            )
+
+        report = {
+            'dataset': {model.__name__: model.objects.count() for model in (
+                Shop, Service, ServiceReview, TimeSlot, CustomUser, Category, ServiceAddress, Coupon,
+            )},
+            'routes': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Baseline written to {options['output']}")
+        if options['baseline']:
+            self.compare(results, options['baseline'], options['tolerance'], options['min_delta_ms'])
+
+    def measure(self, method, path, data, token, requests):
+        host = settings.ALLOWED_HOSTS[0].lstrip('.').replace('*', 'localhost') if settings.ALLOWED_HOSTS else 'localhost'
+        client = Client(HTTP_HOST=host, HTTP_AUTHORIZATION=f"Bearer {token}" if token else '')
+
+        def call():
+            payload = data() if callable(data) else data
+            # Some views print debugging output; keep it out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                if method == 'get':
+                    response = client.get(path, payload)
+                elif method == 'upload':
+                    response = client.post(path, payload)
+                else:
+                    response = getattr(client, method)(path, payload, content_type='application/json')
+                if response.streaming:
+                    # Streamed responses do their work while being read
+                    b''.join(response.streaming_content)
+            return response
+
+        call()  # warm up caches and lazy imports
+        timings, queries = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = call()
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        tracemalloc.start()
+        call()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'method': 'POST' if method == 'upload' else method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def compare(self, results, baseline_path, tolerance, min_delta_ms):
+        with open(baseline_path) as f:
+            baseline = json.load(f)['routes']
+        regressions = []
+        for name, row in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            slowdown = row['p95_ms'] - before['p95_ms']
+            if slowdown > min_delta_ms and row['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p95 {before['p95_ms']} -> {row['p95_ms']} ms")
+            if row['queries'] > before['queries']:
+                regressions.append(f"{name}: queries {before['queries']} -> {row['queries']}")
+        if regressions:
+            raise CommandError("Regressions against baseline:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against baseline."))
+
+    def routes(self):
+        """
+        (name, method, path, data, token) for every route worth timing.
+
+        `method` 'upload' posts `data` as a multipart form; `token` is None
+        for anonymous requests. Writes are chosen so that repeating them
+        leaves the dataset as it was, except for registrations and
+        reservations, which add a row per request. The social login routes
+        call Google and Facebook and are left out.
+        """
+        user, _ = CustomUser.objects.get_or_create(
+            email='bench@example.com', defaults={'phone_number': '9000000000'}
+        )
+        user.set_password(BENCH_PASSWORD)
+        user.save()
+        refresh = RefreshToken.for_user(user)
+        token = str(refresh.access_token)
+        admin, _ = CustomUser.objects.get_or_create(
+            email='bench-admin@example.com',
+            defaults={'phone_number': '9000000001', 'is_staff': True, 'is_superuser': True},
+        )
+        admin_token = str(RefreshToken.for_user(admin).access_token)
+        address, _ = Address.objects.get_or_create(
+            user=user, title='Bench', defaults={'latitude': 12.97, 'longitude': 77.59}
+        )
+        category = Category.objects.first()
+        shop = Shop.objects.first()
+        service = Service.objects.first()
+        coupon = Coupon.objects.first()
+        services = list(Service.objects.filter(dis_price__isnull=False).values_list('uid', 'dis_price')[:20])
+        time_slots = list(TimeSlot.objects.values_list('uid', 'capacity')[:20])
+        time_slot = TimeSlot.objects.filter(capacity__gt=0).first()
+        today = timezone.localdate()
+        # Past the days booked by earlier runs
+        booked = Reservation.objects.filter(user=user).aggregate(last=Max('date'))['last']
+        first_day = max(today, booked or today)
+        counter = iter(range(10 ** 9))
+
+        def service_upload():
+            # Rewrites prices the services already have
+            upload = io.StringIO("".join(
+                json.dumps({'uid': str(uid), 'dis_price': str(price)}) + "\n"
+                for uid, price in services
+            ))
+            upload.name = 'services.ndjson'
+            return {'kind': 'service', 'file': upload}
+
+        routes = [
+            ('categories', 'get', reverse('category-list'), None, None),
+            ('shops', 'get', reverse('shop-list'), None, None),
+            ('shop-detail', 'get', reverse('shop-detail', args=[shop.pk]), None, None),
+            ('services', 'get', reverse('service-list'), None, None),
+            ('services-by-shop', 'get', reverse('service-list'), {'shop_id': str(shop.pk)}, None),
+            ('service-detail', 'get', reverse('service-detail', args=[service.pk]), None, None),
+            ('service-addresses', 'get', reverse('service-address-list'), None, None),
+            ('time-slots', 'get', reverse('time-slot-list'), None, None),
+            ('nearest-shops', 'get', reverse('nearest-shops'), {'latitude': 12.97, 'longitude': 77.59}, None),
+            ('service-schedule', 'get', reverse('service-schedule', args=[service.pk]), None, None),
+            ('availability', 'get', reverse('availability'), {'start': '09:00', 'end': '18:00'}, None),
+            ('availability-on-date', 'get', reverse('availability'),
+             {'start': '09:00', 'end': '18:00', 'date': str(today)}, None),
+            ('availability-nearby', 'get', reverse('availability'),
+             {'start': '09:00', 'end': '18:00', 'latitude': 12.97, 'longitude': 77.59}, None),
+            ('search', 'get', reverse('service-search'), {'q': service.service_name.split()[0]}, None),
+            ('autocomplete', 'get', reverse('autocomplete'), {'q': service.service_name[:3]}, None),
+            ('facets', 'get', reverse('facets'), None, None),
+            ('export-shops', 'get', reverse('export', args=['shops']), None, admin_token),
+            ('catalog-import', 'upload', reverse('catalog-import'), service_upload, admin_token),
+            ('service-batch-update', 'patch', reverse('service-batch'), [
+                {'uid': str(uid), 'dis_price': str(price)} for uid, price in services
+            ], token),
+            ('distance-cache-stats', 'get', reverse('distance-cache-stats'), None, admin_token),
+            ('response-cache-stats', 'get', reverse('response-cache-stats'), None, admin_token),
+            ('registration', 'post', reverse('email_phone_registration'), lambda: {
+                'email': f'bench-{next(counter)}-{time.time_ns()}@example.com',
+                'password1': BENCH_PASSWORD, 'password2': BENCH_PASSWORD,
+            }, None),
+            ('login', 'post', reverse('custom_login'),
+             {'username': user.email, 'password': BENCH_PASSWORD}, None),
+            ('token-refresh', 'post', reverse('token_refresh'), {'refresh': str(refresh)}, None),
+            ('token-verify', 'post', reverse('token_verify'), {'token': token}, None),
+            ('change-password', 'post', reverse('change_password'),
+             {'old_password': 'wrong', 'new_password': 'x', 'confirm_password': 'x'}, token),
+            ('password-reset', 'post', reverse('password_reset_request'), {'identifier': user.email}, None),
+            ('send-otp', 'post', reverse('send-otp'), {'phone_number': user.phone_number}, None),
+            ('verify-otp', 'post', reverse('verify-otp'),
+             {'phone_number': user.phone_number, 'otp_code': '000000'}, None),
+            ('google-callback', 'get', reverse('google_login_callback'), None, None),
+            ('update-email', 'post', reverse('update_email'), {'email': user.email}, token),
+            ('update-phone', 'post', reverse('update_phone'), {'phone_number': user.phone_number}, token),
+            ('profile', 'get', reverse('profile-detail'), None, token),
+            ('addresses', 'get', reverse('address-list-create'), None, token),
+            ('address-detail', 'get', reverse('address-detail', args=[address.uid]), None, token),
+        ]
+        if category:
+            routes.append(('category-detail', 'get', reverse('category-detail', args=[category.pk]), None, None))
+        if coupon:
+            routes.append(('coupons', 'get', reverse('coupon-list'), None, None))
+            routes.append(('coupon-detail', 'get', reverse('coupon-detail', args=[coupon.pk]), None, None))
+        if time_slots:
+            routes.append(('time-slot-batch-update', 'patch', reverse('time-slot-batch'), [
+                {'uid': str(uid), 'capacity': capacity} for uid, capacity in time_slots
+            ], token))
+        if time_slot:
+            # A new day per request, so every booking takes a seat from a fresh inventory row
+            routes.append(('reservation-create', 'post', reverse('reservation-list'), lambda: {
+                'time_slot': str(time_slot.uid), 'date': str(first_day + timedelta(days=next(counter) + 1)),
+            }, token))
+        routes.append(('reservations', 'get', reverse('reservation-list'), None, token))
+        return routes
+
+    def seed(self, scale):
+        call_command(
+            'seed_salon', seed=42, shops=max(1, int(10000 * scale)), services=max(1, int(200000 * scale)),
+            reviews=int(2000000 * scale), time_slots=int(1000000 * scale), users=max(1, int(20000 * scale)),
+            categories=20, cities=20, coupons=20, stdout=self.stdout,
+        )
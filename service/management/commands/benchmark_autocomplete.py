@@ -0,0 +1,98 @@
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from service.autocomplete import TOP_N, PrefixIndex, normalize
+
+SYLLABLES = (
+    'ha', 'ir', 'cut', 'spa', 'glo', 'wax', 'nail', 'bro', 'thr', 'ead', 'fa', 'cial', 'bea', 'rd',
+    'sty', 'le', 'mas', 'sage', 'col', 'or', 'keu', 'rat', 'in', 'pe', 'di', 'mani', 'sal', 'on',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the autocomplete prefix index over synthetic names and report its memory per "
+        "100k names, prefix lookup latency against scanning every name, and the latency of "
+        "adding, reweighing and removing one name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=2000)
+        parser.add_argument('--writes', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def word():
+            return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+        rows = [
+            (i, ' '.join(word() for _ in range(rng.randint(1, 3))).title(), rng.randint(0, 500))
+            for i in range(options['names'])
+        ]
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = PrefixIndex.build(rows)
+        build_s = time.perf_counter() - started
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        names = [name for _, name, _ in rows]
+        prefixes = [normalize(rng.choice(names)[:rng.randint(1, 6)]) for _ in range(options['queries'])]
+
+        def scan(prefix):
+            # What a LIKE 'prefix%' over every name does, ranked afterwards
+            found = [(-popularity, name, uid) for uid, name, popularity in rows
+                     if any(word_start.startswith(prefix) for word_start in _word_starts(name))]
+            return sorted(found)[:TOP_N]
+
+        self.stdout.write(
+            f"{len(rows)} names, {len(index.keys)} keys: built in {build_s:.2f} s, "
+            f"{size / 2 ** 20:.1f} MiB ({size / len(rows) * 100000 / 2 ** 20:.1f} MiB per 100k names)"
+        )
+        results = {}
+        for label, query, sample in (('scan', scan, prefixes[:50]), ('prefix index', index.complete, prefixes)):
+            timings = []
+            for prefix in sample:
+                started = time.perf_counter()
+                query(prefix)
+                timings.append((time.perf_counter() - started) * 1000)
+            results[label] = self.report(label, timings, f"{len(sample)} prefixes")
+        speedup = statistics.median(results['scan']) / statistics.median(results['prefix index'])
+        self.stdout.write(f"Prefix index is {speedup:.0f}x faster at p50")
+
+        # Writes land on names of every popularity, so some push a name out of a full top list
+        added = [(len(rows) + i, ' '.join(word() for _ in range(rng.randint(1, 3))).title(), rng.randint(0, 500))
+                 for i in range(options['writes'])]
+        writes = (
+            ('add', [lambda row=row: index.add(*row) for row in added]),
+            ('reweigh', [lambda uid=uid: index.reweigh(uid, rng.randint(0, 500)) for uid, _, _ in added]),
+            ('remove', [lambda uid=uid: index.remove(uid) for uid, _, _ in added]),
+        )
+        for label, calls in writes:
+            timings = []
+            for call in calls:
+                started = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - started) * 1000)
+            self.report(label, timings, f"{len(calls)} names")
+
+    def report(self, label, timings, sample):
+        timings.sort()
+        self.stdout.write(
+            f"{label:>12}: p50 {statistics.median(timings):8.3f} ms  "
+            f"p99 {timings[int(len(timings) * 0.99) - 1]:8.3f} ms over {sample}"
+        )
+        return timings
+
+
+def _word_starts(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words))]
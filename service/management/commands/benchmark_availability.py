@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from service.availability import AvailabilityState
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare free-slot searches over a synthetic slot table by scanning every slot "
+        "and through the per-service interval index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=1000000)
+        parser.add_argument('--services', type=int, default=200000)
+        parser.add_argument('--shops', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def uid():
+            return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+        categories = [uid() for _ in range(options['categories'])]
+        shops = [uid() for _ in range(options['shops'])]
+        services = {uid(): (rng.choice(shops), rng.choice(categories)) for _ in range(options['services'])}
+        service_ids = list(services)
+        slots = []
+        for _ in range(options['slots']):
+            start = rng.randrange(9 * 60, 21 * 60, 30)
+            slots.append((uid(), rng.choice(service_ids), start, start + rng.choice((30, 45, 60))))
+
+        started = time.perf_counter()
+        state = AvailabilityState.build(
+            ((service_id, shop_id, category_id, True) for service_id, (shop_id, category_id) in services.items()),
+            slots,
+        )
+        build_s = time.perf_counter() - started
+
+        # A window of one to three hours, one category, and the shops "near" the user
+        queries = []
+        for _ in range(options['queries']):
+            lo = rng.randrange(9 * 60, 19 * 60, 30)
+            queries.append((lo, lo + rng.choice((60, 120, 180)), rng.choice(categories),
+                            set(rng.sample(shops, max(1, len(shops) // 50)))))
+
+        def scan(lo, hi, category, nearby):
+            found = set()
+            for _, service_id, start, end in slots:
+                shop_id, category_id = services[service_id]
+                if lo <= start and end <= hi and category_id == category and shop_id in nearby:
+                    found.add(service_id)
+            return found
+
+        def indexed(lo, hi, category, nearby):
+            candidates = state.candidates(None, category, nearby)
+            return {
+                service_id for service_id in candidates
+                if service_id in state.slots and state.slots[service_id].has_free(lo, hi)
+            }
+
+        for lo, hi, category, nearby in queries[:3]:
+            assert scan(lo, hi, category, nearby) == indexed(lo, hi, category, nearby)
+
+        self.stdout.write(f"{len(slots)} slots over {len(services)} services: index built in {build_s:.1f} s")
+        results = {}
+        for name, query in (('scan', scan), ('interval index', indexed)):
+            timings, found = [], 0
+            for lo, hi, category, nearby in queries:
+                started = time.perf_counter()
+                found += len(query(lo, hi, category, nearby))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = timings
+            self.stdout.write(
+                f"{name:>14}: p50 {statistics.median(timings):8.2f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:8.2f} ms  "
+                f"{found / len(queries):.1f} services per query"
+            )
+        speedup = statistics.median(results['scan']) / statistics.median(results['interval index'])
+        self.stdout.write(f"Interval index is {speedup:.0f}x faster at p50")
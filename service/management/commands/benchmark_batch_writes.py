@@ -0,0 +1,87 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from service.batch import delete_batch, write_batch
+from service.models import Service, Shop
+
+
+class Command(BaseCommand):
+    help = (
+        "Create, update and delete services one at a time, each save in its own transaction as "
+        "the single-item endpoints do, then the same through the batch write path, and report "
+        "rows per second and queries for both. The data it creates is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=500, help="Services written per step.")
+
+    def handle(self, *args, **options):
+        count = options['items']
+        tag = uuid.uuid4().hex[:8]
+        shop = Shop.objects.create(name=f"Batch bench {tag}", slug=f"batch-bench-{tag}", owner="bench", address="bench")
+        try:
+            single = self.single(shop, tag, count)
+            batch = self.batch(shop, tag, count)
+        finally:
+            shop.delete()
+
+        self.stdout.write(f"{'':<8} {'per item':>28}  {'batch':>28}  speedup")
+        for step in ('create', 'update', 'delete'):
+            (single_s, single_q), (batch_s, batch_q) = single[step], batch[step]
+            self.stdout.write(
+                f"{step:<8} {count / single_s:10,.0f} rows/s {single_q:7} queries  "
+                f"{count / batch_s:10,.0f} rows/s {batch_q:7} queries  {single_s / batch_s:6.1f}x"
+            )
+
+    def measure(self, work):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            work()
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries)
+
+    def single(self, shop, tag, count):
+        services = []
+
+        def create():
+            for i in range(count):
+                with transaction.atomic():
+                    services.append(Service.objects.create(
+                        shop=shop, service_name=f"Single {tag} {i}", product_description="bench", dis_price=100,
+                    ))
+
+        def update():
+            for service in services:
+                with transaction.atomic():
+                    service.dis_price = 150
+                    service.save()
+
+        def delete():
+            for service in services:
+                with transaction.atomic():
+                    service.delete()
+
+        return {'create': self.measure(create), 'update': self.measure(update), 'delete': self.measure(delete)}
+
+    def batch(self, shop, tag, count):
+        uids = []
+
+        def create():
+            results = write_batch('service', [
+                {'shop': str(shop.uid), 'service_name': f"Batch {tag} {i}", 'product_description': "bench",
+                 'dis_price': 100}
+                for i in range(count)
+            ], 'create')
+            uids.extend(result['uid'] for result in results)
+
+        def update():
+            write_batch('service', [{'uid': str(uid), 'dis_price': 150} for uid in uids], 'update')
+
+        def delete():
+            delete_batch('service', [str(uid) for uid in uids])
+
+        return {'create': self.measure(create), 'update': self.measure(update), 'delete': self.measure(delete)}
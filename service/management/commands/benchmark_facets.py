@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from service.facets import PRICE_BANDS, FacetState, price_band
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare facet counts over synthetic services computed by grouping every matching "
+        "service and through the facet bitmaps."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--services', type=int, default=1000000)
+        parser.add_argument('--shops', type=int, default=20000)
+        parser.add_argument('--categories', type=int, default=30)
+        parser.add_argument('--cities', type=int, default=50)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        def uid():
+            return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+        categories = [uid() for _ in range(options['categories'])]
+        cities = {uid(): set(rng.sample(categories, rng.randint(3, 10))) for _ in range(options['cities'])}
+        shops = [uid() for _ in range(options['shops'])]
+        rows = []
+        for _ in range(options['services']):
+            reviews = rng.randint(0, 20)
+            rows.append((uid(), rng.choice(shops), rng.choice(categories), rng.random() < 0.9,
+                         rng.randint(50, 5000), reviews, reviews * rng.randint(1, 5)))
+
+        started = time.perf_counter()
+        state = FacetState.build(
+            rows, [], [(category, f"Category {i}", True) for i, category in enumerate(categories)],
+            [(city, f"City {i}", members) for i, (city, members) in enumerate(cities.items())],
+        )
+        self.stdout.write(f"{len(rows)} services: bitmaps built in {time.perf_counter() - started:.1f} s")
+
+        queries = [{
+            'city': {rng.choice(list(cities))},
+            'price': set(rng.sample(PRICE_BANDS, 2)),
+            'rating': {rng.choice((3, 4))},
+        } for _ in range(options['queries'])]
+
+        def grouped(selected):
+            # What GROUP BY per facet over the matching rows does
+            city_categories = set().union(*(cities[city] for city in selected['city']))
+            minimum = min(selected['rating'])
+            counts = Counter()
+            for _, _, category, is_publish, price, reviews, rating_sum in rows:
+                rating = rating_sum // reviews if reviews else 0
+                if not is_publish or category not in city_categories:
+                    continue
+                if price_band(price) in selected['price'] and rating >= minimum:
+                    counts['matched'] += 1
+                    counts[category] += 1
+            return counts['matched']
+
+        results = {}
+        for name, query in (('group by', grouped), ('bitmaps', lambda selected: state.search(selected, 0, 20)[0])):
+            timings = []
+            for selected in queries:
+                started = time.perf_counter()
+                query(selected)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = timings
+            self.stdout.write(
+                f"{name:>9}: p50 {statistics.median(timings):8.2f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:8.2f} ms"
+            )
+        assert grouped(queries[0]) == state.search(queries[0], 0, 20)[0]
+        speedup = statistics.median(results['group by']) / statistics.median(results['bitmaps'])
+        self.stdout.write(f"Bitmaps are {speedup:.0f}x faster at p50, counts for every facet value included")
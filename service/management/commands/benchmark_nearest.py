@@ -0,0 +1,69 @@
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from service.geo import CoordinateSnapshot, haversine_km
+from service.models import Shop
+
+
+class Command(BaseCommand):
+    help = "Compare nearest-shop ranking over Shop instances with the NumPy coordinate snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=5000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--k', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        k = options['k']
+
+        # Unsaved instances shaped like the ORM returns them: Decimal coordinates
+        shops = [
+            Shop(
+                uid=uuid.UUID(int=rng.getrandbits(128)),
+                latitude=Decimal(f"{rng.uniform(12.7, 13.2):.6f}"),
+                longitude=Decimal(f"{rng.uniform(77.3, 77.9):.6f}"),
+            )
+            for _ in range(options['shops'])
+        ]
+        origins = [(rng.uniform(12.7, 13.2), rng.uniform(77.3, 77.9)) for _ in range(options['queries'])]
+
+        def per_instance(lat, lon):
+            for shop in shops:
+                shop.distance = haversine_km(lat, lon, float(shop.latitude), float(shop.longitude))
+            return sorted(shops, key=lambda shop: shop.distance)[:k]
+
+        started = time.perf_counter()
+        snapshot = CoordinateSnapshot(
+            [shop.uid for shop in shops], [shop.latitude for shop in shops], [shop.longitude for shop in shops]
+        )
+        build_ms = (time.perf_counter() - started) * 1000
+
+        def vectorized(lat, lon):
+            return snapshot.nearest(lat, lon, k)
+
+        results = {}
+        for name, query in (('per-instance', per_instance), ('snapshot', vectorized)):
+            timings = []
+            for lat, lon in origins:
+                started = time.perf_counter()
+                query(lat, lon)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            results[name] = timings
+            self.stdout.write(
+                f"{name:>12}: p50 {statistics.median(timings):.3f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.3f} ms  "
+                f"mean {statistics.fmean(timings):.3f} ms"
+            )
+
+        speedup = statistics.median(results['per-instance']) / statistics.median(results['snapshot'])
+        self.stdout.write(
+            f"{options['shops']} shops, k={k}: snapshot built in {build_ms:.1f} ms, {speedup:.0f}x faster at p50"
+        )
@@ -0,0 +1,83 @@
+import random
+import statistics
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from service.geo import haversine_expression
+from service.models import Shop
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare radius queries with and without the indexed bounding-box prefilter "
+        "on a synthetic shop table. All rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--radius-km', type=float, default=5.0)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        radius_km = options['radius_km']
+
+        started = time.perf_counter()
+        Shop.objects.bulk_create(
+            (
+                Shop(
+                    uid=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    name=f"Bench Salon {i}", owner="bench", address="bench",
+                    latitude=Decimal(f"{rng.uniform(8.0, 30.0):.6f}"),
+                    longitude=Decimal(f"{rng.uniform(70.0, 90.0):.6f}"),
+                )
+                for i in range(options['shops'])
+            ),
+            batch_size=5000,
+        )
+        self.stdout.write(f"Seeded {options['shops']} shops in {time.perf_counter() - started:.1f} s")
+
+        origins = [(rng.uniform(8.0, 30.0), rng.uniform(70.0, 90.0)) for _ in range(options['queries'])]
+
+        def full_scan(lat, lon):
+            return list(
+                Shop.objects.annotate(distance_km=haversine_expression(lat, lon))
+                .filter(distance_km__lte=radius_km).order_by('distance_km').values_list('uid', flat=True)
+            )
+
+        def bounding_box(lat, lon):
+            return list(Shop.objects.within_radius(lat, lon, radius_km).values_list('uid', flat=True))
+
+        for name, query in (('full scan', full_scan), ('bounding box', bounding_box)):
+            timings, found = [], 0
+            for lat, lon in origins:
+                started = time.perf_counter()
+                found += len(query(lat, lon))
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                f"{name:>12}: p50 {statistics.median(timings):.2f} ms  "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms  "
+                f"{found / len(origins):.1f} shops per query"
+            )
+
+        lat, lon = origins[0]
+        self.stdout.write("Bounding-box query plan:")
+        self.stdout.write(Shop.objects.within_radius(lat, lon, radius_km).explain())
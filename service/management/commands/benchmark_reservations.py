@@ -0,0 +1,113 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from service.models import Service, Shop, SlotInventory, TimeSlot
+from service.reservations import SlotFullError, reserve
+
+
+class Command(BaseCommand):
+    help = (
+        "Book a few hot time slots from many threads at once and report reservations per "
+        "second, sold-out and error rates, and whether any slot was oversold. The data it "
+        "creates is deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=100, help="Booking attempts per thread.")
+        parser.add_argument('--slots', type=int, default=3, help="Number of contended slots.")
+        parser.add_argument('--capacity', type=int, default=200, help="Seats per slot.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        threads, attempts = options['threads'], options['attempts']
+        tag = uuid.uuid4().hex[:8]
+        shop = Shop.objects.create(name=f"Reservation bench {tag}", slug=f"reservation-bench-{tag}",
+                                   owner="bench", address="bench")
+        try:
+            service = Service.objects.create(shop=shop, service_name="Bench", slug=f"reservation-bench-{tag}",
+                                             product_description="bench", is_publish=True)
+            slots = [
+                TimeSlot.objects.create(service=service, start_time=f"{18 + i // 2}:{30 * (i % 2):02d}",
+                                        end_time=f"{18 + (i + 1) // 2}:{30 * ((i + 1) % 2):02d}",
+                                        capacity=options['capacity'])
+                for i in range(options['slots'])
+            ]
+            password = make_password(None)
+            users = CustomUser.objects.bulk_create(
+                CustomUser(email=f"bench-{tag}-{i}@example.com", password=password)
+                for i in range(threads * attempts)
+            )
+            self.run(slots, users, threads, attempts, options['seed'])
+        finally:
+            CustomUser.objects.filter(email__startswith=f"bench-{tag}-").delete()
+            shop.delete()
+
+    def run(self, slots, users, threads, attempts, seed):
+        date = timezone.localdate()
+        outcomes = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(threads)
+
+        def book(worker):
+            rng = random.Random(seed + worker)
+            mine = Counter()
+            start.wait()
+            try:
+                for user in users[worker * attempts:(worker + 1) * attempts]:
+                    try:
+                        reserve(user, rng.choice(slots), date)
+                        mine['reserved'] += 1
+                    except SlotFullError:
+                        mine['sold_out'] += 1
+                    except DatabaseError:
+                        # Lock wait timeouts and deadlocks
+                        mine['errors'] += 1
+            finally:
+                connection.close()
+            with lock:
+                outcomes.update(mine)
+
+        workers = [threading.Thread(target=book, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        total = threads * attempts
+        self.stdout.write(
+            f"{threads} threads x {attempts} attempts on {len(slots)} slots "
+            f"({slots[0].capacity} seats each) in {elapsed:.2f} s"
+        )
+        self.stdout.write(
+            f"  reserved {outcomes['reserved']}  sold out {outcomes['sold_out']}  errors {outcomes['errors']}"
+        )
+        self.stdout.write(
+            f"  {outcomes['reserved'] / elapsed:,.0f} reservations/s  {total / elapsed:,.0f} attempts/s  "
+            f"conflict rate {(outcomes['sold_out'] + outcomes['errors']) / total:.1%}"
+        )
+
+        # Every seat sold must be backed by exactly one confirmed reservation
+        oversold = []
+        for inventory in SlotInventory.objects.filter(time_slot__in=slots, date=date).annotate(
+            confirmed=Count('time_slot__reservations', filter=Q(
+                time_slot__reservations__date=date, time_slot__reservations__status='confirmed'
+            ))
+        ).select_related('time_slot'):
+            if inventory.confirmed != inventory.time_slot.capacity - inventory.remaining:
+                oversold.append(str(inventory))
+        if oversold:
+            raise CommandError("Inventory and reservations disagree: " + ", ".join(oversold))
+        self.stdout.write(self.style.SUCCESS("No slot was oversold."))
@@ -0,0 +1,52 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import OTP, CustomUser
+from base.uuids import uuid7
+
+GENERATORS = {'uuid4': uuid.uuid4, 'uuid7': uuid7}
+
+
+class Command(BaseCommand):
+    help = (
+        "Insert OTP rows keyed by uuid4 and then by uuid7, in committed batches as a busy "
+        "login flow would, and report rows per second overall and over the last tenth of the "
+        "rows, where a large random-key index is slowest. The rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000, help="Rows inserted per generator.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT and transaction.")
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        tag = uuid.uuid4().hex[:8]
+        user = CustomUser.objects.create_user(email=f"uuid-bench-{tag}@example.com")
+        try:
+            for name, generate in GENERATORS.items():
+                timings = self.insert(user, generate, rows, batch_size)
+                OTP.objects.filter(user=user).delete()
+                total = sum(timings)
+                tail = timings[-max(1, len(timings) // 10):]
+                self.stdout.write(
+                    f"{name}: {rows / total:10,.0f} rows/s overall, "
+                    f"{len(tail) * batch_size / sum(tail):10,.0f} rows/s over the last tenth ({total:.1f} s)"
+                )
+        finally:
+            user.delete()
+
+    def insert(self, user, generate, rows, batch_size):
+        timings = []
+        for start in range(0, rows, batch_size):
+            batch = [
+                OTP(uid=generate(), user=user, otp_code=f"{i % 1000000:06d}")
+                for i in range(start, min(start + batch_size, rows))
+            ]
+            started = time.perf_counter()
+            with transaction.atomic():
+                OTP.objects.bulk_create(batch)
+            timings.append(time.perf_counter() - started)
+        return timings
@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from base.uuids import CompactUUIDField
+
+# storage -> (column type, information_schema data type, expression turning the other storage into this one)
+STORAGES = {
+    'binary': ('BINARY(16)', 'binary', "IF(LENGTH({column}) = 32, UNHEX({column}), {column})"),
+    'char': ('CHAR(32)', 'char', "IF(LENGTH({column}) = 16, LOWER(HEX({column})), {column})"),
+}
+
+
+def quote(name):
+    return f"`{name}`"
+
+
+def modify(columns, type):
+    return ", ".join(f"MODIFY {quote(column)} {type} {'NULL' if null else 'NOT NULL'}" for column, null in columns)
+
+
+def uuid_columns():
+    """
+    {table: [(column, null)]} of every column holding a CompactUUIDField value, foreign keys to one included.
+    """
+    columns = defaultdict(list)
+    for model in apps.get_models(include_auto_created=True):
+        if not model._meta.managed or model._meta.proxy or model._meta.swapped:
+            continue
+        for field in model._meta.local_fields:
+            target = field
+            while target.is_relation:
+                target = target.target_field
+            if isinstance(target, CompactUUIDField):
+                columns[model._meta.db_table].append((field.column, field.null))
+    return columns
+
+
+def statements(storage, columns):
+    """
+    MySQL statements converting `columns` to `storage`.
+
+    Each table is rebuilt twice: once to VARBINARY(32), which holds both the
+    hex text and the 16 bytes so the values can be rewritten in place, and
+    once to the final type. Values are only rewritten while they have the
+    other storage's length, so a run cut short can be repeated. Foreign key
+    checks are off throughout, since both ends of a key change one table at
+    a time.
+    """
+    column_type, _, convert = STORAGES[storage]
+    sql = ["SET FOREIGN_KEY_CHECKS = 0"]
+    for table, table_columns in sorted(columns.items()):
+        sql.append(f"ALTER TABLE {quote(table)} {modify(table_columns, 'VARBINARY(32)')}")
+        sql.append(f"UPDATE {quote(table)} SET " + ", ".join(
+            f"{quote(column)} = {convert.format(column=quote(column))}" for column, _ in table_columns
+        ))
+        sql.append(f"ALTER TABLE {quote(table)} {modify(table_columns, column_type)}")
+    sql.append("SET FOREIGN_KEY_CHECKS = 1")
+    return sql
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert every UUID key column on MySQL, primary and foreign, between CHAR(32) and "
+        "BINARY(16). Apply all migrations and stop the application first, convert, then set "
+        "UUID_STORAGE to match. Columns already converted are skipped, so the command can be "
+        "run again after an interruption. Use --dry-run to print the SQL instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('storage', choices=sorted(STORAGES))
+        parser.add_argument('--dry-run', action='store_true', help="Print the statements without running them.")
+
+    def handle(self, *args, **options):
+        storage = options['storage']
+        columns = uuid_columns()
+        if connection.vendor == 'mysql':
+            columns = self.pending(columns, STORAGES[storage][1])
+        elif not options['dry_run']:
+            raise CommandError("Only MySQL stores UUIDs as CHAR(32); other databases need no conversion.")
+        if not columns:
+            self.stdout.write(f"Every UUID column is already {STORAGES[storage][0]}.")
+            return
+
+        sql = statements(storage, columns)
+        if options['dry_run']:
+            self.stdout.write(";\n".join(sql) + ";")
+            return
+        with connection.cursor() as cursor:
+            for statement in sql:
+                self.stdout.write(statement)
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {sum(map(len, columns.values()))} columns in {len(columns)} tables; "
+            f"now set UUID_STORAGE={storage}."
+        ))
+
+    def pending(self, columns, data_type):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT table_name, column_name, data_type FROM information_schema.columns "
+                "WHERE table_schema = DATABASE()"
+            )
+            types = {(table, column): type.lower() for table, column, type in cursor.fetchall()}
+        pending = {}
+        for table, table_columns in columns.items():
+            left = [
+                (column, null) for column, null in table_columns
+                if types.get((table, column), data_type) != data_type
+            ]
+            if left:
+                pending[table] = left
+        return pending
@@ -0,0 +1,50 @@
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service.exports import EXPORTS, FORMATS, encode
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every shop, service or review to a file as NDJSON or CSV, optionally gzipped, "
+        "reading rows in primary key batches so memory stays flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for standard output.")
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true', help="Compress the output on the fly.")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows read per query.")
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="Report peak Python memory; makes the export a few times slower.")
+
+    def handle(self, *args, **options):
+        path = options['output']
+        try:
+            stream = sys.stdout.buffer if path == '-' else open(path, 'wb')
+        except OSError as e:
+            raise CommandError(e)
+
+        if options['trace_memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        written = 0
+        try:
+            for data in encode(options['kind'], options['format'], options['chunk_size'], options['gzip']):
+                stream.write(data)
+                written += len(data)
+        finally:
+            if path != '-':
+                stream.close()
+        elapsed = time.perf_counter() - started
+        summary = f"Exported {options['kind']}: {written / 2 ** 20:.1f} MiB in {elapsed:.1f} s"
+        if options['trace_memory']:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            summary += f", peak memory {peak / 2 ** 20:.1f} MiB"
+        # The export itself may be on stdout
+        self.stderr.write(summary)
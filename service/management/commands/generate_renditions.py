@@ -0,0 +1,53 @@
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from django.core.management.base import BaseCommand, CommandError
+
+from base.renditions import renditions, renditions_field
+from service.exports import batches
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the renditions of every tracked image that has none, such as images set by "
+        "name or uploaded before renditions existed. Renditions already in storage are reused, "
+        "so the command can be run again at any time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append',
+                            help="Only this model, e.g. service.Shop; may be given more than once.")
+        parser.add_argument('--force', action='store_true',
+                            help="Also redo rows with renditions, e.g. after changing IMAGE_RENDITION_WIDTHS.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows read per query.")
+
+    def handle(self, *args, **options):
+        tracked = renditions.tracked
+        if options['model']:
+            wanted = {label.lower() for label in options['model']}
+            tracked = [entry for entry in tracked if entry[0]._meta.label_lower in wanted]
+            if not tracked:
+                raise CommandError(f"No tracked image fields on {', '.join(options['model'])}")
+
+        for model, field, on_done in tracked:
+            started = time.perf_counter()
+            outcomes = Counter()
+            pk = model._meta.pk.attname
+            queryset = model._default_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            for rows in batches(queryset, (pk, field, renditions_field(field)), options['chunk_size']):
+                jobs = [
+                    renditions.submit(model, uid, field, force=options['force'])
+                    for uid, name, recorded in rows
+                    if options['force'] or (recorded or {}).get('source') != name
+                ]
+                for job in jobs:
+                    result = job.result() if isinstance(job, Future) else job
+                    outcomes['failed' if result is None else 'generated' if result else 'unchanged'] += 1
+            # Once for the whole model rather than per row
+            if outcomes['generated'] and on_done:
+                on_done()
+            self.stdout.write(
+                f"{model._meta.label}.{field}: {outcomes['generated']} generated, {outcomes['unchanged']} "
+                f"unchanged, {outcomes['failed']} failed in {time.perf_counter() - started:.1f} s"
+            )
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service.catalog import FORMATS, IMPORTERS, format_for, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream shops, services or time slots from a CSV or NDJSON file into the catalog in "
+        "chunks, creating new rows and updating those whose uid exists. Services refer to "
+        "their shop and category, and time slots to their service, by uid or slug."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help="File to read, or - for standard input.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to csv for .csv files, ndjson otherwise.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per bulk write/transaction.")
+        parser.add_argument('--max-errors', type=int, default=100, help="Errors listed in the report.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or format_for(path)
+
+        def progress(report):
+            self.stdout.write(
+                f"  created {report['created']}  updated {report['updated']}  failed {report['failed']}  "
+                f"{report['rows_per_second']:,} rows/s"
+            )
+
+        importer = IMPORTERS[options['kind']](
+            chunk_size=options['chunk_size'], max_errors=options['max_errors'],
+            progress=progress if options['verbosity'] >= 1 else None,
+        )
+        try:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(e)
+        with stream:
+            report = importer.run(read_rows(stream, format))
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        summary = (
+            f"Imported {options['kind']} rows in {report['elapsed']:.1f} s: {report['created']} created, "
+            f"{report['updated']} updated, {report['failed']} failed ({report['rows_per_second']:,} rows/s)"
+        )
+        self.stdout.write(self.style.WARNING(summary) if report['failed'] else self.style.SUCCESS(summary))
@@ -0,0 +1,216 @@
+import itertools
+import random
+import time
+from datetime import time as clock
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from accounts.models import CustomUser, Profile, ServiceReview
+from base.uuids import uuid7
+from service.models import Category, Coupon, Service, ServiceAddress, Shop, TimeSlot
+from service.signals import refresh_after_bulk_write
+
+CATEGORY_NAMES = ['Hair', 'Skin', 'Nails', 'Spa', 'Makeup', 'Grooming', 'Massage', 'Waxing', 'Bridal', 'Wellness']
+SERVICE_NAMES = [
+    'Haircut', 'Hair Colour', 'Hair Spa', 'Beard Trim', 'Shave', 'Facial', 'Cleanup', 'Manicure',
+    'Pedicure', 'Threading', 'Waxing', 'Head Massage', 'Body Massage', 'Keratin', 'Bridal Makeup',
+]
+SHOP_WORDS = ['Glow', 'Luxe', 'Urban', 'Velvet', 'Royal', 'Bliss', 'Style', 'Shear', 'Aura', 'Posh']
+SHOP_KINDS = ['Salon', 'Studio', 'Spa', 'Lounge', 'Parlour', 'Barbers']
+CITIES = [
+    ('Bengaluru', 12.9716, 77.5946), ('Mumbai', 19.0760, 72.8777), ('Delhi', 28.7041, 77.1025),
+    ('Hyderabad', 17.3850, 78.4867), ('Chennai', 13.0827, 80.2707), ('Pune', 18.5204, 73.8567),
+    ('Kolkata', 22.5726, 88.3639), ('Ahmedabad', 23.0225, 72.5714), ('Jaipur', 26.9124, 75.7873),
+]
+# 2024-01-01 UTC, where the clock behind seeded uids starts
+SEED_EPOCH_MS = 1_704_067_200_000
+
+COMMENTS = ['Great service', 'Loved it', 'Friendly staff', 'Could be better', 'Value for money', 'Will come again']
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the catalog, users and reviews with deterministic synthetic data using batched "
+        "bulk_create, and report rows per second for every model."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42, help="Random seed; the same seed yields the same rows.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk_create/transaction.")
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--cities', type=int, default=20)
+        parser.add_argument('--shops', type=int, default=1000)
+        parser.add_argument('--services', type=int, default=20000)
+        parser.add_argument('--time-slots', type=int, default=100000)
+        parser.add_argument('--coupons', type=int, default=50)
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--reviews', type=int, default=200000)
+        parser.add_argument('--password', default='password123', help="Password set on every seeded user.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.clock = SEED_EPOCH_MS
+        self.chunk_size = options['chunk_size']
+        self.verbosity = options['verbosity']
+        # Slugs and emails carry the seed so that runs with different seeds can share a database
+        self.tag = f"s{options['seed']}"
+        if Shop.objects.filter(slug__endswith=f"-{self.tag}-0").exists():
+            raise CommandError(f"Data for seed {options['seed']} already exists; pick another --seed.")
+
+        started = time.perf_counter()
+        self.total = 0
+        categories = self.seed_categories(options['categories'])
+        self.seed_cities(options['cities'], categories)
+        shops = self.seed_shops(options['shops'])
+        services = self.seed_services(options['services'], shops, categories)
+        self.seed_time_slots(options['time_slots'], services)
+        self.seed_coupons(options['coupons'])
+        users = self.seed_users(options['users'], options['password'])
+        self.seed_reviews(options['reviews'], users, services)
+        if options['reviews']:
+            call_command('rebuild_review_aggregates', batch_size=self.chunk_size, stdout=self.stdout)
+        refresh_after_bulk_write()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {self.total} rows in {elapsed:.1f} s ({self.total / elapsed:,.0f} rows/s)"
+        ))
+
+    def uid(self):
+        # Time-ordered like the application's keys, from a clock that ticks once per row
+        self.clock += 1
+        return uuid7(self.clock, self.rng)
+
+    def write(self, label, model, rows):
+        started = time.perf_counter()
+        written = 0
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+            written += len(chunk)
+            if self.verbosity >= 2:
+                self.stdout.write(f"  {label}: {written}")
+        elapsed = time.perf_counter() - started
+        self.total += written
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(f"{label:<20} {written:>10} rows  {elapsed:7.2f} s  {rate:>12,.0f} rows/s")
+
+    def seed_categories(self, count):
+        uids = [self.uid() for _ in range(count)]
+        self.write('categories', Category, (
+            Category(
+                uid=uid, category_name=f"{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i}",
+                slug=f"{slugify(CATEGORY_NAMES[i % len(CATEGORY_NAMES)])}-{self.tag}-{i}",
+                category_image='categories/default.jpg',
+            )
+            for i, uid in enumerate(uids)
+        ))
+        return uids
+
+    def seed_cities(self, count, categories):
+        uids = [self.uid() for _ in range(count)]
+        self.write('service addresses', ServiceAddress, (
+            ServiceAddress(uid=uid, city_name=f"{CITIES[i % len(CITIES)][0]} {self.tag}-{i}")
+            for i, uid in enumerate(uids)
+        ))
+        Through = ServiceAddress.category.through
+        self.write('city categories', Through, (
+            Through(serviceaddress_id=uid, category_id=category)
+            for uid in uids
+            for category in self.rng.sample(categories, min(len(categories), self.rng.randint(3, 8)))
+        ))
+
+    def seed_shops(self, count):
+        uids = [self.uid() for _ in range(count)]
+
+        def shops():
+            for i, uid in enumerate(uids):
+                name = f"{self.rng.choice(SHOP_WORDS)} {self.rng.choice(SHOP_KINDS)}"
+                city, lat, lon = self.rng.choice(CITIES)
+                yield Shop(
+                    uid=uid, name=name, slug=f"{slugify(name)}-{self.tag}-{i}",
+                    owner=f"Owner {i}", address=f"{i} Main Road, {city}",
+                    contact_number=f"9{self.rng.randrange(10 ** 9):09d}",
+                    latitude=Decimal(f"{self.rng.gauss(lat, 0.08):.6f}"),
+                    longitude=Decimal(f"{self.rng.gauss(lon, 0.08):.6f}"),
+                    is_active=self.rng.random() < 0.95,
+                )
+
+        self.write('shops', Shop, shops())
+        return uids
+
+    def seed_services(self, count, shops, categories):
+        uids = [self.uid() for _ in range(count)]
+
+        def services():
+            for i, uid in enumerate(uids):
+                name = self.rng.choice(SERVICE_NAMES)
+                mrp = self.rng.randrange(200, 5000, 50)
+                yield Service(
+                    uid=uid, shop_id=self.rng.choice(shops), service_name=name,
+                    category_id=self.rng.choice(categories) if categories else None,
+                    slug=f"{slugify(name)}-{self.tag}-{i}",
+                    mrp_price=Decimal(mrp), dis_price=Decimal(mrp - self.rng.randrange(0, mrp // 2, 50)),
+                    product_description=f"{name} by trained stylists.",
+                    is_publish=self.rng.random() < 0.9,
+                )
+
+        self.write('services', Service, services())
+        return uids
+
+    def seed_time_slots(self, count, services):
+        def slots():
+            for _ in range(count):
+                start = self.rng.randrange(9 * 60, 21 * 60, 30)
+                yield TimeSlot(
+                    uid=self.uid(), service_id=self.rng.choice(services),
+                    start_time=clock(start // 60, start % 60),
+                    end_time=clock((start + 30) // 60, (start + 30) % 60),
+                )
+
+        self.write('time slots', TimeSlot, slots())
+
+    def seed_coupons(self, count):
+        self.write('coupons', Coupon, (
+            Coupon(
+                uid=self.uid(), coupon_code=f"SAVE{i % 100000}",
+                is_expired=self.rng.random() < 0.3,
+                discount_price=self.rng.randrange(50, 300, 10), minimum_amount=self.rng.randrange(500, 2000, 100),
+            )
+            for i in range(count)
+        ))
+
+    def seed_users(self, count, password):
+        # Hash once; every seeded user shares the same password
+        password = make_password(password)
+        uids = [self.uid() for _ in range(count)]
+        self.write('users', CustomUser, (
+            CustomUser(id=uid, email=f"user-{self.tag}-{i}@example.com", password=password)
+            for i, uid in enumerate(uids)
+        ))
+        # bulk_create skips the post_save signal that normally creates profiles
+        self.write('profiles', Profile, (Profile(uid=self.uid(), user_id=uid) for uid in uids))
+        return uids
+
+    def seed_reviews(self, count, users, services):
+        if not users or not services:
+            return
+        self.write('reviews', ServiceReview, (
+            ServiceReview(
+                uid=self.uid(), user_id=self.rng.choice(users), service_id=self.rng.choice(services),
+                rating=self.rng.choices((1, 2, 3, 4, 5), weights=(5, 8, 17, 35, 35))[0],
+                comment=self.rng.choice(COMMENTS),
+            )
+            for _ in range(count)
+        ))
@@ -0,0 +1,21 @@
+import logging
+
+from .invalidation import bus
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationMiddleware:
+    """
+    Applies invalidations published by other workers before serving a request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            bus.poll()
+        except Exception:
+            logger.warning("Polling the invalidation bus failed", exc_info=True)
+        return self.get_response(request)
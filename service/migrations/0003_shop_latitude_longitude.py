@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0002_remove_shop_latitude_remove_shop_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text="Latitude of the shop's location (e.g., 12.971598).", max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='shop',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text="Longitude of the shop's location (e.g., 77.594566).", max_digits=9, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0003_shop_latitude_longitude'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shop',
+            index=models.Index(fields=['latitude', 'longitude'], name='shop_lat_lon_idx'),
+        ),
+    ]
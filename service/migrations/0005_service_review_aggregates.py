@@ -0,0 +1,37 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Service = apps.get_model('service', 'Service')
+    ServiceReview = apps.get_model('accounts', 'ServiceReview')
+    totals = (
+        ServiceReview.objects.filter(service__isnull=False).order_by().values('service')
+        .annotate(count=Count('pk'), total=Sum('rating'))
+    )
+    for row in totals.iterator(chunk_size=2000):
+        Service.objects.filter(pk=row['service']).update(review_count=row['count'], rating_sum=row['total'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0004_shop_lat_lon_idx'),
+        ('accounts', '0002_address_lat_lon_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
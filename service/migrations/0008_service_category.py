@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services', to='service.category'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+INDEXES = (
+    ('service_service', 'service_search_ft', 'service_name, product_description'),
+    ('service_shop', 'shop_search_ft', 'name, address'),
+)
+
+
+def add_fulltext_indexes(apps, schema_editor):
+    # Other databases search through the in-process index instead
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, columns in INDEXES:
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} ({columns})")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, name, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0010_reservations'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_indexes, drop_fulltext_indexes),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:17
+
+import base.uuids
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0012_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='coupon',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='scheduleexception',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='schedulerule',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='serviceaddress',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='shop',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='slotinventory',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='timeslot',
+            name='uid',
+            field=base.uuids.CompactUUIDField(default=base.uuids.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 09:33
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0013_time_ordered_uuids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='scheduleexception',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='schedulerule',
+            name='slot_minutes',
+            field=models.PositiveSmallIntegerField(default=30, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0014_schedule_slot_minutes_min'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='slotinventory',
+            index=models.Index(fields=['date', 'remaining'], name='slot_inventory_date_left_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0015_slot_inventory_date_left_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='service',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rule_reservations', to='service.service'),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='slotinventory',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='slotinventory',
+            name='service',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rule_inventory', to='service.service'),
+        ),
+        migrations.AddField(
+            model_name='slotinventory',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='time_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='service.timeslot'),
+        ),
+        migrations.AlterField(
+            model_name='slotinventory',
+            name='time_slot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inventory', to='service.timeslot'),
+        ),
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.CheckConstraint(condition=models.Q(('time_slot__isnull', False), models.Q(('end_time__isnull', False), ('service__isnull', False), ('start_time__isnull', False)), _connector='OR'), name='reservation_has_slot'),
+        ),
+        migrations.AddConstraint(
+            model_name='slotinventory',
+            constraint=models.UniqueConstraint(fields=('service', 'date', 'start_time', 'end_time'), name='unique_rule_slot_inventory_date'),
+        ),
+    ]
@@ -1,8 +1,10 @@
+from django.conf import settings
 from django.db import models
 from base.models import BaseModel
-from django.utils.text import slugify
-from django.db.models import Avg
+from base.slugs import unique_slug
 from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from .geo import GeoQuerySet
 
 
 class Category(BaseModel):
@@ -10,10 +12,17 @@ class Category(BaseModel):
     slug = models.SlugField(unique=True, null=True, blank=True)
     is_publish = models.BooleanField(default=True)
     category_image = models.ImageField(upload_to='categories')
+    # Names of resized copies, kept up to date by base.renditions
+    category_image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'uid'], name='category_created_uid_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.category_name)
+            self.slug = unique_slug(self, self.category_name)
         super(Category, self).save(*args, **kwargs)
 
     def __str__(self):
@@ -29,6 +38,7 @@ class Shop(BaseModel):
     email = models.EmailField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     image = models.ImageField(upload_to='shop_images', null=True, blank=True)
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
     latitude = models.DecimalField(
         max_digits=9, decimal_places=6, null=True, blank=True,
         help_text="Latitude of the shop's location (e.g., 12.971598)."
@@ -38,25 +48,26 @@ class Shop(BaseModel):
         help_text="Longitude of the shop's location (e.g., 77.594566)."
     )
 
+    objects = GeoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='shop_lat_lon_idx'),
+            models.Index(fields=['created_at', 'uid'], name='shop_created_uid_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.name)
+            self.slug = unique_slug(self, self.name)
         super(Shop, self).save(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
-    @property
-    def latitude(self):
-        return Decimal(super().latitude)
-
-    @property
-    def longitude(self):
-        return Decimal(super().longitude)
-
 
 class Service(BaseModel):
     shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name="services")
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name="services")
     service_name = models.CharField(max_length=100)
     mrp_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     dis_price = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
@@ -66,33 +77,185 @@ class Service(BaseModel):
     fake_review = models.IntegerField(null=True, blank=True)
     fake_rating = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     image = models.ImageField(upload_to='shop_images', null=True, blank=True, default='default_shop.jpg')
+    image_renditions = models.JSONField(default=dict, blank=True, editable=False)
+    # Kept in step with product_reviews by the ServiceReview signal handlers
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+
+    # Written only by F() updates in adjust_review_aggregates and rebuild_review_aggregates
+    AGGREGATE_FIELDS = ('review_count', 'rating_sum')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'uid'], name='service_created_uid_idx'),
+            models.Index(fields=['shop', 'created_at', 'uid'], name='service_shop_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.service_name)
+            self.slug = unique_slug(self, self.service_name)
+        if not self._state.adding and not kwargs.get('force_insert'):
+            # A stale instance would otherwise write its old counters back over concurrent reviews
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [field.name for field in self._meta.concrete_fields
+                                 if not field.primary_key and field.attname not in deferred]
+            kwargs['update_fields'] = [field for field in update_fields if field not in self.AGGREGATE_FIELDS]
         super(Service, self).save(*args, **kwargs)
 
     def __str__(self):
         return self.service_name
 
     def total_reviews(self):
-        return self.product_reviews.count()
+        return self.review_count
 
     @property
     def average_rating(self):
-        avg_rating = self.product_reviews.aggregate(Avg('rating'))['rating__avg']
-        return avg_rating if avg_rating is not None else 0
+        return self.rating_sum / self.review_count if self.review_count else 0
 
 
 class TimeSlot(BaseModel):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="time_slots")
     start_time = models.TimeField()
     end_time = models.TimeField()
+    capacity = models.PositiveSmallIntegerField(default=1)
 
     def __str__(self):
         return f"TimeSlot: {self.service.service_name} ({self.start_time} - {self.end_time})"
 
 
+class SlotInventory(BaseModel):
+    """
+    Seats left in a time slot on one day, created by the first booking of that day.
+
+    The slot is either a TimeSlot row or, for slots generated from schedule
+    rules, the service with the slot's start and end time. Bookings take a
+    seat with a single conditional UPDATE on this row, see service.reservations.
+    """
+    time_slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name="inventory", null=True, blank=True)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="rule_inventory", null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    date = models.DateField()
+    remaining = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['time_slot', 'date'], name='unique_slot_inventory_date'),
+            models.UniqueConstraint(fields=['service', 'date', 'start_time', 'end_time'],
+                                    name='unique_rule_slot_inventory_date'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'remaining'], name='slot_inventory_date_left_idx'),
+        ]
+
+    def __str__(self):
+        slot = self.time_slot or f"{self.service_id} ({self.start_time} - {self.end_time})"
+        return f"{slot} on {self.date}: {self.remaining} left"
+
+
+class Reservation(BaseModel):
+    STATUS_CHOICES = (
+        ('confirmed', 'Confirmed'),
+        ('cancelled', 'Cancelled'),
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="reservations")
+    time_slot = models.ForeignKey(TimeSlot, on_delete=models.CASCADE, related_name="reservations",
+                                  null=True, blank=True)
+    # Set instead of time_slot for slots generated from schedule rules
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="rule_reservations",
+                                null=True, blank=True)
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='confirmed')
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(time_slot__isnull=False) | models.Q(
+                    service__isnull=False, start_time__isnull=False, end_time__isnull=False
+                ),
+                name='reservation_has_slot',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'date'], name='reservation_user_date_idx'),
+            models.Index(fields=['time_slot', 'date'], name='reservation_slot_date_idx'),
+        ]
+
+    def __str__(self):
+        slot = self.time_slot or f"{self.service_id} ({self.start_time} - {self.end_time})"
+        return f"{self.user} - {slot} on {self.date} ({self.status})"
+
+
+class ScheduleRule(BaseModel):
+    """
+    A weekly opening window of a service, cut into bookable slots on demand by service.schedule.
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    )
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="schedule_rules")
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    slot_minutes = models.PositiveSmallIntegerField(default=30, validators=[MinValueValidator(1)])
+    valid_from = models.DateField(null=True, blank=True)
+    valid_until = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['weekday', 'start_time'], name='schedule_weekday_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.service.service_name}: {self.get_weekday_display()} {self.start_time} - {self.end_time}"
+
+    def clean(self):
+        if self.end_time <= self.start_time:
+            raise ValidationError("End time must be after start time.")
+        if not self.slot_minutes:
+            raise ValidationError("Slot length must be at least one minute.")
+        if self.valid_from and self.valid_until and self.valid_until < self.valid_from:
+            raise ValidationError("The rule must end on or after the day it starts.")
+
+
+class ScheduleException(BaseModel):
+    """
+    A one-day override of a service's schedule rules.
+
+    Closed exceptions remove the slots overlapping `start_time`-`end_time`, or
+    the whole day when no times are given; open ones add a window cut into
+    `slot_minutes` slots.
+    """
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name="schedule_exceptions")
+    date = models.DateField()
+    start_time = models.TimeField(null=True, blank=True)
+    end_time = models.TimeField(null=True, blank=True)
+    is_closed = models.BooleanField(default=True)
+    slot_minutes = models.PositiveSmallIntegerField(default=30, validators=[MinValueValidator(1)])
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['service', 'date'], name='schedule_exc_service_date_idx'),
+        ]
+
+    def __str__(self):
+        state = "closed" if self.is_closed else "open"
+        return f"{self.service.service_name}: {state} on {self.date}"
+
+    def clean(self):
+        if (self.start_time is None) != (self.end_time is None):
+            raise ValidationError("Give both start and end time, or neither for the whole day.")
+        if self.start_time is not None and self.end_time <= self.start_time:
+            raise ValidationError("End time must be after start time.")
+        if not self.is_closed and self.start_time is None:
+            raise ValidationError("Open exceptions need a start and end time.")
+
+
 class ServiceAddress(BaseModel):
     city_name = models.CharField(max_length=180, unique=True)
     category = models.ManyToManyField(Category, related_name="city_services")
@@ -107,6 +270,11 @@ class Coupon(BaseModel):
     discount_price = models.IntegerField(default=100)
     minimum_amount = models.IntegerField(default=500)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'uid'], name='coupon_created_uid_idx'),
+        ]
+
     def __str__(self):
         return self.coupon_code
 
@@ -114,3 +282,19 @@ class Coupon(BaseModel):
         
         if self.discount_price >= self.minimum_amount:
             raise ValidationError("Discount price must be less than the minimum amount.")
+
+
+class ChangeEvent(models.Model):
+    """
+    One entry in the cross-worker invalidation log read by service.invalidation.
+
+    The auto-increment `id` is the sequence number workers poll past.
+    """
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=50)
+    key = models.CharField(max_length=64, blank=True)
+    origin = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.id} {self.topic}:{self.key}"
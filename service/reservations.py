@@ -0,0 +1,97 @@
+from collections import namedtuple
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Reservation, SlotInventory, TimeSlot
+
+
+class ReservationError(Exception):
+    pass
+
+
+class SlotFullError(ReservationError):
+    pass
+
+
+class RuleSlot(namedtuple('RuleSlot', ['service', 'start_time', 'end_time'])):
+    """
+    A slot generated from the schedule rules of `service`, booked by its start and end time.
+    """
+    # Schedule rules have no capacity field; each generated slot seats one booking
+    capacity = 1
+
+
+def slot_lookup(slot):
+    """
+    Field lookups that identify `slot`, a TimeSlot or a RuleSlot, on SlotInventory and Reservation.
+    """
+    if isinstance(slot, TimeSlot):
+        return {'time_slot': slot}
+    return {'time_slot': None, 'service': slot.service, 'start_time': slot.start_time, 'end_time': slot.end_time}
+
+
+def inventory_for(slot, date):
+    """
+    The SlotInventory row of `slot` on `date`, created with every seat free on first use.
+    """
+    lookup = slot_lookup(slot)
+    try:
+        # Savepoint so a concurrent creator's IntegrityError doesn't break the caller's transaction
+        with transaction.atomic():
+            inventory, _ = SlotInventory.objects.get_or_create(
+                date=date, defaults={'remaining': slot.capacity}, **lookup
+            )
+    except IntegrityError:
+        inventory = SlotInventory.objects.get(date=date, **lookup)
+    return inventory
+
+
+def reserve(user, slot, date):
+    """
+    Book one seat of `slot` on `date` for `user`.
+
+    `slot` is a TimeSlot or a RuleSlot; the seat inventory of a generated
+    slot is created by its first booking, like that of a TimeSlot.
+
+    The seat is taken with `UPDATE ... SET remaining = remaining - 1 WHERE
+    remaining > 0`. The database applies it atomically and holds the row lock
+    only until this short transaction commits, so concurrent bookings of the
+    same slot queue on one row and can never oversell it.
+
+    The duplicate check runs after the seat is taken, under that lock, and
+    as a locking read, which sees the latest committed rows rather than the
+    transaction's snapshot; two concurrent requests of one user therefore
+    can't both pass it. A duplicate rolls the seat back.
+
+    Raises:
+        SlotFullError: No seats are left.
+        ReservationError: The user already holds a seat in this slot on that day.
+    """
+    with transaction.atomic():
+        lookup = slot_lookup(slot)
+        inventory = inventory_for(slot, date)
+        taken = SlotInventory.objects.filter(pk=inventory.pk, remaining__gt=0).update(remaining=F('remaining') - 1)
+        booked = Reservation.objects.select_for_update().filter(
+            user=user, date=date, status='confirmed', **lookup
+        ).exists()
+        if booked:
+            raise ReservationError("You have already booked this slot")
+        if not taken:
+            raise SlotFullError("This slot is fully booked")
+        return Reservation.objects.create(user=user, date=date, **lookup)
+
+
+def cancel(reservation):
+    """
+    Cancel a confirmed reservation and give its seat back; returns False if it was not confirmed.
+    """
+    with transaction.atomic():
+        cancelled = Reservation.objects.filter(pk=reservation.pk, status='confirmed').update(status='cancelled')
+        if cancelled:
+            SlotInventory.objects.filter(
+                time_slot_id=reservation.time_slot_id, service_id=reservation.service_id,
+                start_time=reservation.start_time, end_time=reservation.end_time, date=reservation.date,
+            ).update(remaining=F('remaining') + 1)
+            reservation.status = 'cancelled'
+        return bool(cancelled)
@@ -0,0 +1,133 @@
+import heapq
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+
+WEEK = timedelta(days=7)
+
+
+def cut(day, start_time, end_time, slot_minutes):
+    """
+    Yield the (start, end) datetimes of the whole slots between two times of one day.
+    """
+    if slot_minutes <= 0:
+        raise ValueError(f"slot_minutes must be positive, not {slot_minutes}")
+    start = datetime.combine(day, start_time)
+    end = datetime.combine(day, end_time)
+    step = timedelta(minutes=slot_minutes)
+    while start + step <= end:
+        yield start, start + step
+        start += step
+
+
+def expand_rule(rule, first_day, last_day):
+    """
+    Yield the slots of a ScheduleRule from `first_day` to `last_day` inclusive, in order.
+    """
+    if rule.valid_from and rule.valid_from > first_day:
+        first_day = rule.valid_from
+    if rule.valid_until and rule.valid_until < last_day:
+        last_day = rule.valid_until
+    day = first_day + timedelta(days=(rule.weekday - first_day.weekday()) % 7)
+    while day <= last_day:
+        yield from cut(day, rule.start_time, rule.end_time, rule.slot_minutes)
+        day += WEEK
+
+
+def expand(rules, exceptions, first_day, last_day):
+    """
+    Lazily merge the slots of several rules and open exceptions, minus closures.
+
+    Each rule is its own ordered stream and heapq.merge only holds the head of
+    each, so memory stays flat however far ahead the caller reads. Slots given
+    by more than one rule are yielded once.
+
+    Args:
+        rules (iterable): ScheduleRule instances of one service.
+        exceptions (iterable): ScheduleException instances of that service.
+        first_day (date): First day to expand.
+        last_day (date): Last day to expand, inclusive.
+
+    Yields:
+        tuple: (start, end) datetimes in ascending order.
+    """
+    closures = defaultdict(list)
+    streams = [expand_rule(rule, first_day, last_day) for rule in rules]
+    for exception in exceptions:
+        if not first_day <= exception.date <= last_day:
+            continue
+        if exception.is_closed:
+            if exception.start_time is None:
+                closures[exception.date].append(None)
+            else:
+                closures[exception.date].append((
+                    datetime.combine(exception.date, exception.start_time),
+                    datetime.combine(exception.date, exception.end_time),
+                ))
+        else:
+            streams.append(cut(exception.date, exception.start_time, exception.end_time, exception.slot_minutes))
+
+    previous = None
+    for start, end in heapq.merge(*streams):
+        if (start, end) == previous:
+            continue
+        previous = start, end
+        closed = closures.get(start.date(), ())
+        if any(window is None or (start < window[1] and window[0] < end) for window in closed):
+            continue
+        yield start, end
+
+
+def service_slots(service, first_day, last_day):
+    """
+    Stream the schedule of `service` between two days from its rules and exceptions.
+    """
+    rules = service.schedule_rules.filter(weekday__in=weekdays_between(first_day, last_day))
+    exceptions = service.schedule_exceptions.filter(date__range=(first_day, last_day))
+    return expand(rules, exceptions, first_day, last_day)
+
+
+def weekdays_between(first_day, last_day):
+    days = (last_day - first_day).days + 1
+    return sorted({(first_day + timedelta(days=i)).weekday() for i in range(min(days, 7))})
+
+
+def slots_on(day, lo, hi, services=None):
+    """
+    Rule and exception slots of every service on `day` that fit in [lo, hi] minutes after midnight.
+
+    `lo` and `hi` are times of that day, so both are below 1440.
+
+    Args:
+        services (set): Only consider these service uids.
+
+    Returns:
+        dict: service uid -> list of (start, end) minutes, earliest first.
+    """
+    from .models import ScheduleException, ScheduleRule
+
+    rules = defaultdict(list)
+    for rule in ScheduleRule.objects.filter(
+        Q(valid_from__isnull=True) | Q(valid_from__lte=day),
+        Q(valid_until__isnull=True) | Q(valid_until__gte=day),
+        weekday=day.weekday(), start_time__lt=time(hi // 60, hi % 60), end_time__gt=time(lo // 60, lo % 60),
+    ):
+        rules[rule.service_id].append(rule)
+    exceptions = defaultdict(list)
+    for exception in ScheduleException.objects.filter(date=day):
+        exceptions[exception.service_id].append(exception)
+
+    midnight = datetime.combine(day, time())
+    found = {}
+    for uid in rules.keys() | exceptions.keys():
+        if services is not None and uid not in services:
+            continue
+        fitting = []
+        for start, end in expand(rules[uid], exceptions[uid], day, day):
+            start, end = ((moment - midnight) // timedelta(minutes=1) for moment in (start, end))
+            if lo <= start and end <= hi:
+                fitting.append((start, end))
+        if fitting:
+            found[uid] = fitting
+    return found
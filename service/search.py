@@ -0,0 +1,280 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .indexing import LazyIndex
+
+TOKEN_RE = re.compile(r'\w+')
+
+# How much a term counts towards a service depending on the field it occurs in
+FIELD_WEIGHTS = {'service_name': 3, 'shop_name': 2, 'product_description': 1, 'address': 1}
+
+# BM25 term-frequency saturation and length normalisation
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens of `text`, single characters dropped.
+    """
+    return [token for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def weigh(**fields):
+    """
+    Term frequencies of several fields, each scaled by its weight in FIELD_WEIGHTS.
+    """
+    terms = Counter()
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS[field]
+        for token in tokenize(text):
+            terms[token] += weight
+    return terms
+
+
+class SearchIndex(LazyIndex):
+    """
+    Process-local inverted index over services and the name and address of their shop.
+
+    Loaded lazily from the database on first use, then kept current by the
+    Service and Shop signal handlers one row at a time; `invalidate()` drops
+    it so the next query reloads everything, e.g. after bulk writes.
+    """
+
+    def _load(self):
+        from .models import Service, Shop
+
+        return SearchState.build(
+            Shop.objects.values_list('uid', 'name', 'address').iterator(chunk_size=10000),
+            Service.objects.values_list(
+                'uid', 'shop_id', 'service_name', 'product_description', 'is_publish', 'dis_price',
+            ).iterator(chunk_size=10000),
+        )
+
+    def update_service(self, uid, shop_id, service_name, product_description, is_publish, price):
+        self._apply('set_service', uid, shop_id, service_name, product_description, is_publish, price)
+
+    def remove_service(self, uid):
+        self._apply('remove_service', uid)
+
+    def update_shop(self, uid, name, address):
+        self._apply('set_shop', uid, name, address)
+
+    def remove_shop(self, uid):
+        self._apply('remove_shop', uid)
+
+    def search(self, query, is_publish=True, min_price=None, max_price=None):
+        """
+        Services matching any term of `query`, best first.
+
+        Args:
+            is_publish (bool): Only services with this publish state; None for all.
+            min_price, max_price: Bounds on `dis_price`; services without one are left out.
+
+        Returns:
+            list: (service uid, BM25 score) pairs.
+        """
+        state = self.state()
+        with self._lock:
+            return state.search(query, is_publish, min_price, max_price)
+
+
+class SearchState:
+    """
+    Postings and per-service documents; guarded by SearchIndex's lock.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.services = {}
+        self.shops = {}
+        self.by_shop = defaultdict(set)
+        self.total_length = 0
+
+    @classmethod
+    def build(cls, shops, services):
+        """
+        State from (uid, name, address) shop rows and
+        (uid, shop_id, service_name, product_description, is_publish, price) service rows.
+        """
+        state = cls()
+        for uid, name, address in shops:
+            state.shops[uid] = weigh(shop_name=name, address=address)
+        for service in services:
+            state.set_service(*service)
+        return state
+
+    def set_service(self, uid, shop_id, service_name, product_description, is_publish, price):
+        self.remove_service(uid)
+        own = weigh(service_name=service_name, product_description=product_description)
+        price = float(price) if price is not None else None
+        self.services[uid] = [shop_id, own, is_publish, price, 0]
+        self.by_shop[shop_id].add(uid)
+        self._post(uid)
+
+    def remove_service(self, uid):
+        document = self.services.pop(uid, None)
+        if document is None:
+            return
+        self._unpost(uid, document)
+        self.by_shop[document[0]].discard(uid)
+
+    def set_shop(self, uid, name, address):
+        # The shop's name and address are part of every one of its services
+        services = self.by_shop.get(uid, ())
+        for service in services:
+            self._unpost(service, self.services[service])
+        self.shops[uid] = weigh(shop_name=name, address=address)
+        for service in services:
+            self._post(service)
+
+    def remove_shop(self, uid):
+        for service in list(self.by_shop.pop(uid, ())):
+            self.remove_service(service)
+        self.shops.pop(uid, None)
+
+    def _terms(self, document):
+        terms = document[1].copy()
+        terms.update(self.shops.get(document[0], ()))
+        return terms
+
+    def _post(self, uid):
+        document = self.services[uid]
+        terms = self._terms(document)
+        for term, frequency in terms.items():
+            self.postings[term][uid] = frequency
+        document[4] = sum(terms.values())
+        self.total_length += document[4]
+
+    def _unpost(self, uid, document):
+        for term in self._terms(document):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(uid, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= document[4]
+
+    def search(self, query, is_publish, min_price, max_price):
+        if not self.services:
+            return []
+        count = len(self.services)
+        average_length = self.total_length / count or 1
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+            for uid, frequency in posting.items():
+                length = self.services[uid][4]
+                scores[uid] += idf * frequency * (K1 + 1) / (
+                    frequency + K1 * (1 - B + B * length / average_length)
+                )
+
+        found = []
+        for uid, score in scores.items():
+            _, _, published, price, _ = self.services[uid]
+            if is_publish is not None and published != is_publish:
+                continue
+            if (min_price is not None or max_price is not None) and price is None:
+                continue
+            if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                continue
+            found.append((uid, score))
+        found.sort(key=lambda item: (-item[1], str(item[0])))
+        return found
+
+
+def fulltext_match(query):
+    """
+    Whether a service or its shop matches `query`, as a condition MySQL answers from the FULLTEXT indexes.
+
+    The shop side is a semi-join, so the matching shops are looked up once
+    through their index rather than once per service.
+    """
+    from .models import Service, Shop
+
+    service_table = connection.ops.quote_name(Service._meta.db_table)
+    shop_table = connection.ops.quote_name(Shop._meta.db_table)
+    return RawSQL(
+        f"(MATCH({service_table}.service_name, {service_table}.product_description) "
+        f"AGAINST (%s IN NATURAL LANGUAGE MODE) OR {service_table}.shop_id IN "
+        f"(SELECT shop.uid FROM {shop_table} shop "
+        f"WHERE MATCH(shop.name, shop.address) AGAINST (%s IN NATURAL LANGUAGE MODE)))",
+        (query, query), output_field=BooleanField(),
+    )
+
+
+def fulltext_score(query):
+    """
+    MySQL relevance of a service to `query` over its own and its shop's FULLTEXT indexes.
+    """
+    from .models import Service, Shop
+
+    service_table = connection.ops.quote_name(Service._meta.db_table)
+    shop_table = connection.ops.quote_name(Shop._meta.db_table)
+    return RawSQL(
+        f"MATCH({service_table}.service_name, {service_table}.product_description) "
+        f"AGAINST (%s IN NATURAL LANGUAGE MODE) + "
+        f"(SELECT MATCH(shop.name, shop.address) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+        f"FROM {shop_table} shop WHERE shop.uid = {service_table}.shop_id)",
+        (query, query), output_field=FloatField(),
+    )
+
+
+def fulltext_services(query, is_publish=True, min_price=None, max_price=None):
+    """
+    The services matching `query` by MySQL FULLTEXT, with the filters of search_services applied in SQL.
+    """
+    from .models import Service
+
+    services = Service.objects.filter(fulltext_match(query))
+    if is_publish is not None:
+        services = services.filter(is_publish=is_publish)
+    if min_price is not None:
+        services = services.filter(dis_price__gte=min_price)
+    if max_price is not None:
+        services = services.filter(dis_price__lte=max_price)
+    return services
+
+
+def use_fulltext():
+    backend = settings.SEARCH_BACKEND
+    if backend == 'auto':
+        return connection.vendor == 'mysql'
+    return backend == 'mysql'
+
+
+def search_services(query, is_publish=True, min_price=None, max_price=None, offset=0, limit=None):
+    """
+    The services matching `query`, best first.
+
+    Ranked by MySQL FULLTEXT when the database supports it, otherwise by the
+    in-process index; SEARCH_BACKEND forces one or the other. MySQL counts
+    the matches and scores, orders and cuts out only the requested page.
+
+    Args:
+        offset (int): Matches to skip.
+        limit (int): Most matches to return; None for all from `offset`.
+
+    Returns:
+        tuple: The number of matches and a list of (service uid, score) pairs.
+    """
+    end = None if limit is None else offset + limit
+    if not use_fulltext():
+        found = search_index.search(query, is_publish, min_price, max_price)
+        return len(found), found[offset:end]
+
+    services = fulltext_services(query, is_publish, min_price, max_price)
+    page = services.annotate(score=fulltext_score(query)).order_by('-score', 'uid').values_list('uid', 'score')
+    return services.count(), list(page[offset:end])
+
+
+search_index = SearchIndex()
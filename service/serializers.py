@@ -1,43 +1,77 @@
+from datetime import datetime
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Category, Shop, Service, TimeSlot, ServiceAddress, Coupon
+
+from base.renditions import RenditionsField
+from .models import Category, Shop, Service, TimeSlot, ServiceAddress, Coupon, Reservation
+from .schedule import service_slots
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    category_image_renditions = RenditionsField()
+
     class Meta:
         model = Category
-        fields = ['id', 'category_name', 'slug', 'is_publish', 'category_image']
+        fields = ['uid', 'category_name', 'slug', 'is_publish', 'category_image', 'category_image_renditions']
 
 
 class ShopSerializer(serializers.ModelSerializer):
+    image_renditions = RenditionsField()
+
     class Meta:
         model = Shop
         fields = [
-            'id', 'name', 'slug', 'owner', 'address',
+            'uid', 'name', 'slug', 'owner', 'address',
             'contact_number', 'email', 'is_active',
-            'image', 'latitude', 'longitude'
+            'image', 'image_renditions', 'latitude', 'longitude'
         ]
 
 
+class NearestShopSerializer(ShopSerializer):
+    distance_km = serializers.FloatField(read_only=True)
+    road_distance_m = serializers.FloatField(read_only=True, default=None)
+
+    class Meta(ShopSerializer.Meta):
+        fields = ShopSerializer.Meta.fields + ['distance_km', 'road_distance_m']
+
+
 class ServiceSerializer(serializers.ModelSerializer):
     shop = ShopSerializer(read_only=True)
+    image_renditions = RenditionsField()
 
     class Meta:
         model = Service
         fields = [
-            'id', 'shop', 'service_name', 'mrp_price', 'dis_price',
+            'uid', 'shop', 'category', 'service_name', 'mrp_price', 'dis_price',
             'product_description', 'is_publish', 'slug',
-            'fake_review', 'fake_rating', 'image',
+            'fake_review', 'fake_rating', 'image', 'image_renditions',
             'total_reviews', 'average_rating'
         ]
         read_only_fields = ['slug', 'total_reviews', 'average_rating']
 
 
+class AvailableServiceSerializer(ServiceSerializer):
+    distance_km = serializers.FloatField(read_only=True, default=None)
+    free_slots = serializers.ListField(read_only=True)
+
+    class Meta(ServiceSerializer.Meta):
+        fields = ServiceSerializer.Meta.fields + ['distance_km', 'free_slots']
+
+
+class ServiceSearchResultSerializer(ServiceSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(ServiceSerializer.Meta):
+        fields = ServiceSerializer.Meta.fields + ['score']
+
+
 class TimeSlotSerializer(serializers.ModelSerializer):
     service = serializers.StringRelatedField()  # Displays the `__str__` representation of the Service
 
     class Meta:
         model = TimeSlot
-        fields = ['id', 'service', 'start_time', 'end_time']
+        fields = ['uid', 'service', 'start_time', 'end_time']
 
 
 class ServiceAddressSerializer(serializers.ModelSerializer):
@@ -45,10 +79,37 @@ class ServiceAddressSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ServiceAddress
-        fields = ['id', 'city_name', 'category']
+        fields = ['uid', 'city_name', 'category']
 
 
 class CouponSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coupon
-        fields = ['id', 'coupon_code', 'is_expired', 'discount_price', 'minimum_amount']
+        fields = ['uid', 'coupon_code', 'is_expired', 'discount_price', 'minimum_amount']
+
+
+class ReservationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Reservation
+        fields = ['uid', 'time_slot', 'service', 'start_time', 'end_time', 'date', 'status', 'created_at']
+        read_only_fields = ['status', 'created_at']
+
+    def validate_date(self, value):
+        if value < timezone.localdate():
+            raise serializers.ValidationError("Cannot book a slot in the past.")
+        return value
+
+    def validate(self, attrs):
+        rule_fields = [attrs.get(field) for field in ('service', 'start_time', 'end_time')]
+        if attrs.get('time_slot') is not None:
+            if any(value is not None for value in rule_fields):
+                raise serializers.ValidationError("Give either time_slot or service, start_time and end_time.")
+            return attrs
+        if any(value is None for value in rule_fields):
+            raise serializers.ValidationError("Give either time_slot or service, start_time and end_time.")
+        service, start_time, end_time = rule_fields
+        day = attrs['date']
+        wanted = (datetime.combine(day, start_time), datetime.combine(day, end_time))
+        if wanted not in set(service_slots(service, day, day)):
+            raise serializers.ValidationError("The service's schedule has no such slot on that date.")
+        return attrs
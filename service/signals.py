@@ -0,0 +1,218 @@
+import functools
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from base.renditions import track
+from .autocomplete import autocomplete_index
+from .availability import availability_index
+from .facets import facet_index
+from .caching import bump_model_version
+from .geo import shop_index
+from .invalidation import ALL, bus
+from .models import Category, Service, ServiceAddress, Shop, TimeSlot
+from .search import search_index
+
+
+# Model -> (bus topic, [(index, fields passed after the uid to `update`, update method, remove method)]).
+# Saves and deletes of these models are applied to each index here once the transaction commits, and in
+# the other workers by refresh_indexes; an index without a remove method keeps deleted rows.
+INDEXED = {
+    Shop: ('shop', [
+        (shop_index, ('latitude', 'longitude', 'is_active'), 'update', 'remove'),
+        (search_index, ('name', 'address'), 'update_shop', 'remove_shop'),
+        (autocomplete_index, ('name', 'is_active'), 'update_shop', 'remove_shop'),
+        (facet_index, ('is_active',), 'update_shop', None),
+    ]),
+    Service: ('service', [
+        (availability_index, ('shop_id', 'category_id', 'is_publish'), 'update_service', 'remove_service'),
+        (search_index, ('shop_id', 'service_name', 'product_description', 'is_publish', 'dis_price'),
+         'update_service', 'remove_service'),
+        (autocomplete_index, ('service_name', 'shop_id', 'category_id', 'is_publish', 'review_count'),
+         'update_service', 'remove_service'),
+        (facet_index, ('shop_id', 'category_id', 'is_publish', 'dis_price', 'review_count', 'rating_sum'),
+         'update_service', 'remove_service'),
+    ]),
+    TimeSlot: ('time_slot', [
+        (availability_index, ('service_id', 'start_time', 'end_time'), 'update_slot', 'remove_slot'),
+    ]),
+    Category: ('category', [
+        (autocomplete_index, ('category_name', 'is_publish'), 'update_category', 'remove_category'),
+        (facet_index, ('category_name', 'is_publish'), 'update_category', 'remove_category'),
+    ]),
+}
+
+
+def indexed_fields(model):
+    return sorted({field for _, fields, _, _ in INDEXED[model][1] for field in fields})
+
+
+def apply_row(model, uid, row):
+    """
+    Apply a row of `model`, as {field: value}, to its indexes; None removes it.
+    """
+    for index, fields, update, remove in INDEXED[model][1]:
+        if row is not None:
+            getattr(index, update)(uid, *(row[field] for field in fields))
+        elif remove:
+            getattr(index, remove)(uid)
+
+
+def update_indexes(sender, instance, created=False, **kwargs):
+    fields = indexed_fields(sender)
+    # Saves of existing rows don't write these, so the instance may hold stale values
+    stored = [] if created else [field for field in fields if field in getattr(sender, 'AGGREGATE_FIELDS', ())]
+    uid, row = instance.uid, {field: getattr(instance, field) for field in fields if field not in stored}
+
+    def apply():
+        if stored:
+            current = sender.objects.filter(uid=uid).values(*stored).first()
+            if current is None:
+                # Deleted since; its post_delete handler removes it
+                return
+            row.update(current)
+        apply_row(sender, uid, row)
+
+    transaction.on_commit(apply)
+    bus.publish(INDEXED[sender][0], uid)
+
+
+def remove_from_indexes(sender, instance, **kwargs):
+    uid = instance.uid
+    transaction.on_commit(lambda: apply_row(sender, uid, None))
+    bus.publish(INDEXED[sender][0], uid)
+
+
+def refresh_indexes(model, keys):
+    """
+    Apply writes to `model` made by other workers to this worker's indexes.
+    """
+    if ALL in keys:
+        for index, *_ in INDEXED[model][1]:
+            index.invalidate()
+        return
+    uids = [uuid.UUID(key) for key in keys]
+    rows = {row['uid']: row for row in model.objects.filter(uid__in=uids).values('uid', *indexed_fields(model))}
+    for uid in uids:
+        apply_row(model, uid, rows.get(uid))
+
+
+for model, (topic, _) in INDEXED.items():
+    post_save.connect(update_indexes, sender=model)
+    post_delete.connect(remove_from_indexes, sender=model)
+    bus.subscribe(topic, functools.partial(refresh_indexes, model))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ServiceAddress)
+@receiver(post_delete, sender=ServiceAddress)
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_cached_responses(sender, **kwargs):
+    bump_model_version(sender)
+
+
+@receiver(m2m_changed, sender=ServiceAddress.category.through)
+def invalidate_cached_city_categories(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_model_version(ServiceAddress)
+
+
+@receiver(post_save, sender=ServiceAddress)
+def update_city_indexes(sender, instance, **kwargs):
+    uid = instance.uid
+    transaction.on_commit(lambda: refresh_cities({str(uid)}))
+    bus.publish('city', uid)
+
+
+@receiver(post_delete, sender=ServiceAddress)
+def remove_city_from_indexes(sender, instance, **kwargs):
+    uid = instance.uid
+    transaction.on_commit(lambda: refresh_cities({str(uid)}))
+    bus.publish('city', uid)
+
+
+@receiver(m2m_changed, sender=ServiceAddress.category.through)
+def update_city_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # Cities rank by their number of categories and facet over their services
+    if not reverse:
+        cities = {str(instance.pk)}
+    elif pk_set:
+        cities = {str(pk) for pk in pk_set}
+    else:
+        # post_clear from the category side doesn't say which cities lost it
+        cities = {ALL}
+    transaction.on_commit(lambda: refresh_cities(cities))
+    for city in cities:
+        bus.publish('city', city)
+
+
+def refresh_after_bulk_write():
+    """
+    Drop every in-process index and cached catalog response, here and in the other workers.
+
+    bulk_create and bulk_update send none of the signals above, so whatever
+    writes with them calls this once it's done.
+    """
+    for index in (shop_index, availability_index, search_index, autocomplete_index, facet_index):
+        index.invalidate()
+    for model in (Category, ServiceAddress, Shop, Service):
+        bump_model_version(model)
+    for topic in ('shop', 'service', 'time_slot', 'category', 'city'):
+        bus.publish(topic)
+
+
+def refresh_rows(model, topic, uids):
+    """
+    Apply bulk writes to the rows `uids` of `model` to the in-process indexes, here and in the other workers.
+
+    Unlike refresh_after_bulk_write this keeps the indexes warm: once the
+    transaction commits, the handlers subscribed to `topic` re-read just
+    these rows, as they do for writes published by other workers.
+    """
+    keys = {str(uid) for uid in uids}
+    if not keys:
+        return
+    handlers = list(bus.handlers.get(topic, ()))
+    transaction.on_commit(lambda: [handler(keys) for handler in handlers])
+    bump_model_version(model)
+    bus.publish_many(topic, keys)
+
+
+def refresh_cities(keys):
+    """
+    Reload cities and their categories into the autocomplete and facet indexes.
+    """
+    if ALL in keys:
+        autocomplete_index.invalidate()
+        facet_index.invalidate()
+        return
+    uids = [uuid.UUID(key) for key in keys]
+    names = dict(ServiceAddress.objects.filter(uid__in=uids).values_list('uid', 'city_name'))
+    categories = defaultdict(set)
+    for city_id, category_id in ServiceAddress.category.through.objects.filter(
+        serviceaddress_id__in=uids
+    ).values_list('serviceaddress_id', 'category_id'):
+        categories[city_id].add(category_id)
+    for uid in uids:
+        if uid in names:
+            autocomplete_index.update_city(uid, names[uid], len(categories[uid]))
+            facet_index.update_city(uid, names[uid], categories[uid])
+        else:
+            autocomplete_index.remove_city(uid)
+            facet_index.remove_city(uid)
+
+
+bus.subscribe('city', refresh_cities)
+
+track(Category, 'category_image', on_done=lambda: bump_model_version(Category))
+track(Shop, 'image', on_done=lambda: bump_model_version(Shop))
+track(Service, 'image', on_done=lambda: bump_model_version(Service))
@@ -75,3 +75,1561 @@
 #     def test_price_fields(self):
 #         self.assertEqual(self.service.mrp_price, Decimal("500.00"))
 #         self.assertEqual(self.service.dis_price, Decimal("450.00"))
+
+
+import itertools
+import gzip
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, time as clock
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import Address, CustomUser, Profile, ServiceReview
+from .autocomplete import PrefixIndex, autocomplete_index
+from .availability import ServiceSlots, availability_index
+from base.renditions import renditions
+from base.slugs import SlugAllocator
+from .caching import response_cache
+from .exports import batches
+from .facets import facet_index
+from .geo import CoordinateSnapshot, bounding_box, haversine_km, shop_index
+from .indexing import LazyIndex
+from .invalidation import InvalidationBus, bus
+from .models import (
+    Category, ChangeEvent, Coupon, Reservation, ScheduleException, ScheduleRule, Service, ServiceAddress, Shop,
+    SlotInventory, TimeSlot,
+)
+from .schedule import expand
+from .search import fulltext_services, search_index, tokenize
+from .utils import DistanceCache, DistanceMatrixClient, distance_cache
+
+
+class CoordinateSnapshotTest(TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [
+            (i, rng.uniform(12.0, 14.0), rng.uniform(76.5, 78.5)) for i in range(500)
+        ]
+        self.snapshot = CoordinateSnapshot(*zip(*self.points))
+
+    def brute_force(self, lat, lon, k, radius_km=None):
+        found = sorted(
+            (haversine_km(lat, lon, plat, plon), key) for key, plat, plon in self.points
+        )
+        if radius_km is not None:
+            found = [item for item in found if item[0] <= radius_km]
+        return found[:k]
+
+    def assertSameNeighbours(self, found, expected):
+        self.assertEqual([key for _, key in found], [key for _, key in expected])
+        for (distance, _), (expected_distance, _) in zip(found, expected):
+            self.assertAlmostEqual(distance, expected_distance, places=9)
+
+    def test_nearest_matches_brute_force(self):
+        for lat, lon in [(12.97, 77.59), (13.5, 76.6), (20.0, 70.0)]:
+            self.assertSameNeighbours(self.snapshot.nearest(lat, lon, 10), self.brute_force(lat, lon, 10))
+
+    def test_radius_limits_results(self):
+        self.assertSameNeighbours(
+            self.snapshot.nearest(12.97, 77.59, 50, radius_km=5),
+            self.brute_force(12.97, 77.59, 50, radius_km=5),
+        )
+
+    def test_pages_after_cursor_match_brute_force(self):
+        pages, after = [], None
+        for _ in range(5):
+            page = self.snapshot.nearest(12.97, 77.59, 7, after=after)
+            pages.extend(page)
+            after = page[-1]
+        self.assertSameNeighbours(pages, self.brute_force(12.97, 77.59, 35))
+
+    def test_bounding_box_across_antimeridian(self):
+        min_lat, max_lat, min_lon, max_lon = bounding_box(0.0, 179.9, 50)
+        self.assertGreater(min_lon, max_lon)
+        snapshot = CoordinateSnapshot(['west', 'east'], [0.0, 0.0], [-179.95, 179.95])
+        self.assertEqual([key for _, key in snapshot.nearest(0.0, 179.9, 2, radius_km=50)], ['east', 'west'])
+
+    def test_matches_scalar_haversine(self):
+        distances = self.snapshot.distances_km(12.97, 77.59)
+        for (key, lat, lon), distance in zip(self.points, distances):
+            self.assertAlmostEqual(distance, haversine_km(12.97, 77.59, lat, lon), places=9)
+
+    def test_upsert_and_remove_return_new_snapshots(self):
+        moved = self.snapshot.upsert(0, 12.97, 77.59)
+        added = moved.upsert('new', 12.971, 77.591)
+        removed = added.remove(0)
+        self.assertEqual(len(self.snapshot), 500)
+        self.assertEqual([key for _, key in added.nearest(12.97, 77.59, 2)], [0, 'new'])
+        self.assertEqual([key for _, key in removed.nearest(12.97, 77.59, 1)], ['new'])
+        self.assertSameNeighbours(self.snapshot.nearest(12.97, 77.59, 1), self.brute_force(12.97, 77.59, 1))
+        with self.assertRaises(ValueError):
+            self.snapshot.lat[0] = 0
+
+
+class NearestShopViewTest(TestCase):
+    def setUp(self):
+        shop_index.invalidate()
+        distance_cache.clear()
+        self.near = self.create_shop("Near Salon", "12.971600", "77.594600")
+        self.far = self.create_shop("Far Salon", "13.100000", "77.700000")
+        self.create_shop("Closed Salon", "12.971700", "77.594700", is_active=False)
+        self.url = reverse('nearest-shops')
+
+    def create_shop(self, name, latitude, longitude, is_active=True):
+        return Shop.objects.create(
+            name=name, owner="Owner", address="Street",
+            latitude=Decimal(latitude), longitude=Decimal(longitude), is_active=is_active,
+        )
+
+    def test_requires_coordinates(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_coordinates_off_the_globe(self):
+        for latitude, longitude in (('nan', '77.59'), ('12.97', 'inf'), ('90.5', '77.59'), ('12.97', '-180.1')):
+            response = self.client.get(self.url, {'latitude': latitude, 'longitude': longitude})
+            self.assertEqual(response.status_code, 400, (latitude, longitude))
+
+    def test_returns_active_shops_by_distance(self):
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Near Salon", "Far Salon"])
+
+    def test_k_and_radius(self):
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'k': 1})
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Near Salon"])
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'radius_km': 2})
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Near Salon"])
+
+    def test_results_include_distance(self):
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        first = response.data['results'][0]
+        self.assertAlmostEqual(first['distance_km'], haversine_km(12.97, 77.59, 12.9716, 77.5946))
+        self.assertIsNone(first['road_distance_m'])
+
+    def test_cursor_continues_after_last_distance(self):
+        self.create_shop("Mid Salon", "13.000000", "77.600000")
+        params = {'latitude': 12.97, 'longitude': 77.59, 'k': 2}
+        response = self.client.get(self.url, params)
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Near Salon", "Mid Salon"])
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Far Salon"])
+        self.assertIsNone(response.data['next'])
+
+    def test_cursor_is_pinned_to_its_origin(self):
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'k': 1})
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        response = self.client.get(self.url, {'latitude': 13.0, 'longitude': 77.59, 'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_shop_writes(self):
+        self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.near.is_active = False
+            self.near.save()
+        response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Far Salon"])
+
+    def test_shop_writes_update_loaded_snapshot_in_place(self):
+        self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_shop("New Salon", "12.970100", "77.590100")
+            self.far.delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59})
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["New Salon", "Near Salon"])
+
+    def test_road_refinement_reorders_top_k(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', return_value=[(9000, True), (1000, True)]) as fetch:
+            response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'road': 'true'})
+        self.assertEqual(len(fetch.call_args.args[2]), 2)
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Far Salon", "Near Salon"])
+        self.assertEqual([shop['road_distance_m'] for shop in response.data['results']], [1000, 9000])
+
+    def test_road_refinement_failure_keeps_great_circle_order(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=Exception("OVER_QUERY_LIMIT")), \
+                self.assertLogs('service.views', 'WARNING'):
+            response = self.client.get(self.url, {'latitude': 12.97, 'longitude': 77.59, 'road': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([shop['name'] for shop in response.data['results']], ["Near Salon", "Far Salon"])
+
+
+class DistanceCacheTest(TestCase):
+    def setUp(self):
+        self.cache = DistanceCache(cell_deg=0.01, ttl=60, max_entries=3)
+
+    def upstream(self, user_lat, user_lon, shop_locations, api_key):
+        return [(int(lat * 1000), lat != 9) for lat, lon in shop_locations]
+
+    def test_only_missing_destinations_go_upstream(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=self.upstream) as upstream:
+            self.cache.get_distances(12.971, 77.591, [(1, 1), (2, 2)], 'key', keys=['a', 'b'])
+            distances = self.cache.get_distances(12.972, 77.592, [(2, 2), (3, 3)], 'key', keys=['b', 'c'])
+        self.assertEqual(distances, [2000, 3000])
+        self.assertEqual(upstream.call_args.args[2], [(3, 3)])
+        self.assertEqual(upstream.call_args.args[:2], self.cache.snap(12.972, 77.592))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['upstream_calls']), (1, 3, 2))
+
+    def test_other_cells_miss(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=self.upstream) as upstream:
+            self.cache.get_distances(12.971, 77.591, [(1, 1)], 'key', keys=['a'])
+            self.cache.get_distances(12.991, 77.591, [(1, 1)], 'key', keys=['a'])
+        self.assertEqual(upstream.call_count, 2)
+
+    def test_expired_entries_are_refetched(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=self.upstream) as upstream, \
+                mock.patch('service.utils.time.monotonic', side_effect=[0, 0, 61, 61]):
+            self.cache.get_distances(12.971, 77.591, [(1, 1)], 'key', keys=['a'])
+            self.cache.get_distances(12.971, 77.591, [(1, 1)], 'key', keys=['a'])
+        self.assertEqual(upstream.call_count, 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=self.upstream) as upstream:
+            self.cache.get_distances(12.971, 77.591, [(1, 1), (2, 2), (3, 3)], 'key', keys=['a', 'b', 'c'])
+            self.cache.get_distances(12.971, 77.591, [(1, 1)], 'key', keys=['a'])
+            self.cache.get_distances(12.971, 77.591, [(4, 4)], 'key', keys=['d'])
+            self.cache.get_distances(12.971, 77.591, [(1, 1), (2, 2)], 'key', keys=['a', 'b'])
+        self.assertEqual(upstream.call_args.args[2], [(2, 2)])
+        self.assertEqual(self.cache.stats()['evictions'], 2)
+
+    def test_great_circle_fallbacks_are_not_cached(self):
+        with mock.patch('service.utils.distance_matrix_client.fetch', side_effect=self.upstream) as upstream:
+            self.cache.get_distances(12.971, 77.591, [(9, 9)], 'key', keys=['a'])
+            self.cache.get_distances(12.971, 77.591, [(9, 9)], 'key', keys=['a'])
+        self.assertEqual(upstream.call_count, 2)
+
+
+class StubDistanceMatrixHandler(BaseHTTPRequestHandler):
+    """
+    Answers like the Distance Matrix API: 1000 m per whole degree of latitude.
+
+    A destination latitude of 66 makes the whole request fail, 77 makes it hang
+    and 88 marks just that element as unreachable.
+    """
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        destinations = [tuple(map(float, d.split(','))) for d in params['destinations'][0].split('|')]
+        self.server.batches.append(len(destinations))
+        lats = {lat for lat, lon in destinations}
+        if 66 in lats:
+            body = {'status': 'OVER_QUERY_LIMIT'}
+        else:
+            if 77 in lats:
+                time.sleep(0.5)
+            elements = [
+                {'status': 'NOT_FOUND'} if lat == 88 else {'status': 'OK', 'distance': {'value': int(lat) * 1000}}
+                for lat, lon in destinations
+            ]
+            body = {'status': 'OK', 'rows': [{'elements': elements}]}
+        payload = json.dumps(body).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client already gave up on a hanging request
+
+    def log_message(self, format, *args):
+        pass
+
+
+class DistanceMatrixClientTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDistanceMatrixHandler)
+        cls.server.batches = []
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.batches.clear()
+        self.client = DistanceMatrixClient(
+            api_key='key', base_url=f'http://127.0.0.1:{self.server.server_port}/',
+            batch_size=3, timeout=(0.2, 0.2),
+        )
+
+    def test_splits_destinations_into_batches(self):
+        locations = [(lat, 0) for lat in range(1, 8)]
+        self.assertEqual(self.client.get_distances(0, 0, locations), [lat * 1000 for lat in range(1, 8)])
+        self.assertEqual(sorted(self.server.batches), [1, 3, 3])
+
+    def test_unreachable_element_is_infinite(self):
+        self.assertEqual(self.client.get_distances(0, 0, [(1, 0), (88, 0)]), [1000, float('inf')])
+
+    def test_failed_batch_falls_back_to_great_circle(self):
+        with self.assertLogs('service.utils', 'WARNING'):
+            results = self.client.fetch(0, 0, [(1, 0), (2, 0), (3, 0), (66, 0), (5, 0)])
+        self.assertEqual(results[:3], [(1000, True), (2000, True), (3000, True)])
+        self.assertEqual([exact for _, exact in results[3:]], [False, False])
+        self.assertAlmostEqual(results[4][0], haversine_km(0, 0, 5, 0) * 1000)
+
+    def test_timed_out_batch_falls_back_to_great_circle(self):
+        with self.assertLogs('service.utils', 'WARNING'):
+            results = self.client.fetch(0, 0, [(1, 0), (77, 0)])
+        self.assertEqual([exact for _, exact in results], [False, False])
+        self.assertEqual(self.client.fallbacks, 1)
+
+
+class WithinRadiusTest(TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        for i in range(200):
+            Shop.objects.create(
+                name=f"Salon {i}", owner="Owner", address="Street",
+                latitude=Decimal(f"{rng.uniform(12.5, 13.5):.6f}"),
+                longitude=Decimal(f"{rng.uniform(77.0, 78.0):.6f}"),
+            )
+
+    def test_matches_exact_distance_filter(self):
+        expected = sorted(
+            (haversine_km(12.97, 77.59, float(shop.latitude), float(shop.longitude)), shop.uid)
+            for shop in Shop.objects.all()
+        )
+        expected = [uid for distance, uid in expected if distance <= 15]
+        shops = list(Shop.objects.within_radius(12.97, 77.59, 15))
+        self.assertEqual([shop.uid for shop in shops], expected)
+        self.assertAlmostEqual(
+            shops[0].distance_km,
+            haversine_km(12.97, 77.59, float(shops[0].latitude), float(shops[0].longitude)),
+        )
+
+    def test_filters_on_bounding_box_first(self):
+        sql = str(Shop.objects.within_radius(12.97, 77.59, 15).query)
+        self.assertIn('"latitude" >=', sql)
+        self.assertIn('"longitude" <=', sql)
+
+    def test_box_across_antimeridian(self):
+        east = Shop.objects.create(name="East", owner="O", address="A", latitude=0, longitude=Decimal("179.990000"))
+        west = Shop.objects.create(name="West", owner="O", address="A", latitude=0, longitude=Decimal("-179.990000"))
+        shops = Shop.objects.within_radius(0.0, 179.999, 5)
+        self.assertEqual([shop.uid for shop in shops], [east.uid, west.uid])
+
+    def test_address_queries(self):
+        user = CustomUser.objects.create_user(email="geo@example.com", password="password123")
+        home = Address.objects.create(user=user, title="Home", latitude=Decimal("12.971600"), longitude=Decimal("77.594600"))
+        Address.objects.create(user=user, title="Office", latitude=Decimal("13.500000"), longitude=Decimal("77.594600"))
+        self.assertEqual(list(Address.objects.filter(user=user).within_radius(12.97, 77.59, 5)), [home])
+
+
+class ListQueryBudgetTest(TestCase):
+    """
+    List endpoints must run in a constant number of queries whatever the page size.
+    """
+
+    budgets = {
+        'category-list': 1,
+        'shop-list': 1,
+        'service-list': 1,
+        'coupon-list': 1,
+        'time-slot-list': 1,
+        'service-address-list': 2,
+    }
+
+    def setUp(self):
+        response_cache.clear()
+
+    def seed(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create(count)
+
+    def create(self, count):
+        for i in range(count):
+            n = Shop.objects.count()
+            category = Category.objects.create(category_name=f"Category {n}", category_image='categories/c.jpg')
+            shop = Shop.objects.create(name=f"Salon {n}", owner="Owner", address="Street")
+            service = Service.objects.create(shop=shop, service_name=f"Haircut {n}", product_description="Cut")
+            TimeSlot.objects.create(service=service, start_time="10:00", end_time="10:30")
+            Coupon.objects.create(coupon_code=f"SAVE{n}")
+            city = ServiceAddress.objects.create(city_name=f"City {n}")
+            city.category.add(category, *Category.objects.all()[:3])
+
+    def assertBudget(self, name):
+        with self.assertNumQueries(self.budgets[name]):
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_budgets_hold_as_pages_grow(self):
+        for count in (2, 10):
+            self.seed(count)
+            for name in self.budgets:
+                with self.subTest(endpoint=name, rows=Shop.objects.count()):
+                    self.assertBudget(name)
+
+    def test_nested_data_is_serialized(self):
+        self.seed(1)
+        service = self.assertBudget('service-list').data['results'][0]
+        self.assertEqual(service['shop']['name'], "Salon 0")
+        self.assertEqual(self.assertBudget('time-slot-list').data[0]['service'], "Haircut 0")
+        self.assertEqual(len(self.assertBudget('service-address-list').json()[0]['category']), 1)
+
+    def test_filter_services_by_shop(self):
+        self.seed(2)
+        shop = Shop.objects.get(name="Salon 1")
+        response = self.client.get(reverse('service-list'), {'shop_id': str(shop.uid)})
+        self.assertEqual([service['service_name'] for service in response.data['results']], ["Haircut 1"])
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        shop = Shop.objects.create(name="Salon", owner="Owner", address="Street")
+        for i in range(7):
+            Service.objects.create(shop=shop, service_name=f"Service {i}", product_description="Cut")
+        # Rows created in the same instant are ordered by uid
+        Service.objects.filter(service_name__in=["Service 3", "Service 4", "Service 5"]).update(
+            created_at=Service.objects.get(service_name="Service 3").created_at
+        )
+        self.expected = list(Service.objects.order_by('created_at', 'uid').values_list('service_name', flat=True))
+
+    def walk(self, params):
+        names, pages = [], 0
+        url, params = reverse('service-list'), dict(params)
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            names += [service['service_name'] for service in response.data['results']]
+            url, params, pages = response.data['next'], None, pages + 1
+        return names, pages
+
+    def test_walks_every_row_once_in_key_order(self):
+        names, pages = self.walk({'page_size': 2})
+        self.assertEqual(names, self.expected)
+        self.assertEqual(pages, 4)
+
+    def test_deep_pages_cost_one_query(self):
+        response = self.client.get(reverse('service-list'), {'page_size': 5})
+        with self.assertNumQueries(1):
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_count_is_opt_in(self):
+        response = self.client.get(reverse('service-list'))
+        self.assertNotIn('count', response.data)
+        response = self.client.get(reverse('service-list'), {'count': 'true', 'page_size': 3})
+        self.assertEqual(response.data['count'], 7)
+        self.assertNotIn('count=', response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('service-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_all_catalog_viewsets_are_paginated(self):
+        for name in ('category-list', 'shop-list', 'service-list', 'coupon-list'):
+            with self.subTest(endpoint=name):
+                self.assertIn('results', self.client.get(reverse(name)).json())
+
+
+class ResponseCacheTest(TestCase):
+    def setUp(self):
+        response_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(category_name="Hair", category_image='categories/c.jpg')
+            self.shop = Shop.objects.create(name="Salon", owner="Owner", address="Street")
+            self.service = Service.objects.create(shop=self.shop, service_name="Haircut", product_description="Cut")
+            self.city = ServiceAddress.objects.create(city_name="Bengaluru")
+
+    def get(self, name, *args):
+        response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_reads_are_served_from_cache(self):
+        first = self.get('category-list')
+        self.assertEqual(first['X-Response-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.get('category-list')
+        self.assertEqual(second['X-Response-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+    def test_writes_invalidate_after_commit(self):
+        self.get('shop-list')
+        with self.captureOnCommitCallbacks(execute=True):
+            Shop.objects.create(name="Second Salon", owner="Owner", address="Street")
+        response = self.get('shop-list')
+        self.assertEqual(response['X-Response-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_m2m_changes_invalidate_city_list(self):
+        self.assertEqual(self.get('service-address-list').json()[0]['category'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city.category.add(self.category)
+        self.assertEqual(len(self.get('service-address-list').json()[0]['category']), 1)
+
+    def test_review_aggregates_invalidate_service_detail(self):
+        self.assertEqual(self.get('service-detail', self.service.uid).json()['total_reviews'], 0)
+        user = CustomUser.objects.create_user(email="reviewer@example.com", password="pw")
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceReview.objects.create(user=user, service=self.service, rating=4, comment="Nice")
+        self.assertEqual(self.get('service-detail', self.service.uid).json()['total_reviews'], 1)
+
+    def test_caching_is_opt_in_per_action(self):
+        self.get('service-list')
+        self.assertFalse(self.get('service-list').has_header('X-Response-Cache'))
+        self.assertFalse(self.get('coupon-list').has_header('X-Response-Cache'))
+
+
+class ServiceSlotsTest(TestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        rows = []
+        for i in range(200):
+            start = rng.randrange(0, 1400, 15)
+            rows.append((i, start, start + rng.choice((15, 30, 90))))
+        slots = ServiceSlots.build(rows[:100])
+        for row in rows[100:]:
+            slots.add(*row)
+        for key, start, _ in rows[:50]:
+            slots.remove(key, start)
+        live = rows[50:]
+
+        for _ in range(200):
+            lo = rng.randrange(0, 1400)
+            hi = lo + rng.randrange(1, 240)
+            expected = sorted((start, key) for key, start, end in live if lo <= start and end <= hi)
+            with self.subTest(lo=lo, hi=hi):
+                self.assertEqual(slots.has_free(lo, hi), bool(expected))
+                self.assertEqual(sorted((start, key) for key, start, _ in slots.free(lo, hi)), expected)
+
+
+class AvailabilityViewTest(TestCase):
+    def setUp(self):
+        availability_index.invalidate()
+        shop_index.invalidate()
+        self.hair = Category.objects.create(category_name="Hair", category_image='categories/c.jpg')
+        self.nails = Category.objects.create(category_name="Nails", category_image='categories/c.jpg')
+        near = Shop.objects.create(name="Near Salon", owner="Owner", address="Street", latitude=12.97, longitude=77.59)
+        far = Shop.objects.create(name="Far Salon", owner="Owner", address="Street", latitude=13.30, longitude=77.59)
+        self.near_cut = self.service(near, "Near Haircut", self.hair, ["10:00", "14:30", "15:00"])
+        self.far_cut = self.service(far, "Far Haircut", self.hair, ["14:00"])
+        self.manicure = self.service(near, "Manicure", self.nails, ["14:00"])
+        self.hidden = self.service(near, "Hidden", self.hair, ["14:00"], is_publish=False)
+
+    def service(self, shop, name, category, starts, is_publish=True):
+        service = Service.objects.create(shop=shop, service_name=name, category=category,
+                                         product_description="Cut", is_publish=is_publish)
+        for start in starts:
+            hour, minute = map(int, start.split(':'))
+            end = f"{hour + (minute + 30) // 60:02d}:{(minute + 30) % 60:02d}"
+            TimeSlot.objects.create(service=service, start_time=start, end_time=end)
+        return service
+
+    def search(self, **params):
+        response = self.client.get(reverse('availability'), {'start': '14:00', 'end': '16:00', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_filters_by_window_category_and_distance(self):
+        results = self.search(category=str(self.hair.uid))
+        self.assertEqual([service['service_name'] for service in results], ["Far Haircut", "Near Haircut"])
+        self.assertEqual([slot['start_time'] for slot in results[1]['free_slots']], ["14:30", "15:00"])
+
+        results = self.search(category=str(self.hair.uid), latitude=12.97, longitude=77.59, radius_km=5)
+        self.assertEqual([service['service_name'] for service in results], ["Near Haircut"])
+        self.assertAlmostEqual(results[0]['distance_km'], 0.0, places=3)
+
+    def test_slots_must_fit_inside_the_window(self):
+        results = self.search(start='14:15', end='14:50', category=str(self.hair.uid))
+        self.assertEqual([service['service_name'] for service in results], [])
+        results = self.search(start='14:15', end='15:30', category=str(self.hair.uid))
+        self.assertEqual([slot['start_time'] for slot in results[0]['free_slots']], ["14:30", "15:00"])
+
+    def test_slot_and_service_writes_update_the_index(self):
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            TimeSlot.objects.filter(service=self.far_cut).delete()
+            self.manicure.category = self.hair
+            self.manicure.save()
+            TimeSlot.objects.create(service=self.hidden, start_time="11:00", end_time="11:30")
+        results = self.search(category=str(self.hair.uid))
+        self.assertEqual([service['service_name'] for service in results], ["Manicure", "Near Haircut"])
+
+    def test_invalid_parameters(self):
+        for params in ({'start': '14:00'}, {'start': '16:00', 'end': '14:00'}, {'start': '14:00', 'end': '16:00',
+                                                                                'category': 'nope'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('availability'), params).status_code, 400)
+
+    def test_rejects_coordinates_off_the_globe(self):
+        for latitude, longitude in (('nan', '77.59'), ('12.97', 'inf'), ('90.5', '77.59'), ('12.97', '-180.1')):
+            response = self.client.get(reverse('availability'), {'start': '14:00', 'end': '16:00',
+                                                                 'latitude': latitude, 'longitude': longitude})
+            self.assertEqual(response.status_code, 400, (latitude, longitude))
+
+
+class ScheduleExpansionTest(TestCase):
+    monday = date(2024, 1, 1)
+
+    def rule(self, weekday, start, end, slot_minutes=30, **kwargs):
+        return ScheduleRule(weekday=weekday, start_time=clock(start), end_time=clock(end),
+                            slot_minutes=slot_minutes, **kwargs)
+
+    def starts(self, slots):
+        return [start.strftime('%a %d %H:%M') for start, _ in slots]
+
+    def test_rules_repeat_weekly_and_merge_in_order(self):
+        rules = [self.rule(0, 10, 11), self.rule(2, 9, 10, slot_minutes=60), self.rule(0, 10, 11, slot_minutes=60)]
+        slots = list(expand(rules, [], self.monday, date(2024, 1, 8)))
+        self.assertEqual(self.starts(slots), [
+            'Mon 01 10:00', 'Mon 01 10:00', 'Mon 01 10:30', 'Wed 03 09:00',
+            'Mon 08 10:00', 'Mon 08 10:00', 'Mon 08 10:30',
+        ])
+        # The hour-long and half-hour slots at 10:00 differ; identical slots are merged
+        slots = list(expand([self.rule(0, 10, 11), self.rule(0, 10, 11)], [], self.monday, self.monday))
+        self.assertEqual(self.starts(slots), ['Mon 01 10:00', 'Mon 01 10:30'])
+
+    def test_exceptions_close_and_open_windows(self):
+        exceptions = [
+            ScheduleException(date=self.monday, start_time=clock(10, 15), end_time=clock(10, 45)),
+            ScheduleException(date=date(2024, 1, 8)),
+            ScheduleException(date=date(2024, 1, 9), start_time=clock(18), end_time=clock(19), is_closed=False),
+        ]
+        rules = [self.rule(0, 9, 12, slot_minutes=60), self.rule(0, 10, 11)]
+        slots = list(expand(rules, exceptions, self.monday, date(2024, 1, 9)))
+        self.assertEqual(self.starts(slots), [
+            'Mon 01 09:00', 'Mon 01 11:00', 'Tue 09 18:00', 'Tue 09 18:30',
+        ])
+
+    def test_validity_bounds(self):
+        rule = self.rule(0, 10, 11, slot_minutes=60, valid_from=date(2024, 1, 8), valid_until=date(2024, 1, 15))
+        slots = list(expand([rule], [], self.monday, date(2024, 1, 31)))
+        self.assertEqual(self.starts(slots), ['Mon 08 10:00', 'Mon 15 10:00'])
+
+    def test_zero_length_slots_are_rejected(self):
+        with self.assertRaises(ValueError):
+            list(expand([self.rule(0, 10, 11, slot_minutes=0)], [], self.monday, self.monday))
+        exception = ScheduleException(service=Service(), date=self.monday, start_time=clock(18), end_time=clock(19),
+                                      is_closed=False, slot_minutes=0)
+        with self.assertRaises(ValidationError) as raised:
+            exception.full_clean(exclude=['service'])
+        self.assertIn('slot_minutes', raised.exception.message_dict)
+
+    def test_expansion_is_lazy(self):
+        slots = expand([self.rule(day, 0, 23, slot_minutes=5) for day in range(7)], [],
+                       self.monday, date(2124, 1, 1))
+        self.assertEqual(len(list(itertools.islice(slots, 3))), 3)
+
+
+class ServiceScheduleViewTest(TestCase):
+    def setUp(self):
+        availability_index.invalidate()
+        shop = Shop.objects.create(name="Salon", owner="Owner", address="Street")
+        self.service = Service.objects.create(shop=shop, service_name="Haircut", product_description="Cut",
+                                              is_publish=True)
+        ScheduleRule.objects.create(service=self.service, weekday=0, start_time="14:00", end_time="16:00")
+        ScheduleException.objects.create(service=self.service, date=date(2024, 1, 8))
+
+    def test_streams_pages_of_generated_slots(self):
+        url = reverse('service-schedule', args=[self.service.uid])
+        response = self.client.get(url, {'from': '2024-01-01', 'days': 14, 'limit': 3})
+        self.assertEqual([slot['start'] for slot in response.data['results']], [
+            '2024-01-01T14:00:00', '2024-01-01T14:30:00', '2024-01-01T15:00:00',
+        ])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([slot['start'] for slot in response.data['results']], [
+            '2024-01-01T15:30:00',
+        ])
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.client.get(url, {'from': 'tomorrow'}).status_code, 400)
+
+    def test_after_with_an_offset_is_read_in_local_time(self):
+        url = reverse('service-schedule', args=[self.service.uid])
+        response = self.client.get(url, {'from': '2024-01-01', 'after': '2024-01-01T16:00:00+01:00'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([slot['start'] for slot in response.data['results']], [
+            '2024-01-01T15:30:00',
+        ])
+
+    def test_availability_includes_rule_slots_for_a_day(self):
+        params = {'start': '14:00', 'end': '15:00'}
+        self.assertEqual(self.client.get(reverse('availability'), params).data['results'], [])
+        results = self.client.get(reverse('availability'), {**params, 'date': '2024-01-01'}).data['results']
+        self.assertEqual([slot['start_time'] for slot in results[0]['free_slots']], ['14:00', '14:30'])
+        # Closed on the 8th
+        self.assertEqual(self.client.get(reverse('availability'), {**params, 'date': '2024-01-08'}).data['results'], [])
+
+
+class ReservationTest(TestCase):
+    def setUp(self):
+        availability_index.invalidate()
+        shop = Shop.objects.create(name="Salon", owner="Owner", address="Street")
+        self.service = Service.objects.create(shop=shop, service_name="Haircut", product_description="Cut",
+                                              is_publish=True)
+        self.slot = TimeSlot.objects.create(service=self.service, start_time="18:00", end_time="18:30", capacity=2)
+        self.today = timezone.localdate()
+
+    def client_for(self, email):
+        user = CustomUser.objects.create_user(email=email, password="pw")
+        token = str(RefreshToken.for_user(user).access_token)
+        return lambda path, data=None: self.client.post(
+            path, data, content_type='application/json', HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+    def book(self, post, slot=None, date=None):
+        return post(reverse('reservation-list'), {
+            'time_slot': str((slot or self.slot).uid), 'date': str(date or self.today),
+        })
+
+    def test_books_until_sold_out(self):
+        first, second, third = (self.client_for(f"user{i}@example.com") for i in range(3))
+        self.assertEqual(self.book(first).status_code, 201)
+        self.assertEqual(SlotInventory.objects.get(time_slot=self.slot, date=self.today).remaining, 1)
+        self.assertEqual(self.book(first).status_code, 400)
+        self.assertEqual(self.book(second).status_code, 201)
+        response = self.book(third)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['error'], "This slot is fully booked")
+        self.assertEqual(Reservation.objects.filter(status='confirmed').count(), 2)
+
+    def test_duplicate_booking_gives_the_seat_back(self):
+        first, second = self.client_for("first@example.com"), self.client_for("second@example.com")
+        self.assertEqual(self.book(first).status_code, 201)
+        self.assertEqual(self.book(first).data['error'], "You have already booked this slot")
+        self.assertEqual(SlotInventory.objects.get(time_slot=self.slot, date=self.today).remaining, 1)
+        self.assertEqual(self.book(second).status_code, 201)
+        # Sold out, but the duplicate is what the user needs to hear about
+        self.assertEqual(self.book(first).status_code, 400)
+        self.assertEqual(SlotInventory.objects.get(time_slot=self.slot, date=self.today).remaining, 0)
+
+    def test_cancel_returns_the_seat(self):
+        post = self.client_for("user@example.com")
+        reservation = self.book(post).data
+        url = reverse('reservation-cancel', args=[reservation['uid']])
+        self.assertEqual(post(url).data['status'], 'cancelled')
+        self.assertEqual(post(url).status_code, 400)
+        self.assertEqual(SlotInventory.objects.get(time_slot=self.slot, date=self.today).remaining, 2)
+
+    def test_rejects_past_dates_and_anonymous_users(self):
+        post = self.client_for("user@example.com")
+        yesterday = self.today - timezone.timedelta(days=1)
+        self.assertEqual(self.book(post, date=yesterday).status_code, 400)
+        response = self.client.post(reverse('reservation-list'), {'time_slot': str(self.slot.uid)})
+        self.assertEqual(response.status_code, 401)
+
+    def test_sold_out_slots_are_not_available(self):
+        params = {'start': '17:00', 'end': '19:00', 'date': str(self.today)}
+        self.assertEqual(len(self.client.get(reverse('availability'), params).data['results']), 1)
+        for i in range(2):
+            self.book(self.client_for(f"user{i}@example.com"))
+        self.assertEqual(self.client.get(reverse('availability'), params).data['results'], [])
+
+    def test_sold_out_slots_are_skipped_before_the_slot_limit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            slots = [TimeSlot.objects.create(service=self.service, start_time=f"{hour:02}:00",
+                                             end_time=f"{hour + 1:02}:00") for hour in range(9, 13)]
+        SlotInventory.objects.create(time_slot=slots[0], date=self.today, remaining=0)
+        params = {'start': '09:00', 'end': '13:00', 'date': str(self.today)}
+        for count, expected in ((1, ['10:00']), (3, ['10:00', '11:00', '12:00'])):
+            results = self.client.get(reverse('availability'), {**params, 'slots': count}).data['results']
+            self.assertEqual([slot['start_time'] for slot in results[0]['free_slots']], expected)
+
+
+    def test_books_slots_generated_from_schedule_rules(self):
+        ScheduleRule.objects.create(service=self.service, weekday=self.today.weekday(),
+                                    start_time="14:00", end_time="16:00")
+        first, second = self.client_for("first@example.com"), self.client_for("second@example.com")
+        slot = {'service': str(self.service.uid), 'start_time': '14:30', 'end_time': '15:00', 'date': str(self.today)}
+        self.assertEqual(first(reverse('reservation-list'), {**slot, 'start_time': '14:15'}).status_code, 400)
+        reservation = first(reverse('reservation-list'), slot)
+        self.assertEqual(reservation.status_code, 201)
+        self.assertIsNone(reservation.data['time_slot'])
+        self.assertEqual(second(reverse('reservation-list'), slot).status_code, 409)
+
+        params = {'start': '14:00', 'end': '16:00', 'date': str(self.today)}
+        results = self.client.get(reverse('availability'), params).data['results']
+        self.assertEqual([slot['start_time'] for slot in results[0]['free_slots']], ['14:00', '15:00', '15:30'])
+        first(reverse('reservation-cancel', args=[reservation.data['uid']]))
+        self.assertEqual(second(reverse('reservation-list'), slot).status_code, 201)
+
+class ConcurrentReservationTest(TransactionTestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Booking threads need a database they can share")
+
+    def test_contended_slot_is_never_oversold(self):
+        out = StringIO()
+        call_command('benchmark_reservations', threads=4, attempts=5, slots=1, capacity=6, stdout=out)
+        self.assertIn("No slot was oversold.", out.getvalue())
+        self.assertFalse(Shop.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='python')
+class ServiceSearchTest(TestCase):
+    def setUp(self):
+        search_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop = Shop.objects.create(name="Glow Studio", owner="Owner", address="Linking Road, Bandra")
+            other = Shop.objects.create(name="Corner Barber", owner="Owner", address="Andheri")
+            self.haircut = Service.objects.create(shop=other, service_name="Haircut", dis_price=300,
+                                                  product_description="Classic cut and wash", is_publish=True)
+            self.facial = Service.objects.create(shop=self.shop, service_name="Gold facial", dis_price=1500,
+                                                 product_description="Facial after a haircut", is_publish=True)
+            self.draft = Service.objects.create(shop=self.shop, service_name="Haircut deluxe", dis_price=900,
+                                                product_description="Coming soon", is_publish=False)
+        # Built from the database; the signal handlers keep it current from here
+        search_index.state()
+
+    def search(self, **params):
+        return self.client.get(reverse('service-search'), params)
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize("Hair-cut & Wash, 2 X"), ['hair', 'cut', 'wash'])
+
+    def test_ranks_name_matches_first(self):
+        response = self.search(q="haircut")
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([row['uid'] for row in response.data['results']], [str(self.haircut.uid), str(self.facial.uid)])
+        self.assertGreater(response.data['results'][0]['score'], response.data['results'][1]['score'])
+
+    def test_matches_shop_name_and_address(self):
+        self.assertEqual([row['uid'] for row in self.search(q="bandra").data['results']], [str(self.facial.uid)])
+        self.assertEqual(self.search(q="glow studio").data['count'], 1)
+
+    def test_filters_by_publish_state_and_price(self):
+        self.assertEqual(self.search(q="haircut", is_publish="all").data['count'], 3)
+        self.assertEqual([row['uid'] for row in self.search(q="haircut", is_publish="false").data['results']],
+                         [str(self.draft.uid)])
+        response = self.search(q="haircut", min_price=500, max_price=2000)
+        self.assertEqual([row['uid'] for row in response.data['results']], [str(self.facial.uid)])
+
+    def test_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.name = "Radiance"
+            self.shop.save()
+            self.haircut.delete()
+        self.assertEqual(self.search(q="glow").data['count'], 0)
+        self.assertEqual(self.search(q="radiance").data['count'], 1)
+        self.assertEqual(self.search(q="haircut").data['count'], 1)
+
+    def test_pages_with_offset(self):
+        response = self.search(q="haircut", limit=1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn("offset=1", response.data['next'])
+        self.assertIsNone(self.search(q="haircut", limit=1, offset=1).data['next'])
+
+    def test_rejects_bad_params(self):
+        self.assertEqual(self.search().status_code, 400)
+        self.assertEqual(self.search(q="haircut", min_price="cheap").status_code, 400)
+        self.assertEqual(self.search(q="haircut", is_publish="maybe").status_code, 400)
+
+    def test_fulltext_filters_in_where(self):
+        sql = str(fulltext_services("haircut", min_price=100).query)
+        where = sql[sql.index(" WHERE "):]
+        self.assertIn("MATCH(", where)
+        self.assertIn("shop_id IN (SELECT shop.uid", where)
+
+    def test_admin_search_uses_index(self):
+        admin = CustomUser.objects.create_superuser(email="admin@example.com", phone_number="9000000000", password="pw")
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:service_service_changelist'), {'q': 'bandra'})
+        self.assertCountEqual(response.context['cl'].result_list, [self.facial, self.draft])
+
+
+class LazyIndexTest(SimpleTestCase):
+    class Index(LazyIndex):
+        def __init__(self, during_load):
+            super().__init__()
+            self.during_load = during_load
+
+        def _load(self):
+            self.during_load(self)
+            return {'a': 1}
+
+    def test_writes_during_a_load_are_replayed(self):
+        index = self.Index(lambda index: index._apply('__setitem__', 'b', 2))
+        self.assertEqual(index.state(), {'a': 1, 'b': 2})
+        self.assertIs(index.state(), index.state())
+        index._apply('pop', 'a')
+        self.assertEqual(index.state(), {'b': 2})
+
+    def test_invalidate_during_a_load_discards_it(self):
+        index = self.Index(lambda index: index.invalidate())
+        self.assertEqual(index.state(), {'a': 1})
+        self.assertIsNone(index._state)
+
+
+class PrefixIndexTest(TestCase):
+    def test_matches_names_and_later_words_by_popularity(self):
+        index = PrefixIndex.build([(1, "Hair Spa", 5), (2, "Haircut", 9), (3, "Head Massage", 1), (4, "Oil Spa", 7)])
+        self.assertEqual([uid for _, uid, _ in index.complete("h")], [2, 1, 3])
+        self.assertEqual([uid for _, uid, _ in index.complete("hair")], [2, 1])
+        self.assertEqual([uid for _, uid, _ in index.complete("hair ")], [1])
+        self.assertEqual([uid for _, uid, _ in index.complete("spa")], [4, 1])
+
+    def test_incremental_updates_match_a_rebuild(self):
+        rng = random.Random(7)
+        rows = {i: (f"{rng.choice(['gold', 'glow', 'gel'])} {rng.choice(['facial', 'nails'])}", rng.randint(0, 50))
+                for i in range(60)}
+        index = PrefixIndex.build([(uid, name, popularity) for uid, (name, popularity) in rows.items()])
+        for uid in range(0, 60, 3):
+            index.remove(uid)
+            del rows[uid]
+        for uid in range(60, 75):
+            rows[uid] = ("glitter facial", rng.randint(0, 50))
+            index.add(uid, *rows[uid])
+        index.reweigh(1, 100)
+        rows[1] = (rows[1][0], 100)
+        rebuilt = PrefixIndex.build([(uid, name, popularity) for uid, (name, popularity) in rows.items()])
+        for prefix in ("g", "gl", "gli", "glo", "fa", "nails", "gold f"):
+            self.assertEqual(index.complete(prefix), rebuilt.complete(prefix))
+
+    def test_random_writes_keep_every_precomputed_prefix_exact(self):
+        rng = random.Random(11)
+        rows = {}
+        index = PrefixIndex()
+        for _ in range(2000):
+            uid = rng.randrange(80)
+            operation = rng.random()
+            if operation < 0.2:
+                index.remove(uid)
+                rows.pop(uid, None)
+            elif operation < 0.6 and uid in rows:
+                rows[uid] = (rows[uid][0], rng.randint(0, 20))
+                index.reweigh(uid, rows[uid][1])
+            else:
+                rows[uid] = (f"{rng.choice(['gold', 'glow', 'gel', 'spa'])} {rng.choice(['facial', 'nails'])}",
+                             rng.randint(0, 20))
+                index.add(uid, *rows[uid])
+            rebuilt = PrefixIndex.build([(uid, name, popularity) for uid, (name, popularity) in rows.items()])
+            self.assertEqual(index.top, rebuilt.top)
+        self.assertEqual(index.keys, rebuilt.keys)
+
+
+class AutocompleteViewTest(TestCase):
+    def setUp(self):
+        autocomplete_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(category_name="Hair Care")
+            self.city = ServiceAddress.objects.create(city_name="Hyderabad")
+            self.shop = Shop.objects.create(name="Hairport", owner="Owner", address="Street")
+            self.service = Service.objects.create(shop=self.shop, category=self.category, service_name="Hair Colour",
+                                                  product_description="Colour", is_publish=True)
+        autocomplete_index.state()
+
+    def complete(self, **params):
+        return self.client.get(reverse('autocomplete'), params)
+
+    def test_completes_every_kind(self):
+        response = self.complete(q="h")
+        self.assertEqual({row['kind']: row['name'] for row in response.data['results']}, {
+            'service': "Hair Colour", 'shop': "Hairport", 'category': "Hair Care", 'city': "Hyderabad",
+        })
+        self.assertEqual([row['kind'] for row in self.complete(q="hai", kind="shop,city").data['results']], ['shop'])
+
+    def test_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.city.category.add(self.category)
+            Service.objects.create(shop=self.shop, service_name="Beard Trim", product_description="Trim",
+                                   is_publish=True)
+            self.service.is_publish = False
+            self.service.save()
+        results = self.complete(q="h").data['results']
+        self.assertEqual([(row['kind'], row['popularity']) for row in results],
+                         [('shop', 1), ('city', 1), ('category', 0)])
+        self.assertEqual(self.complete(q="beard", kind="service").data['results'][0]['name'], "Beard Trim")
+
+    def test_rejects_unknown_kinds(self):
+        self.assertEqual(self.complete(q="h", kind="coupon").status_code, 400)
+        self.assertEqual(self.complete(q="").data['results'], [])
+
+
+class FacetViewTest(TestCase):
+    def setUp(self):
+        facet_index.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.hair = Category.objects.create(category_name="Hair")
+            self.skin = Category.objects.create(category_name="Skin")
+            self.pune = ServiceAddress.objects.create(city_name="Pune")
+            self.pune.category.add(self.hair)
+            self.shop = Shop.objects.create(name="Salon", owner="Owner", address="Street")
+            self.cut = Service.objects.create(shop=self.shop, category=self.hair, service_name="Cut", dis_price=200,
+                                              product_description="Cut", is_publish=True)
+            self.colour = Service.objects.create(shop=self.shop, category=self.hair, service_name="Colour",
+                                                 dis_price=1200, product_description="Colour", is_publish=True)
+            self.facial = Service.objects.create(shop=self.shop, category=self.skin, service_name="Facial",
+                                                 dis_price=700, product_description="Facial", is_publish=True)
+        facet_index.state()
+
+    def facets(self, **params):
+        return self.client.get(reverse('facets'), params)
+
+    def counts(self, response, facet):
+        return {row['label']: row['count'] for row in response.data['facets'][facet] if row['count']}
+
+    def test_counts_every_facet(self):
+        response = self.facets()
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(self.counts(response, 'city'), {"Pune": 2})
+        self.assertEqual(self.counts(response, 'category'), {"Hair": 2, "Skin": 1})
+        self.assertEqual(self.counts(response, 'price'), {"0-250": 1, "500-1000": 1, "1000-2000": 1})
+
+    def test_counts_apply_the_other_facets(self):
+        response = self.facets(city=str(self.pune.uid), price="0,1000")
+        self.assertEqual({row['uid'] for row in response.data['results']}, {str(self.cut.uid), str(self.colour.uid)})
+        self.assertEqual(self.counts(response, 'price'), {"0-250": 1, "1000-2000": 1})
+        self.assertEqual(self.counts(response, 'category'), {"Hair": 2})
+        self.assertEqual(self.counts(response, 'city'), {"Pune": 2})
+
+    def test_follows_writes_and_reviews(self):
+        user = CustomUser.objects.create_user(email="user@example.com", password="pw")
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceReview.objects.create(user=user, service=self.facial, rating=4, comment="Good")
+            self.cut.is_publish = False
+            self.cut.save()
+            self.pune.category.add(self.skin)
+        response = self.facets(rating=4)
+        self.assertEqual([row['uid'] for row in response.data['results']], [str(self.facial.uid)])
+        self.assertEqual(self.counts(response, 'city'), {"Pune": 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.is_active = False
+            self.shop.save()
+        self.assertEqual(self.facets().data['count'], 0)
+
+    def test_pages_and_rejects_bad_params(self):
+        response = self.facets(limit=2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(len(self.client.get(response.data['next']).data['results']), 1)
+        self.assertEqual(self.facets(price="300").status_code, 400)
+        self.assertEqual(self.facets(city="pune").status_code, 400)
+
+
+class UniqueSlugTest(TestCase):
+    def test_saves_give_shared_names_distinct_slugs(self):
+        first = Shop.objects.create(name="Glow Studio", owner="Owner", address="Street")
+        second = Shop.objects.create(name="Glow Studio", owner="Owner", address="Street")
+        self.assertEqual((first.slug, second.slug), ("glow-studio", "glow-studio-2"))
+
+    def test_allocates_batches_past_existing_slugs(self):
+        Shop.objects.create(name="Glow", slug="glow-7", owner="Owner", address="Street")
+        Shop.objects.create(name="Glow 2", owner="Owner", address="Street")
+        allocator = SlugAllocator(Shop)
+        self.assertEqual(allocator.allocate(["Glow", "Glow", "Glow 2", "!!!"]), ["glow-8", "glow-9", "glow-2-2", "shop"])
+        self.assertEqual(allocator.allocate(["glow"]), ["glow-10"])
+        with self.assertNumQueries(0):
+            allocator.allocate(["Glow"] * 100)
+
+    def test_keeps_one_suffix_per_base_and_only_this_chunks_given_slugs(self):
+        allocator = SlugAllocator(Shop)
+        allocator.reserve(["glow-3"])
+        self.assertEqual(allocator.allocate(["Glow", "Glow", "Glow", "Glow 2"]), ["glow", "glow-2", "glow-4", "glow-2-2"])
+        allocator.reserve(["glow-9"])
+        self.assertEqual(allocator.allocate(["Glow"] * 1000)[0], "glow-10")
+        allocator.reserve([])
+        self.assertEqual(allocator.taken, set())
+        self.assertEqual(allocator.suffixes, {"glow": 1009, "glow-2": 2})
+
+
+@override_settings(SEARCH_BACKEND='python')
+class CatalogImportTest(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(category_name="Hair")
+        self.shop = Shop.objects.create(name="Glow Studio", owner="Owner", address="Street")
+
+    def import_file(self, kind, content, suffix, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_catalog', kind, f.name, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_shops_from_csv(self):
+        out, err = self.import_file('shop', (
+            "name,owner,address,latitude,longitude,is_active\n"
+            "Glow Studio,Asha,1 MG Road,12.97,77.59,yes\n"
+            "Glow Studio,Ravi,2 MG Road,,,no\n"
+            "Bad Shop,Ravi,3 MG Road,north,77.59,yes\n"
+            ",Nobody,4 MG Road,,,\n"
+        ), '.csv', chunk_size=2)
+        self.assertEqual(out.count("rows/s"), 3)
+        self.assertIn("2 created, 0 updated, 2 failed", out)
+        self.assertIn("line 4: latitude: must be a number", err)
+        self.assertIn("line 5: name: is required", err)
+        imported = Shop.objects.exclude(pk=self.shop.pk).order_by('slug')
+        self.assertEqual([(shop.slug, shop.is_active) for shop in imported],
+                         [("glow-studio-2", True), ("glow-studio-3", False)])
+
+    def test_imports_and_updates_services_from_ndjson(self):
+        existing = Service.objects.create(shop=self.shop, service_name="Cut", product_description="Cut", dis_price=100)
+        out, err = self.import_file('service', "\n".join([
+            json.dumps({"shop": "glow-studio", "category": "hair", "service_name": "Keratin",
+                        "product_description": "Smooth", "dis_price": "2500", "is_publish": True}),
+            json.dumps({"shop": str(self.shop.uid), "service_name": "Keratin", "product_description": "Again"}),
+            json.dumps({"shop": "missing-shop", "service_name": "Ghost", "product_description": "Boo"}),
+            "not json",
+            json.dumps({"uid": str(existing.uid), "dis_price": 150}),
+        ]), '.ndjson')
+        self.assertIn("2 created, 1 updated, 2 failed", out)
+        self.assertIn("line 3: shop: no shop with uid or slug 'missing-shop'", err)
+        self.assertIn("line 4: not a JSON object", err)
+        keratin = Service.objects.get(slug="keratin")
+        self.assertEqual((keratin.shop, keratin.category, keratin.is_publish), (self.shop, self.category, True))
+        self.assertTrue(Service.objects.filter(slug="keratin-2", is_publish=False).exists())
+        existing.refresh_from_db()
+        self.assertEqual((existing.dis_price, existing.service_name), (150, "Cut"))
+        # The in-process indexes were dropped after the bulk writes
+        response = self.client.get(reverse('service-search'), {'q': "keratin"})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_imports_time_slots_by_service_slug(self):
+        Service.objects.create(shop=self.shop, service_name="Cut", product_description="Cut")
+        out, err = self.import_file('time_slot', (
+            "service,start_time,end_time,capacity\n"
+            "cut,10:00,10:30,3\n"
+            "cut,noon,13:00,1\n"
+        ), '.csv')
+        self.assertIn("1 created, 0 updated, 1 failed", out)
+        self.assertIn("line 3: start_time: must be a time as HH:MM", err)
+        self.assertEqual(TimeSlot.objects.get().capacity, 3)
+
+    def test_upload_endpoint(self):
+        upload = StringIO("name,owner,address\nNew Salon,Owner,Street\n")
+        upload.name = "shops.csv"
+        url = reverse('catalog-import')
+        self.assertEqual(self.client.post(url, {'kind': 'shop', 'file': upload}).status_code, 401)
+        admin = CustomUser.objects.create_superuser(email="admin@example.com", phone_number="9000000000", password="pw")
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {RefreshToken.for_user(admin).access_token}"
+        upload.seek(0)
+        response = self.client.post(url, {'kind': 'shop', 'file': upload})
+        self.assertEqual((response.data['created'], response.data['failed']), (1, 0))
+        self.assertEqual(Shop.objects.get(name="New Salon").slug, "new-salon")
+        self.assertEqual(self.client.post(url, {'kind': 'coupon', 'file': upload}).status_code, 400)
+
+
+class BatchWriteTest(TestCase):
+    def setUp(self):
+        search_index.invalidate()
+        self.shop = Shop.objects.create(name="Glow Studio", owner="Owner", address="Street")
+        self.service = Service.objects.create(shop=self.shop, service_name="Cut", product_description="Cut",
+                                              dis_price=100, is_publish=True)
+        user = CustomUser.objects.create_user(email="owner@example.com", password="pw")
+        self.client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {RefreshToken.for_user(user).access_token}"
+
+    def send(self, method, name, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(reverse(name), items, content_type='application/json')
+
+    def test_creates_services_in_bulk_and_reports_each_item(self):
+        response = self.send('post', 'service-batch', [
+            {"shop": "glow-studio", "service_name": "Keratin", "product_description": "Smooth",
+             "dis_price": 2500, "is_publish": True},
+            {"shop": "missing", "service_name": "Ghost", "product_description": "Boo"},
+            {"uid": str(self.service.uid), "service_name": "Again", "product_description": "Again"},
+            "not an object",
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual((response.data['written'], response.data['failed']), (1, 3))
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], ['created', 'failed', 'failed', 'failed'])
+        self.assertEqual(results[1]['error'], "shop: no shop with uid or slug 'missing'")
+        self.assertEqual(results[2]['error'], "uid: already exists")
+        keratin = Service.objects.get(uid=results[0]['uid'])
+        self.assertEqual((keratin.slug, keratin.shop), ("keratin", self.shop))
+        # The new row was applied to the warm search index
+        search = self.client.get(reverse('service-search'), {'q': "keratin"})
+        self.assertEqual([row['uid'] for row in search.data['results']], [str(keratin.uid)])
+
+    def test_updates_and_deletes_services(self):
+        other = Service.objects.create(shop=self.shop, service_name="Shave", product_description="Shave")
+        response = self.send('patch', 'service-batch', [
+            {"uid": str(self.service.uid), "dis_price": "150.50"},
+            {"uid": str(other.uid), "is_publish": "maybe"},
+            {"service_name": "No uid"},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result.get('error') for result in response.data['results']],
+                         [None, "is_publish: must be true or false", "uid: is required"])
+        self.service.refresh_from_db()
+        self.assertEqual(self.service.dis_price, Decimal("150.50"))
+
+        response = self.send('delete', 'service-batch', [str(other.uid), {"uid": str(uuid.uuid4())}, "nope"])
+        self.assertEqual([result['status'] for result in response.data['results']], ['deleted', 'failed', 'failed'])
+        self.assertFalse(Service.objects.filter(pk=other.pk).exists())
+
+    def test_time_slots_in_one_query_per_step(self):
+        items = [{"service": "cut", "start_time": f"{hour:02}:00", "end_time": f"{hour:02}:30", "capacity": 2}
+                 for hour in range(9, 19)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.send('post', 'time-slot-batch', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TimeSlot.objects.filter(service=self.service, capacity=2).count(), 10)
+        # The same handful of queries whatever the batch size: lookups, one INSERT, savepoints and one event
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(self.send('patch', 'time-slot-batch', [{"uid": str(uuid.uuid4())}]).status_code, 400)
+
+    def test_rejects_empty_or_unauthenticated_batches(self):
+        self.assertEqual(self.send('post', 'service-batch', []).status_code, 400)
+        self.assertEqual(self.send('post', 'service-batch', {"service_name": "x"}).status_code, 400)
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        self.assertEqual(self.send('post', 'time-slot-batch', [{}]).status_code, 401)
+
+
+class RenditionTest(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media.name, IMAGE_RENDITION_WORKERS=0,
+                                      IMAGE_RENDITION_WIDTHS=[320, 640], IMAGE_RENDITION_FORMATS=['webp', 'jpeg'])
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def photo(self, color=(10, 120, 200)):
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_upload_generates_content_hashed_renditions_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shop = Shop.objects.create(name="Glow", owner="Owner", address="Street",
+                                       image=SimpleUploadedFile("glow.jpg", self.photo()))
+        shop.refresh_from_db()
+        files = shop.image_renditions['files']
+        self.assertEqual(shop.image_renditions['source'], shop.image.name)
+        self.assertEqual(sorted(files), ['jpeg', 'webp'])
+        with default_storage.open(files['webp']['320']) as f:
+            self.assertEqual(Image.open(f).size, (320, 213))
+        self.assertTrue(files['jpeg']['640'].endswith("-640w-q80.jpg"))
+
+        # The same picture uploaded again reuses the files without rendering anything
+        with mock.patch('base.renditions.render') as render, self.captureOnCommitCallbacks(execute=True):
+            other = Shop.objects.create(name="Glow 2", owner="Owner", address="Street",
+                                        image=SimpleUploadedFile("copy.jpg", self.photo()))
+        render.assert_not_called()
+        other.refresh_from_db()
+        self.assertEqual(other.image_renditions['files'], files)
+        # Saving without a new upload schedules nothing
+        with mock.patch.object(renditions, 'schedule') as schedule:
+            shop.save()
+        schedule.assert_not_called()
+
+    def test_serializer_exposes_urls_and_clearing_drops_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            shop = Shop.objects.create(name="Glow", owner="Owner", address="Street",
+                                       image=SimpleUploadedFile("glow.jpg", self.photo()))
+        response = self.client.get(reverse('shop-detail', args=[shop.uid]))
+        urls = response.data['image_renditions']
+        self.assertEqual(sorted(urls['webp']), ['320', '640'])
+        self.assertTrue(urls['webp']['320'].startswith("http://testserver/"))
+
+        shop.image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            shop.save()
+        shop.refresh_from_db()
+        self.assertEqual(shop.image_renditions, {})
+
+    def test_command_fills_in_images_set_by_name(self):
+        default_storage.save('default_shop.jpg', ContentFile(self.photo((250, 250, 250))))
+        shop = Shop.objects.create(name="Glow", owner="Owner", address="Street")
+        service = Service.objects.create(shop=shop, service_name="Cut", product_description="Cut")
+        self.assertEqual(service.image.name, 'default_shop.jpg')
+        self.assertEqual(Service.objects.get(pk=service.pk).image_renditions, {})
+
+        out = StringIO()
+        call_command('generate_renditions', '--model', 'service.Service', stdout=out)
+        self.assertIn("service.Service.image: 1 generated, 0 unchanged, 0 failed", out.getvalue())
+        self.assertEqual(len(Service.objects.get(pk=service.pk).image_renditions['files']['jpeg']), 2)
+        out = StringIO()
+        call_command('generate_renditions', '--model', 'service.Service', stdout=out)
+        self.assertIn("0 generated, 0 unchanged", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_renditions', '--model', 'service.Coupon')
+
+
+class UUIDStorageTest(TestCase):
+    def test_new_rows_get_time_ordered_keys(self):
+        shop = Shop.objects.create(name="Glow", owner="Owner", address="Street")
+        services = [Service.objects.create(shop=shop, service_name=f"S{i}", product_description="d") for i in range(5)]
+        user = CustomUser.objects.create_user(email="user@example.com", password="pw")
+        self.assertEqual({shop.uid.version, user.id.version, *(service.uid.version for service in services)}, {7})
+        self.assertEqual(list(Service.objects.order_by('uid')), services)
+        self.assertEqual(Service.objects.get(uid=str(services[2].uid)), services[2])
+
+    def test_convert_command_covers_keys_and_foreign_keys(self):
+        out = StringIO()
+        call_command('convert_uuid_storage', 'binary', '--dry-run', stdout=out)
+        sql = out.getvalue()
+        self.assertIn("ALTER TABLE `service_service` MODIFY `uid` VARBINARY(32) NOT NULL, "
+                      "MODIFY `shop_id` VARBINARY(32) NOT NULL, MODIFY `category_id` VARBINARY(32) NULL;", sql)
+        self.assertIn("UPDATE `service_shop` SET `uid` = IF(LENGTH(`uid`) = 32, UNHEX(`uid`), `uid`);", sql)
+        self.assertIn("MODIFY `serviceaddress_id` BINARY(16) NOT NULL", sql)
+        self.assertIn("ALTER TABLE `accounts_customuser` MODIFY `id` BINARY(16) NOT NULL;", sql)
+        self.assertNotIn("service_changeevent", sql)
+        with self.assertRaises(CommandError):
+            call_command('convert_uuid_storage', 'binary')
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name="Glow, Studio", owner="Owner", address="Street", latitude=Decimal("12.5"))
+        self.services = [
+            Service.objects.create(shop=self.shop, service_name=f"Service {i}", product_description="Desc",
+                                   dis_price=Decimal("99.50"))
+            for i in range(5)
+        ]
+        admin = CustomUser.objects.create_superuser(email="admin@example.com", phone_number="9000000000", password="pw")
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {RefreshToken.for_user(admin).access_token}"}
+
+    def export(self, kind, **params):
+        return self.client.get(reverse('export', args=[kind]), params, **self.auth)
+
+    def test_streams_ndjson(self):
+        response = self.export('services')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(sorted(row['uid'] for row in rows), sorted(str(service.uid) for service in self.services))
+        self.assertEqual((rows[0]['shop_id'], rows[0]['dis_price']), (str(self.shop.uid), "99.50"))
+
+    def test_streams_gzipped_csv(self):
+        response = self.export('shops', output='csv', gzip='true')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="shops.csv.gz"')
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['uid', 'name', 'slug'])
+        self.assertIn('"Glow, Studio",glow-studio', lines[1])
+        self.assertIn(',12.500000,,', lines[1])
+
+    def test_reads_in_primary_key_batches(self):
+        queryset = Service.objects.all()
+        with self.assertNumQueries(3):
+            pages = list(batches(queryset, ('uid', 'service_name'), chunk_size=2))
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([row[0] for page in pages for row in page], sorted(service.uid for service in self.services))
+
+    def test_requires_admin_and_known_kind(self):
+        self.assertEqual(self.client.get(reverse('export', args=['shops'])).status_code, 401)
+        self.assertEqual(self.export('coupons').status_code, 400)
+        self.assertEqual(self.export('shops', output='xml').status_code, 400)
+
+    def test_command_writes_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "reviews.ndjson.gz")
+            user = CustomUser.objects.create_user(email="user@example.com", password="pw")
+            ServiceReview.objects.create(user=user, service=self.services[0], rating=5, comment="Great")
+            err = StringIO()
+            call_command('export_catalog', 'reviews', output=path, gzip=True, trace_memory=True, stderr=err)
+            with gzip.open(path, 'rt') as f:
+                row = json.loads(f.readline())
+        self.assertEqual((row['rating'], row['comment']), (5, "Great"))
+        self.assertIn("peak memory", err.getvalue())
+
+
+class BenchmarkApiCommandTest(TestCase):
+    def setUp(self):
+        response_cache.clear()
+
+    def test_smoke_run_writes_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_api', seed=True, scale=0.0001, requests=1, output=output, stdout=StringIO())
+            with open(output) as f:
+                report = json.load(f)
+            call_command('benchmark_api', requests=1, baseline=output, tolerance=100, stdout=StringIO())
+        self.assertEqual(report['dataset']['Shop'], 1)
+        self.assertEqual(report['routes']['services']['status'], 200)
+        self.assertEqual(report['routes']['profile']['status'], 200)
+        self.assertIn('p99_ms', report['routes']['nearest-shops'])
+        routes = report['routes']
+        for name in ('availability', 'search', 'autocomplete', 'facets', 'service-schedule', 'reservations',
+                     'export-shops', 'service-batch-update'):
+            self.assertEqual(routes[name]['status'], 200, name)
+        self.assertEqual(routes['reservation-create']['status'], 201)
+        self.assertEqual((routes['catalog-import']['method'], routes['catalog-import']['status']), ('POST', 200))
+
+
+class SeedSalonCommandTest(TestCase):
+    counts = dict(categories=4, cities=3, shops=5, services=20, time_slots=40, coupons=3, users=6, reviews=50)
+
+    def seed(self, seed):
+        call_command('seed_salon', seed=seed, chunk_size=7, stdout=StringIO(), **self.counts)
+
+    def snapshot(self):
+        return (
+            list(Shop.objects.order_by('slug').values_list('uid', 'slug', 'latitude', 'longitude')),
+            list(ServiceReview.objects.order_by('uid').values_list('uid', 'user_id', 'service_id', 'rating')),
+        )
+
+    def test_seeds_every_model_in_chunks(self):
+        self.seed(1)
+        self.assertEqual(Category.objects.count(), 4)
+        self.assertEqual(ServiceAddress.objects.count(), 3)
+        self.assertEqual(Shop.objects.count(), 5)
+        self.assertEqual(Service.objects.count(), 20)
+        self.assertEqual(TimeSlot.objects.count(), 40)
+        self.assertEqual(Coupon.objects.count(), 3)
+        self.assertEqual(CustomUser.objects.count(), 6)
+        self.assertEqual(Profile.objects.count(), 6)
+        self.assertEqual(ServiceReview.objects.count(), 50)
+        self.assertTrue(CustomUser.objects.first().check_password('password123'))
+        self.assertEqual(sum(Service.objects.values_list('review_count', flat=True)), 50)
+        self.assertEqual(len(shop_index.snapshot()), Shop.objects.filter(is_active=True).count())
+
+    def test_same_seed_yields_same_rows(self):
+        self.seed(3)
+        first = self.snapshot()
+        for model in (ServiceReview, CustomUser, Shop, Category, ServiceAddress, Coupon):
+            model.objects.all().delete()
+        self.seed(3)
+        self.assertEqual(self.snapshot(), first)
+        uids = [uid for uid, *_ in first[1]]
+        self.assertEqual({uid.version for uid in uids}, {7})
+
+    def test_different_seeds_share_a_database(self):
+        self.seed(1)
+        self.seed(2)
+        self.assertEqual(Shop.objects.count(), 10)
+        with self.assertRaises(CommandError):
+            self.seed(1)
+
+
+class InvalidationBusTest(TransactionTestCase):
+    def setUp(self):
+        self.bus = InvalidationBus(poll_interval=0)
+        self.received = []
+        self.bus.subscribe('widget', self.received.append)
+        self.bus.poll()
+
+    def event(self, key, origin='other-host:1', **kwargs):
+        return ChangeEvent.objects.create(topic='widget', key=key, origin=origin, **kwargs)
+
+    def test_publish_waits_for_commit(self):
+        with transaction.atomic():
+            self.bus.publish('widget', 'a')
+            self.bus.publish('unheard', 'b')
+            self.assertFalse(ChangeEvent.objects.exists())
+        self.assertEqual(list(ChangeEvent.objects.values_list('topic', 'key', 'origin')), [
+            ('widget', 'a', self.bus.origin),
+        ])
+
+    def test_applies_events_from_other_processes_once(self):
+        self.event('a')
+        self.event('b')
+        self.event('mine', origin=self.bus.origin)
+        self.assertEqual(self.bus.poll(), 2)
+        self.assertEqual(self.received, [{'a', 'b'}])
+        self.assertEqual(self.bus.poll(), 0)
+
+    def test_rereads_ids_that_commit_out_of_order(self):
+        first = self.event('a')
+        self.bus.poll()
+        # id + 1 is still uncommitted while id + 2 is read
+        self.event('c', id=first.id + 2)
+        self.bus.poll()
+        self.event('b', id=first.id + 1)
+        self.bus.poll()
+        self.assertEqual(self.received, [{'a'}, {'c'}, {'b'}])
+
+    def test_does_not_poll_inside_a_transaction(self):
+        self.event('a')
+        with transaction.atomic():
+            self.assertEqual(self.bus.poll(), 0)
+        self.assertEqual(self.bus.poll(), 1)
+
+    def test_foreign_shop_writes_reach_the_shop_index(self):
+        bus.last_id = None
+        bus.poll(force=True)
+        shop_index.invalidate()
+        shop = Shop.objects.create(name="Salon", owner="Owner", address="Street", latitude=12.97, longitude=77.59)
+        self.assertIn(shop.uid, shop_index.snapshot().positions)
+        # Another worker deactivates the shop with a write this process never sees
+        Shop.objects.filter(uid=shop.uid).update(is_active=False)
+        ChangeEvent.objects.create(topic='shop', key=str(shop.uid), origin='other-host:1')
+        bus.poll(force=True)
+        self.assertNotIn(shop.uid, shop_index.snapshot().positions)
+
+
+WATCH_SHOP = """
+import sys, time, uuid
+import django
+django.setup()
+from django.db import connection
+connection.settings_dict['NAME'] = sys.argv[1]
+from service.geo import shop_index
+from service.invalidation import bus
+uid = uuid.UUID(sys.argv[2])
+bus.poll(force=True)
+shop_index.snapshot()
+print('ready', flush=True)
+for state in ('seen', 'gone'):
+    deadline = time.monotonic() + 15
+    while (uid in shop_index.snapshot().positions) != (state == 'seen'):
+        if time.monotonic() > deadline:
+            print('timeout', flush=True)
+            sys.exit(1)
+        time.sleep(0.01)
+        bus.poll()
+    print(state, flush=True)
+"""
+
+
+class InvalidationAcrossProcessesTest(TransactionTestCase):
+    workers = 2
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Worker processes need a database they can share")
+
+    def test_shop_writes_reach_every_worker(self):
+        uid = uuid.uuid4()
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(sys.path)}
+        workers = [
+            subprocess.Popen(
+                [sys.executable, '-c', WATCH_SHOP, str(connection.settings_dict['NAME']), str(uid)],
+                stdout=subprocess.PIPE, text=True, cwd=settings.BASE_DIR, env=env,
+            )
+            for _ in range(self.workers)
+        ]
+        try:
+            self.assertEqual([worker.stdout.readline().strip() for worker in workers], ['ready'] * self.workers)
+
+            started = time.monotonic()
+            shop = Shop.objects.create(uid=uid, name="Salon", owner="Owner", address="Street",
+                                       latitude=12.97, longitude=77.59)
+            self.assertEqual([worker.stdout.readline().strip() for worker in workers], ['seen'] * self.workers)
+            shop.delete()
+            self.assertEqual([worker.stdout.readline().strip() for worker in workers], ['gone'] * self.workers)
+            self.assertLess(time.monotonic() - started, 2 * (bus.poll_interval + 2))
+        finally:
+            for worker in workers:
+                worker.kill()
+                worker.wait()
+                worker.stdout.close()
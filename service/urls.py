@@ -1,15 +1,31 @@
 from rest_framework.routers import DefaultRouter
 from django.urls import path, include
-from .views import CategoryViewSet, ShopViewSet, ServiceViewSet, CouponViewSet, ServiceAddressListView, TimeSlotListCreateView
+from .views import (
+    CategoryViewSet, ShopViewSet, ServiceViewSet, CouponViewSet, ServiceAddressListView,
+    TimeSlotListCreateView, TimeSlotBatchView, NearestShopView, DistanceCacheStatsView, ResponseCacheStatsView,
+    AvailabilityView, ReservationViewSet, ServiceSearchView, AutocompleteView, FacetView, CatalogImportView,
+    ExportView,
+)
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'shops', ShopViewSet, basename='shop')
 router.register(r'services', ServiceViewSet, basename='service')
 router.register(r'coupons', CouponViewSet, basename='coupon')
+router.register(r'reservations', ReservationViewSet, basename='reservation')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('service-addresses/', ServiceAddressListView.as_view(), name='service-address-list'),
     path('time-slots/', TimeSlotListCreateView.as_view(), name='time-slot-list'),
+    path('time-slots/batch/', TimeSlotBatchView.as_view(), name='time-slot-batch'),
+    path('nearest-shops/', NearestShopView.as_view(), name='nearest-shops'),
+    path('availability/', AvailabilityView.as_view(), name='availability'),
+    path('search/', ServiceSearchView.as_view(), name='service-search'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
+    path('facets/', FacetView.as_view(), name='facets'),
+    path('catalog/import/', CatalogImportView.as_view(), name='catalog-import'),
+    path('export/<str:kind>/', ExportView.as_view(), name='export'),
+    path('distance-cache/stats/', DistanceCacheStatsView.as_view(), name='distance-cache-stats'),
+    path('response-cache/stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
 ]
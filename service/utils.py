@@ -1,36 +1,226 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
 import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+
+class DistanceMatrixError(Exception):
+    pass
+
+
+class DistanceMatrixClient:
+    """
+    Google Maps Distance Matrix client.
+
+    Destinations are split into batches the API accepts and fetched in parallel
+    over a pooled session with strict timeouts. A batch that fails or times out
+    is filled with great-circle distances so callers always get an answer.
+    """
+
+    def __init__(self, api_key=None, base_url=None, batch_size=25, timeout=(2, 5), max_workers=4):
+        self.api_key = api_key
+        self.base_url = base_url or "https://maps.googleapis.com/maps/api/distancematrix/json"
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='distance-matrix')
+        self.fallbacks = 0
+
+    def _fetch_batch(self, origin, batch, api_key):
+        params = {
+            'origins': origin,
+            'destinations': "|".join(f"{lat},{lon}" for lat, lon in batch),
+            'key': api_key,
+        }
+        response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+
+        if data['status'] != "OK":
+            raise DistanceMatrixError(f"Google API error: {data['status']}")
+
+        elements = data['rows'][0]['elements']
+        if len(elements) != len(batch):
+            raise DistanceMatrixError("Google API returned the wrong number of elements")
+
+        distances = []
+        for row in elements:
+            if row['status'] == "OK":
+                distances.append(row['distance']['value'])  # Distance in meters
+            else:
+                distances.append(float('inf'))  # Unreachable location
+        return distances
+
+    def fetch(self, user_lat, user_lon, shop_locations, api_key=None):
+        """
+        Distances from the user to every shop location.
+
+        Returns:
+            list: (distance_in_meters, exact) tuples ordered by the shop locations,
+            where `exact` is False for great-circle fallbacks.
+        """
+        api_key = api_key or self.api_key
+        origin = f"{user_lat},{user_lon}"
+        batches = [
+            shop_locations[i:i + self.batch_size]
+            for i in range(0, len(shop_locations), self.batch_size)
+        ]
+        futures = [self._executor.submit(self._fetch_batch, origin, batch, api_key) for batch in batches]
+        # requests' read timeout is per socket read, so also bound the whole call
+        deadline = time.monotonic() + sum(self.timeout)
+
+        results = []
+        for batch, future in zip(batches, futures):
+            try:
+                distances = future.result(timeout=max(0, deadline - time.monotonic()))
+                results.extend((distance, True) for distance in distances)
+            except (FutureTimeoutError, requests.RequestException, ValueError, KeyError, IndexError,
+                    DistanceMatrixError) as e:
+                logger.warning("Distance Matrix batch failed, using great-circle distances: %r", e)
+                self.fallbacks += 1
+                results.extend(
+                    (haversine_km(user_lat, user_lon, lat, lon) * 1000, False) for lat, lon in batch
+                )
+        return results
+
+    def get_distances(self, user_lat, user_lon, shop_locations, api_key=None):
+        return [distance for distance, _ in self.fetch(user_lat, user_lon, shop_locations, api_key)]
+
+
+distance_matrix_client = DistanceMatrixClient(
+    api_key=settings.GOOGLE_MAPS_API_KEY,
+    base_url=settings.DISTANCE_MATRIX_URL,
+    batch_size=settings.DISTANCE_MATRIX_BATCH_SIZE,
+    timeout=(settings.DISTANCE_MATRIX_CONNECT_TIMEOUT, settings.DISTANCE_MATRIX_READ_TIMEOUT),
+    max_workers=settings.DISTANCE_MATRIX_MAX_WORKERS,
+)
+
 
 def get_distances(user_lat, user_lon, shop_locations, api_key):
     """
     Call Google Maps Distance Matrix API to calculate distances.
-    
+
     Args:
         user_lat (float): Latitude of the user.
         user_lon (float): Longitude of the user.
         shop_locations (list): List of (latitude, longitude) tuples for shops.
         api_key (str): Google Maps API key.
-    
+
     Returns:
         list: List of distances in meters, ordered by the shop locations.
+        Batches the API could not answer hold great-circle distances.
+    """
+    return distance_matrix_client.get_distances(user_lat, user_lon, list(shop_locations), api_key)
+
+
+class DistanceCache:
+    """
+    LRU cache of Distance Matrix results keyed on (origin cell, destination).
+
+    Origins are snapped to the centre of a `cell_deg` grid cell, so users in the
+    same neighbourhood share entries. Only destinations that are missing or
+    expired are sent upstream.
     """
-    origins = f"{user_lat},{user_lon}"
-    destinations = "|".join([f"{lat},{lon}" for lat, lon in shop_locations])
-
-    url = (
-        f"https://maps.googleapis.com/maps/api/distancematrix/json"
-        f"?origins={origins}&destinations={destinations}&key={api_key}"
-    )
-    response = requests.get(url)
-    data = response.json()
-
-    if data['status'] != "OK":
-        raise Exception(f"Google API error: {data['status']}")
-
-    distances = []
-    for row in data['rows'][0]['elements']:
-        if row['status'] == "OK":
-            distances.append(row['distance']['value'])  # Distance in meters
-        else:
-            distances.append(float('inf'))  # Unreachable location
-
-    return distances
+
+    def __init__(self, cell_deg=0.01, ttl=3600, max_entries=100000):
+        self.cell_deg = cell_deg
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.evictions = 0
+
+    def snap(self, lat, lon):
+        """
+        Centre of the grid cell that (lat, lon) falls in.
+        """
+        return (
+            round((math.floor(float(lat) / self.cell_deg) + 0.5) * self.cell_deg, 6),
+            round((math.floor(float(lon) / self.cell_deg) + 0.5) * self.cell_deg, 6),
+        )
+
+    def get_distances(self, user_lat, user_lon, shop_locations, api_key, keys=None):
+        """
+        Cached version of `get_distances`.
+
+        Args:
+            keys (list): Optional cache key per destination (e.g. shop uid).
+                Defaults to the destination coordinates.
+
+        Returns:
+            list: Distances in meters, ordered by the shop locations.
+        """
+        cell = self.snap(user_lat, user_lon)
+        keys = list(keys) if keys is not None else [(str(lat), str(lon)) for lat, lon in shop_locations]
+        distances = [None] * len(keys)
+        missing = []
+        now = time.monotonic()
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get((cell, key))
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end((cell, key))
+                    distances[i] = entry[0]
+                else:
+                    missing.append(i)
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            fetched = distance_matrix_client.fetch(cell[0], cell[1], [shop_locations[i] for i in missing], api_key)
+            expires = time.monotonic() + self.ttl
+            with self._lock:
+                self.upstream_calls += 1
+                for i, (distance, exact) in zip(missing, fetched):
+                    distances[i] = distance
+                    # Great-circle fallbacks are answered but never cached
+                    if exact:
+                        self._entries[(cell, keys[i])] = (distance, expires)
+                        self._entries.move_to_end((cell, keys[i]))
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return distances
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'cell_deg': self.cell_deg,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'upstream_calls': self.upstream_calls,
+                'evictions': self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.upstream_calls = self.evictions = 0
+
+
+distance_cache = DistanceCache(
+    cell_deg=settings.DISTANCE_CACHE_CELL_DEG,
+    ttl=settings.DISTANCE_CACHE_TTL,
+    max_entries=settings.DISTANCE_CACHE_MAX_ENTRIES,
+)
@@ -1,27 +1,65 @@
-from rest_framework import generics, viewsets, permissions
+from rest_framework import generics, mixins, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-from .models import Category, Shop, Service, TimeSlot, ServiceAddress, Coupon
+from .models import Category, Shop, Service, TimeSlot, ServiceAddress, Coupon, Reservation, SlotInventory
 from .serializers import (
     CategorySerializer, ShopSerializer, ServiceSerializer,
-    TimeSlotSerializer, ServiceAddressSerializer, CouponSerializer
+    TimeSlotSerializer, ServiceAddressSerializer, CouponSerializer,
+    NearestShopSerializer, AvailableServiceSerializer, ReservationSerializer, ServiceSearchResultSerializer,
 )
 
+import base64
+import binascii
+import json
+import logging
+import math
+import itertools
+import uuid
+from datetime import datetime, timedelta
+
 from django.conf import settings
-from .utils import get_distances
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .autocomplete import KINDS, TOP_N, autocomplete_index
+from .availability import availability_index
+from .batch import delete_batch, write_batch
+from .caching import VersionedCacheMixin, response_cache
+from .catalog import FORMATS, IMPORTERS, format_for, read_rows
+from .exports import CONTENT_TYPES, EXPORTS, FORMATS as EXPORT_FORMATS, encode
+from .facets import PRICE_BANDS, RATINGS, facet_index
+from .geo import shop_index, valid_point
+from .pagination import KeysetPagination
+from .reservations import ReservationError, RuleSlot, SlotFullError, cancel as cancel_reservation, reserve
+from .schedule import service_slots, slots_on
+from .search import search_services
+from .utils import distance_cache
+
+logger = logging.getLogger(__name__)
+
+POINT_OUT_OF_RANGE = "latitude must be within [-90, 90] and longitude within [-180, 180]"
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.AllowAny]  # Adjust permissions as needed
+    cache_models = (Category,)
+    cache_actions = ('list',)
 
 
-class ShopViewSet(viewsets.ModelViewSet):
+class ShopViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
     queryset = Shop.objects.all()
     serializer_class = ShopSerializer
+    pagination_class = KeysetPagination
+    cache_models = (Shop,)
+    cache_actions = ('list',)
 
     def get_queryset(self):
         # Example filter: return only active shops
@@ -29,31 +67,130 @@ class ShopViewSet(viewsets.ModelViewSet):
 
 
 
-class ServiceViewSet(viewsets.ModelViewSet):
-    queryset = Service.objects.all()
+class ServiceViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
+    queryset = Service.objects.select_related('shop')
     serializer_class = ServiceSerializer
+    pagination_class = KeysetPagination
+    cache_models = (Service, Shop)
+    cache_actions = ('retrieve',)
 
     def get_queryset(self):
         # Filter by shop if a query parameter is provided
         shop_id = self.request.query_params.get('shop_id')
         if shop_id:
-            return Service.objects.filter(shop__id=shop_id)
+            return self.queryset.filter(shop__uid=shop_id)
         return super().get_queryset()
 
+    @action(detail=True, methods=['get'])
+    def schedule(self, request, pk=None):
+        """
+        Slots generated from the service's schedule rules and exceptions, streamed `limit` at a time.
+
+        Query params: `from` (date, default today), `days` (default 7, max 31),
+        `limit` (default 100, max 500) and `after`, the start of the last slot
+        already read, which `next` fills in; an `after` with an offset is read
+        in local time.
+        """
+        service = self.get_object()
+        params = request.query_params
+        try:
+            first_day = parse_date(params['from']) if params.get('from') else timezone.localdate()
+            days = max(1, min(int(params.get('days', 7)), 31))
+            limit = max(1, min(int(params.get('limit', 100)), 500))
+            after = parse_datetime(params['after']) if params.get('after') else None
+        except ValueError:
+            first_day = None
+        if first_day is None or (params.get('after') and after is None):
+            return Response({"error": "from, days, limit or after is invalid"}, status=400)
+        if after is not None and timezone.is_aware(after):
+            # Generated slots are naive local times
+            after = timezone.make_naive(after)
+
+        slots = service_slots(service, first_day, first_day + timedelta(days=days - 1))
+        if after is not None:
+            slots = itertools.dropwhile(lambda slot: slot[0] <= after, slots)
+        # One extra slot tells whether there is a next page
+        page = list(itertools.islice(slots, limit + 1))
+
+        next_url = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_url = replace_query_param(request.build_absolute_uri(), 'after', page[-1][0].isoformat())
+        return Response({
+            "next": next_url,
+            "results": [{"start": start.isoformat(), "end": end.isoformat()} for start, end in page],
+        })
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], permission_classes=[permissions.IsAuthenticated])
+    def batch(self, request):
+        """
+        Create (POST), update (PATCH) or delete (DELETE) a list of services in one request.
+
+        Items carry the columns of the catalog import, with `shop` and
+        `category` given by uid or slug; updates and deletes name the service
+        by `uid`. See batch_response.
+        """
+        return batch_response(request, 'service')
+
 
 class TimeSlotListCreateView(generics.ListCreateAPIView):
-    queryset = TimeSlot.objects.all()
+    queryset = TimeSlot.objects.select_related('service')
     serializer_class = TimeSlotSerializer
 
 
-class ServiceAddressListView(generics.ListAPIView):
-    queryset = ServiceAddress.objects.all()
+class TimeSlotBatchView(APIView):
+    """
+    Create (POST), update (PATCH) or delete (DELETE) a list of time slots in one request.
+
+    Items carry `service` (uid or slug), `start_time`, `end_time` and
+    `capacity`; updates and deletes name the slot by `uid`. See batch_response.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        return batch_response(request, 'time_slot')
+
+    patch = delete = post
+
+
+def batch_response(request, kind):
+    """
+    Apply a batch write and answer with one result per item.
+
+    The body is a list of up to BATCH_WRITE_LIMIT items, validated together
+    and written in one transaction. Invalid items are skipped and reported
+    with their index. The status is 200 (201 for creates) when every item was
+    written, 207 when some were and 400 when none were.
+    """
+    items = request.data
+    limit = settings.BATCH_WRITE_LIMIT
+    if not isinstance(items, list) or not 0 < len(items) <= limit:
+        return Response({"error": f"Please send a list of 1 to {limit} items"}, status=400)
+
+    if request.method == 'DELETE':
+        results = delete_batch(kind, items)
+    else:
+        results = write_batch(kind, items, 'create' if request.method == 'POST' else 'update')
+    failed = sum(result['status'] == 'failed' for result in results)
+    if failed == len(results):
+        code = status.HTTP_400_BAD_REQUEST
+    elif failed:
+        code = status.HTTP_207_MULTI_STATUS
+    else:
+        code = status.HTTP_201_CREATED if request.method == 'POST' else status.HTTP_200_OK
+    return Response({"written": len(results) - failed, "failed": failed, "results": results}, status=code)
+
+
+class ServiceAddressListView(VersionedCacheMixin, generics.ListAPIView):
+    queryset = ServiceAddress.objects.prefetch_related('category')
     serializer_class = ServiceAddressSerializer
+    cache_models = (ServiceAddress, Category)
 
 
 class CouponViewSet(viewsets.ModelViewSet):
     queryset = Coupon.objects.all()
     serializer_class = CouponSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         # Filter expired or active coupons based on query parameter
@@ -64,6 +201,17 @@ class CouponViewSet(viewsets.ModelViewSet):
 
 
 class NearestShopView(APIView):
+    """
+    Active shops ordered by distance, one page of `k` at a time.
+
+    Pages are cut on great-circle distance; `next` carries a cursor holding the
+    last (distance, uid) returned so the following page starts right after it.
+    With `road=true` each page is re-ranked by road distance.
+    """
+    default_k = 20
+    max_k = 100
+    cursor_query_param = 'cursor'
+
     def get(self, request, *args, **kwargs):
         user_lat = request.query_params.get('latitude', None)
         user_lon = request.query_params.get('longitude', None)
@@ -71,27 +219,387 @@ class NearestShopView(APIView):
         if not user_lat or not user_lon:
             return Response({"error": "Please provide latitude and longitude"}, status=400)
 
-        user_lat = float(user_lat)
-        user_lon = float(user_lon)
+        try:
+            user_lat = float(user_lat)
+            user_lon = float(user_lon)
+            k = int(request.query_params.get('k', self.default_k))
+            radius_km = request.query_params.get('radius_km')
+            radius_km = float(radius_km) if radius_km else None
+        except ValueError:
+            return Response({"error": "latitude, longitude, k and radius_km must be numbers"}, status=400)
+        if not valid_point(user_lat, user_lon):
+            return Response({"error": POINT_OUT_OF_RANGE}, status=400)
+
+        k = max(1, min(k, self.max_k))
+
+        after = None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            try:
+                after = self.decode_cursor(cursor, user_lat, user_lon)
+            except ValueError:
+                return Response({"error": "Invalid cursor"}, status=400)
+
+        # Next k active shops by great-circle distance from the in-process index
+        nearest = shop_index.nearest(user_lat, user_lon, k, radius_km, after)
+
+        shops = Shop.objects.in_bulk([uid for _, uid in nearest])
+        page = []
+        for distance, uid in nearest:
+            if uid in shops:
+                shops[uid].distance_km = distance
+                page.append(shops[uid])
+
+        # Optionally re-rank the page by road distance
+        if request.query_params.get('road', '').lower() == 'true' and page:
+            page = self.refine_by_road(user_lat, user_lon, page)
+
+        next_url = None
+        if len(nearest) == k:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), self.cursor_query_param,
+                self.encode_cursor(nearest[-1], user_lat, user_lon),
+            )
+
+        # Serialize and return this page of nearest shops
+        serializer = NearestShopSerializer(page, many=True)
+        return Response({"next": next_url, "results": serializer.data})
+
+    def encode_cursor(self, last, user_lat, user_lon):
+        distance, uid = last
+        payload = json.dumps([distance, str(uid), user_lat, user_lon])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, user_lat, user_lon):
+        """
+        The cursor is the (distance, uid) of the last shop returned, pinned to
+        the origin it was computed for.
+        """
+        try:
+            distance, uid, lat, lon = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            uid = uuid.UUID(uid)
+        except (TypeError, ValueError, binascii.Error):
+            raise ValueError("Invalid cursor")
+        if (lat, lon) != (user_lat, user_lon):
+            raise ValueError("Cursor belongs to another origin")
+        return float(distance), uid
+
+    def refine_by_road(self, user_lat, user_lon, page):
+        shop_locations = [(shop.latitude, shop.longitude) for shop in page]
+        try:
+            distances = distance_cache.get_distances(
+                user_lat, user_lon, shop_locations, settings.GOOGLE_MAPS_API_KEY,
+                keys=[shop.uid for shop in page],
+            )
+        except Exception:
+            logger.warning("Road distance refinement failed, keeping great-circle order", exc_info=True)
+            return page
+        for shop, distance in zip(page, distances):
+            # Unreachable shops have no road distance and go last
+            shop.road_distance_m = distance if math.isfinite(distance) else None
+        return sorted(page, key=lambda shop: (shop.road_distance_m is None, shop.road_distance_m or 0))
+
+
+class AvailabilityView(APIView):
+    """
+    Published services with a free time slot inside [start, end].
+
+    Optionally narrowed to a category and to shops within `radius_km` of
+    (latitude, longitude); nearby results are ordered by distance, the others by
+    their earliest free slot.
+    With `date`, slots generated from schedule rules on that day are included;
+    they have no uid and are booked by service, start and end time.
+    """
+    default_limit = 20
+    max_limit = 100
+    default_radius_km = 10.0
+    max_slots = 10
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            lo = self.parse_minutes(params.get('start'))
+            hi = self.parse_minutes(params.get('end'))
+        except (TypeError, ValueError):
+            return Response({"error": "Please provide start and end as HH:MM"}, status=400)
+        if hi <= lo:
+            return Response({"error": "end must be after start"}, status=400)
+
+        try:
+            limit = max(1, min(int(params.get('limit', self.default_limit)), self.max_limit))
+            slots = max(1, min(int(params.get('slots', 3)), self.max_slots))
+            category = uuid.UUID(params['category']) if params.get('category') else None
+            day = parse_date(params['date']) if params.get('date') else None
+            user_lat, user_lon = params.get('latitude'), params.get('longitude')
+            located = bool(user_lat and user_lon)
+            if located:
+                user_lat, user_lon = float(user_lat), float(user_lon)
+                radius_km = float(params.get('radius_km', self.default_radius_km))
+        except ValueError:
+            return Response({"error": "limit, slots, category, date, latitude, longitude or radius_km is invalid"},
+                            status=400)
+        if params.get('date') and day is None:
+            return Response({"error": "date must be YYYY-MM-DD"}, status=400)
+        if located and not valid_point(user_lat, user_lon):
+            return Response({"error": POINT_OUT_OF_RANGE}, status=400)
+
+        distances, shops = {}, None
+        if located:
+            nearby = shop_index.nearest(user_lat, user_lon, len(shop_index.snapshot()), radius_km)
+            distances = {uid: distance for distance, uid in nearby}
+            shops = distances.keys()
+
+        # Slots already sold out that day are not free; skipped before each service is cut to `slots`
+        sold_out, rules_sold_out = set(), set()
+        if day is not None:
+            for time_slot, service, start, end in SlotInventory.objects.filter(date=day, remaining=0).values_list(
+                'time_slot_id', 'service_id', 'start_time', 'end_time'
+            ):
+                if time_slot is not None:
+                    sold_out.add(time_slot)
+                else:
+                    rules_sold_out.add((service, start.hour * 60 + start.minute, end.hour * 60 + end.minute))
+        found = availability_index.search(lo, hi, category=category, shops=shops, slots_per_service=slots,
+                                          exclude=sold_out)
+        if day is not None:
+            # Slots from schedule rules exist only for a given day
+            candidates = availability_index.candidates(category=category, shops=shops)
+            for uid, generated in slots_on(day, lo, hi, candidates).items():
+                generated = [(None, start, end) for start, end in generated if (uid, start, end) not in rules_sold_out]
+                if not generated:
+                    continue
+                found[uid] = sorted(found.get(uid, []) + generated, key=lambda slot: slot[1:])[:slots]
+        services = Service.objects.select_related('shop').in_bulk(found)
 
-        # Fetch all active shops
-        shops = Shop.objects.filter(is_active=True)
-        shop_locations = [(shop.latitude, shop.longitude) for shop in shops]
+        page = []
+        for uid, free in found.items():
+            service = services.get(uid)
+            if service is None:
+                continue
+            service.distance_km = distances.get(service.shop_id)
+            service.free_slots = [
+                {'uid': key, 'start_time': self.format_minutes(start), 'end_time': self.format_minutes(end)}
+                for key, start, end in free
+            ]
+            page.append((service.distance_km or 0, free[0][1], str(uid), service))
+        page = [service for *_, service in sorted(page, key=lambda row: row[:3])[:limit]]
 
-        # Get distances using Google API
+        serializer = AvailableServiceSerializer(page, many=True)
+        return Response({"results": serializer.data})
+
+    def parse_minutes(self, value):
+        parsed = datetime.strptime(value, '%H:%M')
+        return parsed.hour * 60 + parsed.minute
+
+    def format_minutes(self, minutes):
+        minutes %= 24 * 60
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class ServiceSearchView(APIView):
+    """
+    Services whose name, description, shop name or shop address match `q`, most relevant first.
+
+    Query params: `q`, `is_publish` (true, false or all; default true),
+    `min_price`/`max_price` on the discounted price, `limit` and `offset`.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            return Response({"error": "Please provide a search query as q"}, status=400)
+        is_publish = {'true': True, 'false': False, 'all': None}.get(params.get('is_publish', 'true').lower(), '')
+        try:
+            min_price = float(params['min_price']) if params.get('min_price') else None
+            max_price = float(params['max_price']) if params.get('max_price') else None
+            limit = max(1, min(int(params.get('limit', self.default_limit)), self.max_limit))
+            offset = max(0, int(params.get('offset', 0)))
+        except ValueError:
+            is_publish = ''
+        if is_publish == '':
+            return Response({"error": "is_publish, min_price, max_price, limit or offset is invalid"}, status=400)
+
+        count, page = search_services(query, is_publish, min_price, max_price, offset, limit)
+        services = Service.objects.select_related('shop').in_bulk([uid for uid, _ in page])
+        results = []
+        for uid, score in page:
+            service = services.get(uid)
+            if service is not None:
+                service.score = round(float(score), 4)
+                results.append(service)
+
+        next_url = None
+        if offset + limit < count:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+        return Response({
+            "count": count,
+            "next": next_url,
+            "results": ServiceSearchResultSerializer(results, many=True).data,
+        })
+
+
+class AutocompleteView(APIView):
+    """
+    The most popular service, shop, category and city names starting with `q`.
+
+    Query params: `q`, `kind` (comma-separated subset of service, shop,
+    category and city; default all) and `limit` (default and max 10).
+    """
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        kinds = [kind for kind in params.get('kind', '').split(',') if kind] or list(KINDS)
+        try:
+            limit = max(1, min(int(params.get('limit', TOP_N)), TOP_N))
+        except ValueError:
+            kinds = None
+        if kinds is None or not set(kinds) <= set(KINDS):
+            return Response({"error": f"kind must be one of {', '.join(KINDS)} and limit a number"}, status=400)
+        return Response({"results": autocomplete_index.complete(params.get('q', ''), kinds, limit)})
+
+
+class FacetView(APIView):
+    """
+    Published services filtered by city, category, price band and minimum
+    rating, with the number of services behind every facet value.
+
+    Query params: `city` and `category` (comma-separated uids), `price`
+    (comma-separated lower bounds of price bands), `rating` (minimum average
+    rating), `limit` and `offset`.
+    """
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            selected = {
+                'city': {uuid.UUID(value) for value in params.get('city', '').split(',') if value},
+                'category': {uuid.UUID(value) for value in params.get('category', '').split(',') if value},
+                'price': {int(value) for value in params.get('price', '').split(',') if value},
+                'rating': {int(params['rating'])} if params.get('rating') else set(),
+            }
+            limit = max(1, min(int(params.get('limit', self.default_limit)), self.max_limit))
+            offset = max(0, int(params.get('offset', 0)))
+        except ValueError:
+            selected = None
+        if (selected is None or not selected['price'] <= set(PRICE_BANDS)
+                or not selected['rating'] <= set(RATINGS)):
+            return Response({"error": "city, category, price, rating, limit or offset is invalid"}, status=400)
+
+        total, page, counts = facet_index.search(selected, offset, limit)
+        services = Service.objects.select_related('shop').in_bulk(page)
+        next_url = None
+        if offset + limit < total:
+            next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+        return Response({
+            "count": total,
+            "next": next_url,
+            "facets": {
+                facet: [{"value": value, "label": label, "count": count} for value, label, count in values]
+                for facet, values in counts.items()
+            },
+            "results": ServiceSerializer([services[uid] for uid in page if uid in services], many=True).data,
+        })
+
+
+class ReservationViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                         viewsets.GenericViewSet):
+    """
+    The signed-in user's reservations of time slots on a date.
+
+    A TimeSlot is booked by its `time_slot` uid. A slot generated from
+    schedule rules (see the schedule action and `date` on availability) has
+    no uid and is booked by `service`, `start_time` and `end_time` instead;
+    it seats one booking.
+    """
+    serializer_class = ReservationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return Reservation.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        slot = data.get('time_slot') or RuleSlot(data['service'], data['start_time'], data['end_time'])
         try:
-            api_key = settings.GOOGLE_MAPS_API_KEY
-            distances = get_distances(user_lat, user_lon, shop_locations, api_key)
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+            reservation = reserve(request.user, slot, data['date'])
+        except SlotFullError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        except ReservationError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        reservation = self.get_object()
+        if not cancel_reservation(reservation):
+            return Response({"error": "This reservation is already cancelled"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reservation).data)
+
+
+class CatalogImportView(APIView):
+    """
+    Import shops, services or time slots from an uploaded CSV or NDJSON `file`.
+
+    Params: `kind` (shop, service or time_slot) and `format` (csv or ndjson;
+    guessed from the file name by default). The upload is read line by line
+    and written in chunks; the response is the import report.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser]
 
-        # Annotate shops with distances
-        for shop, distance in zip(shops, distances):
-            shop.distance = distance
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        kind = request.data.get('kind') or request.query_params.get('kind')
+        format = request.data.get('format') or request.query_params.get('format')
+        if upload is None or kind not in IMPORTERS or format not in (None, *FORMATS):
+            return Response({"error": f"Please upload a file, kind one of {', '.join(sorted(IMPORTERS))} "
+                                      f"and format csv or ndjson"}, status=400)
+        lines = (line.decode('utf-8-sig') for line in upload)
+        report = IMPORTERS[kind]().run(read_rows(lines, format or format_for(upload.name)))
+        return Response(report)
 
-        # Sort shops by distance
-        sorted_shops = sorted(shops, key=lambda x: x.distance)
 
-        # Serialize and return the nearest shops
-        serializer = ShopSerializer(sorted_shops, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+class ExportView(APIView):
+    """
+    Stream every shop, service or review as NDJSON or CSV.
+
+    Query params: `output` (ndjson or csv, default ndjson) and `gzip` (true
+    to compress on the fly). Rows are read in primary key batches and sent
+    as they are encoded, so memory stays flat however large the table.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, kind, *args, **kwargs):
+        output = request.query_params.get('output', 'ndjson')
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+        if kind not in EXPORTS or output not in EXPORT_FORMATS:
+            return Response({"error": f"Export one of {', '.join(EXPORTS)} as ndjson or csv"}, status=400)
+
+        filename = f"{kind}.{output}" + (".gz" if compress else "")
+        response = StreamingHttpResponse(
+            encode(kind, output, compress=compress),
+            content_type='application/gzip' if compress else CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class DistanceCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(distance_cache.stats())
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(response_cache.stats())